@@ -0,0 +1,94 @@
+"""
+Small helpers shared by the benchmark and report management commands.
+"""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """``{"p50": ..., "p95": ..., "p99": ...}`` for a list of samples."""
+    if len(samples) == 0:
+        return {f"p{p}": float('nan') for p in points}
+    values = np.percentile(np.asarray(samples, dtype=np.float64), points)
+    return {f"p{p}": float(v) for p, v in zip(points, values)}
+
+
+def format_table(headers, rows):
+    """Render rows as a plain-text table with right-aligned columns."""
+    cells = [[_format_cell(value) for value in row] for row in rows]
+    widths = [len(h) for h in headers]
+    for row in cells:
+        for i, cell in enumerate(row):
+            widths[i] = max(widths[i], len(cell))
+    lines = [
+        "  ".join(h.rjust(w) for h, w in zip(headers, widths)),
+        "  ".join("-" * w for w in widths),
+    ]
+    lines.extend("  ".join(c.rjust(w) for c, w in zip(row, widths)) for row in cells)
+    return "\n".join(lines)
+
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def synthetic_face_encodings(count, dim=128, seed=0):
+    """
+    Random encodings shaped roughly like real face_recognition output.
+
+    Real encodings sit in a small region of the space, with faces of
+    different people about 1.0 apart and photos of the same person well
+    under the 0.6 match tolerance; these are drawn so the same holds.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.065, size=(count, dim)).astype(np.float32)
+
+
+def perturb(encodings, scale=0.02, seed=1):
+    """Simulated second photos of the same faces: small noise on each row."""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0.0, scale, size=np.shape(encodings)).astype(np.float32)
+    return np.asarray(encodings, dtype=np.float32) + noise
+
+
+@contextmanager
+def isolated_database(verbosity=0):
+    """
+    Run the body against a throwaway test database, like the test runner does.
+
+    Benchmarks seed a lot of rows; they never touch the real database.
+    """
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+class QueryTimer:
+    """
+    ``connection.execute_wrapper`` hook that counts queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+    def reset(self):
+        self.count = 0
+        self.seconds = 0.0
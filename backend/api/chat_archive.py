@@ -0,0 +1,145 @@
+"""
+Cold storage for old chat messages.
+
+The archive_chat_messages command moves whole months of a group's chat,
+once they are older than ``CHAT_ARCHIVE_AFTER_DAYS``, out of ChatMessage
+into one ChatArchiveChunk per group and month: gzip-compressed NDJSON
+(one line per message, in (timestamp, id) order), after which the rows are
+deleted from the hot table in batches.
+
+Archived messages keep their primary key, uuid and timestamp, so history
+cursors stay valid across the boundary; ChatHistoryPagination reads
+through to the archive via :class:`ArchivedMessages`.
+"""
+import datetime
+import gzip
+import json
+from functools import lru_cache
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import ChatArchiveChunk, ChatMessage
+
+
+def month_start(value):
+    return value.astimezone(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return (value + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _parse(timestamp):
+    return datetime.datetime.fromisoformat(timestamp)
+
+
+def encode_messages(rows):
+    lines = (json.dumps(row, separators=(',', ':'), ensure_ascii=False) for row in rows)
+    return gzip.compress('\n'.join(lines).encode(), compresslevel=6)
+
+
+def decode_messages(data):
+    text = gzip.decompress(bytes(data)).decode()
+    return [json.loads(line) for line in text.split('\n') if line]
+
+
+def message_row(message):
+    return {
+        'pk': message.id,
+        'id': str(message.uuid),
+        'user_id': message.user_id,
+        'username': message.user.username,
+        'message': message.message,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+def archive_month(group_id, month, batch_size=5000):
+    """
+    Moves the ``month`` (first day, UTC) of a group's chat into its chunk,
+    merging with what an earlier run already archived. Returns the number
+    of rows removed from ChatMessage.
+    """
+    hot = ChatMessage.objects.filter(
+        group_id=group_id, timestamp__gte=month, timestamp__lt=next_month(month),
+    )
+    with transaction.atomic():
+        chunk = ChatArchiveChunk.objects.select_for_update().filter(group_id=group_id, month=month.date()).first()
+        rows = {row['pk']: row for row in (decode_messages(chunk.data) if chunk else ())}
+        new = [message_row(message) for message in hot.select_related('user').order_by('timestamp', 'id')]
+        if not new:
+            return 0
+        rows.update((row['pk'], row) for row in new)
+        ordered = sorted(rows.values(), key=lambda row: (_parse(row['timestamp']), row['pk']))
+        ChatArchiveChunk.objects.update_or_create(
+            group_id=group_id, month=month.date(),
+            defaults={
+                'message_count': len(ordered),
+                'first_timestamp': _parse(ordered[0]['timestamp']),
+                'last_timestamp': _parse(ordered[-1]['timestamp']),
+                'data': encode_messages(ordered),
+            },
+        )
+
+    # Only the rows now in the chunk are deleted; short transactions keep locks brief.
+    archived = [row['pk'] for row in new]
+    for start in range(0, len(archived), batch_size):
+        ChatMessage.objects.filter(id__in=archived[start:start + batch_size]).delete()
+    return len(archived)
+
+
+@lru_cache(maxsize=32)
+def _chunk_messages(chunk_id, updated_at):
+    """Decoded rows of a chunk; keyed on ``updated_at`` so a rewritten chunk is re-read."""
+    data = ChatArchiveChunk.objects.values_list('data', flat=True).get(id=chunk_id)
+    messages = []
+    for row in decode_messages(data):
+        message = ChatMessage(
+            id=row['pk'], uuid=row['id'], user_id=row['user_id'], message=row['message'],
+            timestamp=_parse(row['timestamp']),
+        )
+        message.user = User(id=row['user_id'], username=row['username'])
+        messages.append(message)
+    return messages
+
+
+class ArchivedMessages:
+    """A group's archived messages, fetched one chunk at a time in keyset order."""
+
+    def __init__(self, group_id):
+        self.group_id = group_id
+
+    def fetch(self, descending, cursor, limit, bound=None):
+        """
+        Up to ``limit`` messages after ``cursor`` (a ``(timestamp, id)`` pair
+        or None) in ascending or descending order. Chunks entirely beyond
+        ``bound`` (the last key of a full page already found elsewhere) are
+        skipped without being read.
+        """
+        chunks = ChatArchiveChunk.objects.filter(group_id=self.group_id).only('id', 'updated_at')
+        if descending:
+            if cursor is not None:
+                chunks = chunks.filter(first_timestamp__lte=cursor[0])
+            if bound is not None:
+                chunks = chunks.filter(last_timestamp__gte=bound[0])
+            chunks = chunks.order_by('-month')
+        else:
+            if cursor is not None:
+                chunks = chunks.filter(last_timestamp__gte=cursor[0])
+            if bound is not None:
+                chunks = chunks.filter(first_timestamp__lte=bound[0])
+            chunks = chunks.order_by('month')
+
+        found = []
+        for chunk in chunks:
+            messages = _chunk_messages(chunk.id, chunk.updated_at)
+            if descending:
+                messages = messages[::-1]
+            if cursor is not None:
+                after = (lambda key: key < cursor) if descending else (lambda key: key > cursor)
+                messages = [m for m in messages if after((m.timestamp, m.id))]
+            found.extend(messages[:limit - len(found)])
+            if len(found) >= limit:
+                break
+        return found
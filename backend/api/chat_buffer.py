@@ -0,0 +1,154 @@
+"""
+Write-behind persistence for chat messages.
+
+With ``CHAT_WRITE_BEHIND`` enabled, ChatConsumer broadcasts a message as
+soon as it has a server-assigned uuid and timestamp, and hands the unsaved
+ChatMessage to this buffer. The buffer writes messages with one
+``bulk_create`` once ``CHAT_WRITE_BEHIND_BATCH_SIZE`` are pending or
+``CHAT_WRITE_BEHIND_FLUSH_INTERVAL`` seconds after the first one arrived,
+whichever comes first.
+
+If a write fails the batch goes back to the front of the buffer and is
+retried with exponential backoff, up to ``CHAT_WRITE_BEHIND_MAX_RETRY_DELAY``
+seconds apart. While the database is down the buffer holds at most
+``CHAT_WRITE_BEHIND_MAX_PENDING`` messages and drops the oldest beyond that.
+
+Pending messages are drained on ASGI lifespan shutdown (see api.lifespan)
+and at interpreter exit. Daphne sends no lifespan events, so under Daphne
+the atexit drain is the only one: it runs after a SIGTERM or SIGINT
+shutdown, but messages still buffered when a worker is SIGKILLed are lost.
+"""
+import asyncio
+import atexit
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import metrics
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def write_behind_enabled():
+    return getattr(settings, "CHAT_WRITE_BEHIND", False)
+
+
+class ChatWriteBehindBuffer:
+    """
+    Only touched from the event loop, except :meth:`write`, which runs in a
+    worker thread and hands the messages it could not write back to the loop.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=0.5, max_pending=10000, max_retry_delay=30):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retry_delay = max_retry_delay
+        self._pending = []
+        self._timer = None
+        self._failures = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, message):
+        self._pending.append(message)
+        self._trim()
+        # While retrying after a failure, only the backoff timer flushes.
+        if len(self._pending) >= self.batch_size and not self._failures:
+            await self.flush()
+        else:
+            self._schedule(self.flush_interval)
+
+    def _schedule(self, delay):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _trim(self):
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            metrics.incr('chat_messages_dropped', excess)
+            logger.error("Chat write-behind buffer is full; dropped the %d oldest unsaved messages.", excess)
+
+    async def flush(self):
+        self._cancel_timer()
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        failed = await database_sync_to_async(self.write)(batch)
+        if failed:
+            # Back on the loop: requeue ahead of anything that arrived meanwhile.
+            self._pending[:0] = failed
+            self._trim()
+            self._failures += 1
+            self._cancel_timer()
+            self._schedule(min(self.flush_interval * 2 ** self._failures, self.max_retry_delay))
+        else:
+            self._failures = 0
+
+    def write(self, batch):
+        """Saves ``batch`` and returns the messages that should be retried."""
+        # Savepoints, so a failed insert leaves an enclosing transaction usable.
+        try:
+            with transaction.atomic():
+                ChatMessage.objects.bulk_create(batch)
+        except IntegrityError:
+            # One bad row (e.g. its group was deleted meanwhile) must not lose the rest.
+            retry = []
+            for message in batch:
+                try:
+                    with transaction.atomic():
+                        message.save(force_insert=True)
+                except IntegrityError:
+                    logger.exception("Dropping chat message %s that could not be saved.", message.uuid)
+                except Exception:
+                    retry.append(message)
+            return retry
+        except Exception:
+            logger.exception("Could not write %d chat messages; they will be retried.", len(batch))
+            return batch
+        return []
+
+    def drain(self):
+        """Synchronously write everything that is still pending."""
+        self._cancel_timer()
+        batch, self._pending = self._pending, []
+        if batch:
+            failed = self.write(batch)
+            if failed:
+                logger.error("Lost %d unsaved chat messages while draining.", len(failed))
+
+
+_buffer = None
+
+
+def get_chat_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = ChatWriteBehindBuffer(
+            batch_size=getattr(settings, "CHAT_WRITE_BEHIND_BATCH_SIZE", 200),
+            flush_interval=getattr(settings, "CHAT_WRITE_BEHIND_FLUSH_INTERVAL", 0.5),
+            max_pending=getattr(settings, "CHAT_WRITE_BEHIND_MAX_PENDING", 10000),
+            max_retry_delay=getattr(settings, "CHAT_WRITE_BEHIND_MAX_RETRY_DELAY", 30),
+        )
+        atexit.register(_drain_at_exit)
+    return _buffer
+
+
+async def drain_chat_buffer():
+    if _buffer is not None:
+        await _buffer.flush()
+
+
+def _drain_at_exit():
+    if _buffer is not None and len(_buffer):
+        _buffer.drain()
@@ -0,0 +1,39 @@
+"""
+Wire format of the frames ChatConsumer sends to WebSocket clients.
+
+A chat message is encoded once, by the consumer that received it, and the
+resulting text travels through the channel layer so that every recipient
+only forwards it. Chat history (ChatMessageSerializer) returns messages in
+the same shape, so clients can merge pages with live frames by id:
+
+    {"type":"message","id":"<uuid>","user_id":7,"username":"asha",
+     "message":"...","timestamp":"2025-09-09T09:20:00+00:00"}
+
+Messages the server refuses are answered, to the sender only, with
+
+    {"type":"error","code":"rate_limited","detail":"..."}
+"""
+import json
+
+
+def encode(payload):
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+
+
+def message_payload(chat_message, username):
+    return {
+        'type': 'message',
+        'id': str(chat_message.uuid),
+        'user_id': chat_message.user_id,
+        'username': username,
+        'message': chat_message.message,
+        'timestamp': chat_message.timestamp.isoformat(),
+    }
+
+
+def message_frame(chat_message, username):
+    return encode(message_payload(chat_message, username))
+
+
+def error_frame(code, detail):
+    return encode({'type': 'error', 'code': code, 'detail': detail})
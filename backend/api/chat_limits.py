@@ -0,0 +1,103 @@
+"""
+Rate limits for chat messages sent by WebSocket clients.
+
+Every ChatConsumer has its own token bucket, and all connections of one
+user in this process share a second one, so opening more tabs does not
+buy more throughput. A message is accepted only if both buckets have a
+token. Buckets refill continuously at ``rate`` tokens per second up to
+``burst`` tokens.
+
+Frames to clients are limited too. Under Daphne, ``send()`` returns as soon
+as Twisted has buffered a frame, so a client that reads too slowly makes its
+connection's write buffer grow without bound. :func:`pending_write_bytes`
+reads that buffer's size; past ``CHAT_OUTBOUND_BUFFER_LIMIT`` ChatConsumer
+drops further frames or closes the connection (``CHAT_SLOW_CONSUMER_POLICY``).
+"""
+import functools
+import time
+
+from django.conf import settings
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def has_token(self):
+        self._refill()
+        return self.tokens >= 1
+
+    def take(self):
+        self.tokens -= 1
+
+
+class MessageLimiter:
+    """The per-connection bucket plus the bucket shared by the user's connections."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.connection = TokenBucket(
+            getattr(settings, "CHAT_RATE_LIMIT", 5), getattr(settings, "CHAT_RATE_BURST", 10),
+        )
+        self.user = _user_buckets.acquire(user_id)
+
+    def allow(self):
+        if self.connection.has_token() and self.user.has_token():
+            self.connection.take()
+            self.user.take()
+            return True
+        return False
+
+    def close(self):
+        _user_buckets.release(self.user_id)
+
+
+class UserBuckets:
+    """Reference-counted per-user buckets; dropped when the user's last connection closes."""
+
+    def __init__(self):
+        self._buckets = {}
+
+    def acquire(self, user_id):
+        entry = self._buckets.get(user_id)
+        if entry is None:
+            bucket = TokenBucket(
+                getattr(settings, "CHAT_USER_RATE_LIMIT", 10), getattr(settings, "CHAT_USER_RATE_BURST", 20),
+            )
+            entry = self._buckets[user_id] = [bucket, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, user_id):
+        entry = self._buckets.get(user_id)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._buckets[user_id]
+
+
+_user_buckets = UserBuckets()
+
+
+def pending_write_bytes(send):
+    """
+    Bytes written to the connection behind an ASGI ``send`` callable but not
+    yet flushed to its socket, or None if the server does not let us see it.
+    Daphne's ``send`` is a partial of its handle_reply over the Twisted
+    protocol; a plain TCP transport keeps unsent data in two buffers.
+    """
+    if not isinstance(send, functools.partial) or len(send.args) != 1:
+        return None
+    transport = getattr(send.args[0], 'transport', None)
+    try:
+        return len(transport.dataBuffer) - transport.offset + transport._tempDataLen
+    except (AttributeError, TypeError):
+        return None
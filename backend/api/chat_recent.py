@@ -0,0 +1,162 @@
+"""
+Recent chat frames per study group, replayed to every new connection.
+
+ChatConsumer appends each encoded message frame (see api.chat_events) to a
+bounded per-group list holding the last ``CHAT_RECENT_MESSAGES`` frames, and
+replays that list right after accepting a connection. With
+``CHAT_RECENT_REDIS_URL`` set the list lives in Redis and is shared by every
+worker; otherwise a per-process deque stands in for it.
+
+A group's list only counts as complete once it has been filled from the
+ChatMessage table, which sets a "warm" marker next to it. Until then (a new
+process, or after Redis restarted or the list expired) the next connection
+reads the latest messages from the database and merges them in front of
+any frames pushed meanwhile, skipping message ids already present. A group
+without messages is warm too, so it is not queried on every connect.
+"""
+import asyncio
+import json
+import weakref
+from collections import deque
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from . import chat_events
+from .models import ChatMessage
+
+
+def frame_id(text):
+    return json.loads(text).get('id')
+
+
+def merge_frames(older, newer, size):
+    """``older`` followed by the frames of ``newer`` it lacks (by message id), keeping the last ``size``."""
+    seen = {frame_id(text) for text in older}
+    return [*older, *(text for text in newer if frame_id(text) not in seen)][-size:]
+
+
+class LocalRecentFrames:
+    """Process-local stand-in, used without Redis."""
+
+    def __init__(self, size):
+        self.size = size
+        self._frames = {}
+        self._warm = set()
+
+    async def push(self, group_id, text):
+        self._frames.setdefault(str(group_id), deque(maxlen=self.size)).append(text)
+
+    async def fill(self, group_id, texts):
+        key = str(group_id)
+        merged = merge_frames(texts, self._frames.get(key, ()), self.size)
+        self._frames[key] = deque(merged, maxlen=self.size)
+        self._warm.add(key)
+        return merged
+
+    async def get(self, group_id):
+        """``(frames, warm)``."""
+        key = str(group_id)
+        return list(self._frames.get(key, ())), key in self._warm
+
+
+class RedisRecentFrames:
+    """A capped Redis list per group, plus its warm marker, with the same expiry."""
+
+    prefix = 'chat:recent'
+
+    def __init__(self, url, size, ttl):
+        self.url = url
+        self.size = size
+        self.ttl = ttl
+        # redis.asyncio connections belong to the event loop that opened them.
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = redis.Redis.from_url(self.url)
+        return client
+
+    def _keys(self, group_id):
+        return f'{self.prefix}:{group_id}', f'{self.prefix}:{group_id}:warm'
+
+    async def push(self, group_id, text):
+        key, warm_key = self._keys(group_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, text)
+            pipe.ltrim(key, -self.size, -1)
+            pipe.expire(key, self.ttl)
+            # Keeps an existing marker alive as long as the list; never creates one.
+            pipe.expire(warm_key, self.ttl)
+            await pipe.execute()
+
+    async def fill(self, group_id, texts):
+        from redis.exceptions import WatchError
+
+        key, warm_key = self._keys(group_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # Retried if a frame is pushed between the read and the write.
+                    await pipe.watch(key)
+                    current = [text.decode() for text in await pipe.lrange(key, 0, -1)]
+                    merged = merge_frames(texts, current, self.size)
+                    pipe.multi()
+                    pipe.delete(key)
+                    if merged:
+                        pipe.rpush(key, *merged)
+                        pipe.expire(key, self.ttl)
+                    pipe.set(warm_key, 1, ex=self.ttl)
+                    await pipe.execute()
+                    return merged
+                except WatchError:
+                    continue
+
+    async def get(self, group_id):
+        """``(frames, warm)``."""
+        key, warm_key = self._keys(group_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.exists(warm_key)
+            frames, warm = await pipe.execute()
+        return [text.decode() for text in frames], bool(warm)
+
+
+_store = None
+
+
+def get_recent_frames():
+    """The recent-frame store of this process."""
+    global _store
+    if _store is None:
+        size = getattr(settings, "CHAT_RECENT_MESSAGES", 50)
+        url = getattr(settings, "CHAT_RECENT_REDIS_URL", None)
+        if url:
+            _store = RedisRecentFrames(url, size, getattr(settings, "CHAT_RECENT_TTL", 86400))
+        else:
+            _store = LocalRecentFrames(size)
+    return _store
+
+
+async def recent_frames(store, group_id):
+    """The last frames of a group, oldest first; filled from the database when cold."""
+    frames, warm = await store.get(group_id)
+    if not warm:
+        frames = await store.fill(group_id, await database_sync_to_async(frames_from_db)(group_id, store.size))
+    return frames
+
+
+def frames_from_db(group_id, limit):
+    messages = list(
+        ChatMessage.objects.filter(group_id=group_id)
+        .select_related('user')
+        .only('uuid', 'user_id', 'user__username', 'message', 'timestamp')
+        .order_by('-timestamp', '-id')[:limit]
+    )
+    messages.reverse()
+    return [chat_events.message_frame(message, message.user.username) for message in messages]
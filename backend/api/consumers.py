@@ -1,17 +1,31 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import StudyGroup, ChatMessage
+from django.conf import settings
+from . import chat_events, metrics
+from .chat_buffer import get_chat_buffer, write_behind_enabled
+from .chat_limits import MessageLimiter, pending_write_bytes
+from .chat_recent import get_recent_frames, recent_frames
+from .membership import chat_group_name, is_group_member
+from .models import ChatMessage
 from django.contrib.auth.models import AnonymousUser
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    limiter = None
+    closing = False
+
     async def connect(self):
         self.group_id = self.scope['url_route']['kwargs']['group_id']
-        self.group_name = f'chat_{self.group_id}'
+        self.group_name = chat_group_name(self.group_id)
         self.user = self.scope['user']
 
-        # Reject connection if user is not authenticated
-        if self.user.is_anonymous:
+        # Reject connection if user is not authenticated, or if the group does not
+        # exist or the user is not a member. This is the only membership check for
+        # the lifetime of the connection, so receive() needs no DB reads; removing
+        # a member closes their connections through chat_revoked() instead.
+        if self.user.is_anonymous or not self.group_id.isdigit():
+            await self.close()
+        elif not await self.check_membership():
             await self.close()
         else:
             # Join the group
@@ -20,8 +34,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             await self.accept()
+            self.limiter = MessageLimiter(self.user.id)
+
+            # Replay the latest messages so a fresh connection starts with context.
+            for text in await recent_frames(get_recent_frames(), self.group_id):
+                await self.send(text_data=text)
 
     async def disconnect(self, close_code):
+        if self.limiter is not None:
+            self.limiter.close()
         # Leave the group
         await self.channel_layer.group_discard(
             self.group_name,
@@ -29,41 +50,74 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
     async def receive(self, text_data):
+        max_bytes = getattr(settings, "CHAT_MAX_FRAME_BYTES", 8192)
+        # The character count is checked first so huge frames are never encoded.
+        if len(text_data) > max_bytes or len(text_data.encode()) > max_bytes:
+            metrics.incr('chat_frames_too_large')
+            await self.close(code=1009)
+            return
+        if not self.limiter.allow():
+            metrics.incr('chat_frames_throttled')
+            await self.send(text_data=chat_events.error_frame('rate_limited', 'Too many messages; slow down.'))
+            return
+
         data = json.loads(text_data)
         message = data.get('message', '').strip()
 
         if message:
-            # Save the message to DB
-            chat_message = await self.save_message(message)
+            if write_behind_enabled():
+                # uuid and timestamp are assigned here; the row is written after the broadcast.
+                chat_message = ChatMessage(group_id=self.group_id, user=self.user, message=message)
+            else:
+                # Save the message to DB
+                chat_message = await self.save_message(message)
 
-            # Broadcast to group
+            # Encode once here; every consumer in the group just forwards the text.
+            text = chat_events.message_frame(chat_message, self.user.username)
             await self.channel_layer.group_send(
                 self.group_name,
                 {
-                    'type': 'chat_message',
-                    'message': chat_message.message,
-                    'username': self.user.username,
-                    'timestamp': chat_message.timestamp.isoformat(),  # ISO format for frontend
+                    'type': 'chat.frame',
+                    'text': text,
                 }
             )
+            await get_recent_frames().push(self.group_id, text)
+
+            if write_behind_enabled():
+                await get_chat_buffer().add(chat_message)
 
-    async def chat_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'message': event['message'],
-            'username': event['username'],
-            'timestamp': event['timestamp'],
-        }))
+    async def chat_frame(self, event):
+        if self.closing:
+            return
+        # A client that is not reading its frames gets no more of them.
+        pending = pending_write_bytes(self.base_send)
+        if pending is not None and pending > getattr(settings, "CHAT_OUTBOUND_BUFFER_LIMIT", 256 * 1024):
+            if getattr(settings, "CHAT_SLOW_CONSUMER_POLICY", "drop") == "disconnect":
+                metrics.incr('chat_slow_consumers_disconnected')
+                self.closing = True
+                await self.close(code=1008)
+            else:
+                metrics.incr('chat_frames_dropped')
+            return
+        # Forward the pre-encoded frame to the WebSocket
+        await self.send(text_data=event['text'])
+
+    async def chat_revoked(self, event):
+        # Sent by api.membership when members leave, are removed or the group is deleted.
+        if self.user.id in event['user_ids'] and not self.closing:
+            self.closing = True
+            await self.send(text_data=chat_events.error_frame('membership_revoked', 'You are no longer a member of this group.'))
+            await self.close(code=4003)
+
+    @database_sync_to_async
+    def check_membership(self):
+        return is_group_member(self.group_id, self.user.id)
 
     @database_sync_to_async
     def save_message(self, message):
-        try:
-            group = StudyGroup.objects.get(id=self.group_id)
-            return ChatMessage.objects.create(
-                group=group,
-                user=self.user,
-                message=message
-            )
-        except StudyGroup.DoesNotExist:
-            # Handle the case where group doesn't exist
-            raise ValueError(f"StudyGroup with id {self.group_id} does not exist.")
+        # The group was verified in connect(), so it is not fetched again here.
+        return ChatMessage.objects.create(
+            group_id=self.group_id,
+            user=self.user,
+            message=message
+        )
@@ -0,0 +1,294 @@
+"""
+Process-wide in-memory index of registered face encodings.
+
+All known encodings live in one contiguous float32 matrix with a parallel
+array of user ids, so a face login is a single vectorized distance
+computation plus an argmin instead of a Python loop over every profile.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from . import face_codec
+
+logger = logging.getLogger(__name__)
+
+ENCODING_DIM = 128
+LOAD_CHUNK_SIZE = 2000
+
+# Rows written by other worker processes are picked up by re-reading profiles
+# whose face_updated_at is newer than the previous sync. The overlap covers
+# rows stamped before that sync whose transaction only committed after it.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def get_match_tolerance():
+    # 0.6 is face_recognition's own default for compare_faces.
+    return getattr(settings, "FACE_MATCH_TOLERANCE", 0.6)
+
+
+class FaceMatch:
+    def __init__(self, user_id, distance):
+        self.user_id = user_id
+        self.distance = distance
+
+    def __repr__(self):
+        return f"FaceMatch(user_id={self.user_id}, distance={self.distance:.4f})"
+
+
+class FaceIndex:
+    """
+    Exact nearest-neighbour index over face encodings.
+
+    Rows are appended into spare capacity and replaced in place, so
+    registering a face never rebuilds the matrix.
+    """
+
+    def __init__(self, dim=ENCODING_DIM, initial_capacity=1024):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._encodings = np.empty((initial_capacity, dim), dtype=np.float32)
+        self._sq_norms = np.empty(initial_capacity, dtype=np.float32)
+        self._user_ids = np.empty(initial_capacity, dtype=np.int64)
+        self._positions = {}
+        self._size = 0
+        self._loaded = False
+        self._recent = {}
+        self._synced_until = None
+        self._last_sync = 0.0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def user_ids(self):
+        return self._user_ids[:self._size]
+
+    @property
+    def encodings(self):
+        return self._encodings[:self._size]
+
+    @property
+    def nbytes(self):
+        return self._encodings.nbytes + self._sq_norms.nbytes + self._user_ids.nbytes
+
+    def _grow(self, min_capacity):
+        capacity = max(min_capacity, 2 * len(self._user_ids))
+        encodings = np.empty((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        user_ids = np.empty(capacity, dtype=np.int64)
+        encodings[:self._size] = self._encodings[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        user_ids[:self._size] = self._user_ids[:self._size]
+        self._encodings, self._sq_norms, self._user_ids = encodings, sq_norms, user_ids
+
+    def _put(self, user_id, encoding):
+        row = self._positions.get(user_id)
+        if row is None:
+            if self._size == len(self._user_ids):
+                self._grow(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._positions[user_id] = row
+            self._user_ids[row] = user_id
+        self._encodings[row] = encoding
+        self._sq_norms[row] = np.dot(self._encodings[row], self._encodings[row])
+
+    def _drop(self, user_id):
+        row = self._positions.pop(user_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            # Move the last row into the hole to keep the matrix contiguous.
+            moved_user = int(self._user_ids[last])
+            self._encodings[row] = self._encodings[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._user_ids[row] = moved_user
+            self._positions[moved_user] = row
+        self._size = last
+
+    def add(self, user_id, encoding):
+        """Insert or replace the encoding stored for ``user_id``."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            self._put(int(user_id), encoding)
+
+    def remove(self, user_id):
+        with self._lock:
+            self._drop(int(user_id))
+
+    def bulk_load(self, user_ids, encodings):
+        """Replace the whole index with the given ids and (N, dim) encodings."""
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        with self._lock:
+            self._encodings = encodings.copy()
+            self._sq_norms = np.einsum('ij,ij->i', self._encodings, self._encodings)
+            self._user_ids = user_ids.copy()
+            self._positions = {int(uid): row for row, uid in enumerate(user_ids)}
+            self._size = len(user_ids)
+
+    def distances(self, encoding):
+        """Euclidean distance from ``encoding`` to every indexed row."""
+        query = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            size = self._size
+            encodings = self._encodings[:size]
+            sq_norms = self._sq_norms[:size]
+            user_ids = self._user_ids[:size]
+        # ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2, one matrix-vector product.
+        sq_dist = sq_norms - 2.0 * (encodings @ query) + np.dot(query, query)
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+        return user_ids, np.sqrt(sq_dist)
+
+    def search(self, encoding, tolerance=None):
+        """
+        Return the closest :class:`FaceMatch` within ``tolerance``, or ``None``.
+        """
+        if tolerance is None:
+            tolerance = get_match_tolerance()
+        user_ids, distances = self.distances(encoding)
+        if len(distances) == 0:
+            return None
+        best = int(np.argmin(distances))
+        if distances[best] > tolerance:
+            return None
+        return FaceMatch(int(user_ids[best]), float(distances[best]))
+
+    # ------------------------
+    # Database synchronisation
+    # ------------------------
+    def load(self):
+        """Build the index from every profile that has a registered face."""
+        from .models import UserProfile
+
+        started = timezone.now()
+        rows = UserProfile.objects.filter(face_encoding__isnull=False).values_list(
+            'user_id', 'face_encoding', 'face_updated_at'
+        )
+        user_ids, blocks, recent = [], [], {}
+        chunk = []
+        for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == LOAD_CHUNK_SIZE:
+                self._decode_chunk(chunk, user_ids, blocks, recent, started - SYNC_OVERLAP)
+                chunk = []
+        if chunk:
+            self._decode_chunk(chunk, user_ids, blocks, recent, started - SYNC_OVERLAP)
+        encodings = np.concatenate(blocks) if blocks else np.empty((0, self.dim), dtype=np.float32)
+        self.bulk_load(np.concatenate(user_ids) if user_ids else [], encodings)
+        self._recent = recent
+        self._synced_until = started
+        self._loaded = True
+        self._last_sync = time.monotonic()
+
+    def _decode_chunk(self, chunk, user_ids, blocks, recent, window_start):
+        ids, raws, stamps = zip(*chunk)
+        matrix, valid = face_codec.decode_many(raws, self.dim)
+        # Profiles with bad face encodings are skipped.
+        user_ids.append(np.asarray(ids, dtype=np.int64)[valid])
+        blocks.append(matrix)
+        for user_id, stamp in zip(ids, stamps):
+            if stamp and stamp >= window_start:
+                recent[user_id] = stamp
+
+    def sync(self):
+        """Pick up faces registered or changed by other processes since the last sync."""
+        from .models import UserProfile
+
+        if not self._loaded:
+            self.load()
+            return
+        interval = getattr(settings, "FACE_INDEX_SYNC_INTERVAL", 0)
+        if interval and time.monotonic() - self._last_sync < interval:
+            return
+        self._last_sync = time.monotonic()
+
+        # Only stamps are read for the overlap window; encodings are fetched
+        # for rows that are new or changed since this process last saw them.
+        started = timezone.now()
+        stamps = dict(
+            UserProfile.objects.filter(face_updated_at__gte=self._synced_until - SYNC_OVERLAP)
+            .values_list('user_id', 'face_updated_at')
+        )
+        changed = [user_id for user_id, stamp in stamps.items() if self._recent.get(user_id) != stamp]
+        for start in range(0, len(changed), LOAD_CHUNK_SIZE):
+            rows = UserProfile.objects.filter(user_id__in=changed[start:start + LOAD_CHUNK_SIZE])
+            for user_id, raw in rows.values_list('user_id', 'face_encoding'):
+                encoding = _decode(raw)
+                if encoding is None:
+                    self.remove(user_id)
+                else:
+                    self.add(user_id, encoding)
+        self._recent = stamps
+        self._synced_until = started
+
+    def reset(self):
+        with self._lock:
+            self._positions = {}
+            self._size = 0
+        self._loaded = False
+        self._recent = {}
+        self._synced_until = None
+
+
+def _decode(raw):
+    try:
+        return face_codec.decode(raw, ENCODING_DIM)
+    except face_codec.FaceEncodingError:
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+_centroids_mtime = None
+
+
+def _centroids_path():
+    return getattr(settings, "FACE_IVF_CENTROIDS_PATH", None)
+
+
+def _current_centroids_mtime():
+    path = _centroids_path()
+    if getattr(settings, "FACE_INDEX_MODE", "exact") != "ivf" or not path or not os.path.exists(path):
+        return None
+    return os.path.getmtime(path)
+
+
+def build_index():
+    """
+    A new, empty index of the kind selected by ``FACE_INDEX_MODE``.
+
+    ``"ivf"`` needs centroids trained by ``manage.py rebuild_face_index``;
+    until they exist the exact index is used.
+    """
+    if getattr(settings, "FACE_INDEX_MODE", "exact") == "ivf":
+        path = _centroids_path()
+        if path and os.path.exists(path):
+            from .face_ivf import IVFFaceIndex
+            return IVFFaceIndex(np.load(path), nprobe=getattr(settings, "FACE_IVF_NPROBE", 8))
+        logger.warning("FACE_INDEX_MODE is 'ivf' but no centroids at %s; using exact search.", path)
+    return FaceIndex()
+
+
+def get_face_index():
+    """
+    The index shared by every request handled in this process.
+
+    It is rebuilt when ``rebuild_face_index`` writes new centroids.
+    """
+    global _index, _centroids_mtime
+    mtime = _current_centroids_mtime()
+    if _index is None or mtime != _centroids_mtime:
+        with _index_lock:
+            if _index is None or mtime != _centroids_mtime:
+                _index = build_index()
+                _centroids_mtime = mtime
+    return _index
@@ -0,0 +1,156 @@
+"""
+Approximate face search with an inverted-file (IVF) partition.
+
+Encodings are bucketed into cells around coarse k-means centroids. A query
+only scans the ``nprobe`` cells whose centroids are closest to it, so the
+work per login grows with N / nlist * nprobe instead of N.
+
+Centroids are trained offline by ``manage.py rebuild_face_index`` and saved
+to ``FACE_IVF_CENTROIDS_PATH``; every worker loads them when it builds its
+index.
+"""
+import numpy as np
+
+from .face_index import ENCODING_DIM, FaceIndex, FaceMatch, get_match_tolerance
+
+KMEANS_CHUNK = 65536
+
+
+def _sq_distances(points, centroids, centroid_sq_norms):
+    # Only the relative order matters for assignment, so ||p||^2 is dropped.
+    return centroid_sq_norms[None, :] - 2.0 * (points @ centroids.T)
+
+
+def assign(points, centroids):
+    """Index of the nearest centroid for every row of ``points``."""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, centroids.shape[1])
+    centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(points), dtype=np.int32)
+    for start in range(0, len(points), KMEANS_CHUNK):
+        chunk = points[start:start + KMEANS_CHUNK]
+        labels[start:start + KMEANS_CHUNK] = np.argmin(_sq_distances(chunk, centroids, centroid_sq_norms), axis=1)
+    return labels
+
+
+def train_centroids(encodings, nlist, iterations=20, sample_size=100_000, seed=0):
+    """Lloyd's k-means over (a sample of) ``encodings``; returns (nlist, dim) float32."""
+    rng = np.random.default_rng(seed)
+    encodings = np.asarray(encodings, dtype=np.float32)
+    if len(encodings) < nlist:
+        raise ValueError(f"Need at least nlist={nlist} encodings to train, got {len(encodings)}.")
+    if len(encodings) > sample_size:
+        encodings = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+    centroids = encodings[rng.choice(len(encodings), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(encodings, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, encodings)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty cells with random points so every cell stays useful.
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = encodings[rng.choice(len(encodings), len(empty), replace=False)]
+    return centroids
+
+
+class IVFFaceIndex(FaceIndex):
+    """
+    Drop-in replacement for :class:`FaceIndex` that searches ``nprobe`` cells.
+
+    Every cell is itself a small exact :class:`FaceIndex`, so adds and
+    removals stay incremental.
+    """
+
+    def __init__(self, centroids, nprobe=8, dim=ENCODING_DIM):
+        super().__init__(dim=dim, initial_capacity=0)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self._cells = [FaceIndex(dim=dim, initial_capacity=16) for _ in range(len(self.centroids))]
+        self._cell_of = {}
+
+    @property
+    def nlist(self):
+        return len(self._cells)
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes + sum(cell.nbytes for cell in self._cells)
+
+    def cell_sizes(self):
+        return np.array([len(cell) for cell in self._cells])
+
+    def add(self, user_id, encoding):
+        user_id = int(user_id)
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        cell = int(assign(encoding, self.centroids)[0])
+        with self._lock:
+            previous = self._cell_of.get(user_id)
+            if previous is not None and previous != cell:
+                self._cells[previous].remove(user_id)
+            self._cell_of[user_id] = cell
+        self._cells[cell].add(user_id, encoding)
+
+    def remove(self, user_id):
+        user_id = int(user_id)
+        with self._lock:
+            cell = self._cell_of.pop(user_id, None)
+        if cell is not None:
+            self._cells[cell].remove(user_id)
+
+    def bulk_load(self, user_ids, encodings):
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        labels = assign(encodings, self.centroids)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        with self._lock:
+            for cell in range(self.nlist):
+                rows = order[bounds[cell]:bounds[cell + 1]]
+                self._cells[cell].bulk_load(user_ids[rows], encodings[rows])
+            self._cell_of = dict(zip(user_ids.tolist(), labels.tolist()))
+
+    def probe(self, encoding, nprobe=None):
+        """Cells to scan for ``encoding``, nearest centroid first."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        query = np.asarray(encoding, dtype=np.float32).reshape(1, self.dim)
+        distances = _sq_distances(query, self.centroids, self._centroid_sq_norms)[0]
+        if nprobe >= self.nlist:
+            return np.argsort(distances)
+        nearest = np.argpartition(distances, nprobe - 1)[:nprobe]
+        return nearest[np.argsort(distances[nearest])]
+
+    def distances(self, encoding, nprobe=None):
+        ids, dists = [], []
+        for cell in self.probe(encoding, nprobe):
+            cell_ids, cell_dists = self._cells[cell].distances(encoding)
+            ids.append(cell_ids)
+            dists.append(cell_dists)
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(ids), np.concatenate(dists)
+
+    def search(self, encoding, tolerance=None, nprobe=None):
+        if tolerance is None:
+            tolerance = get_match_tolerance()
+        user_ids, distances = self.distances(encoding, nprobe)
+        if len(distances) == 0:
+            return None
+        best = int(np.argmin(distances))
+        if distances[best] > tolerance:
+            return None
+        return FaceMatch(int(user_ids[best]), float(distances[best]))
+
+    def reset(self):
+        with self._lock:
+            for cell in self._cells:
+                cell.reset()
+            self._cell_of = {}
+        self._loaded = False
+        self._recent = {}
+        self._synced_until = None
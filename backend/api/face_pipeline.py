@@ -0,0 +1,134 @@
+"""
+Face detection and encoding off the request thread.
+
+Uploads are normalised first (EXIF rotation, downscaling, RGB) and then
+encoded in a dedicated, bounded process pool. When more than
+``FACE_QUEUE_LIMIT`` images are already waiting, :class:`FacePoolBusy` is
+raised straight away so the view can answer 503 instead of piling up work.
+A worker that dies (OOM-killed, segfault in dlib) breaks the whole pool; the
+pool is then replaced and the request that hit it also gets FacePoolBusy.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+from PIL import Image, ImageOps
+
+
+class FacePoolBusy(Exception):
+    pass
+
+
+def preprocess_image(image_bytes, max_dimension):
+    """Decode an upload into an upright RGB array no larger than ``max_dimension``."""
+    image = Image.open(io.BytesIO(image_bytes))
+    if max_dimension:
+        # Lets the JPEG decoder skip most of the work for large reductions.
+        image.draft('RGB', (max_dimension, max_dimension))
+    # Phone cameras store rotation in EXIF; detection needs the face upright.
+    image = ImageOps.exif_transpose(image)
+    if max_dimension and max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return np.asarray(image.convert('RGB'))
+
+
+def compute_encodings(image_bytes, max_dimension):
+    """Runs inside a pool worker. Returns one 128-d encoding per detected face."""
+    import face_recognition
+
+    return face_recognition.face_encodings(preprocess_image(image_bytes, max_dimension))
+
+
+def encode_photo(name, image_bytes, max_dimension):
+    """Runs in a pool worker for enrol_faces. Returns (name, status, encoding-or-detail)."""
+    try:
+        encodings = compute_encodings(image_bytes, max_dimension)
+    except Exception as e:
+        return name, 'error', str(e)
+    if len(encodings) == 0:
+        return name, 'no_face', 'No face found in the image.'
+    if len(encodings) > 1:
+        return name, 'multiple_faces', f'{len(encodings)} faces found in the image.'
+    return name, 'ok', encodings[0]
+
+
+class FaceWorkerPool:
+    def __init__(self, workers, queue_limit, max_dimension, function=compute_encodings):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.max_dimension = max_dimension
+        # Called in a worker as function(image_bytes, max_dimension).
+        self.function = function
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        # spawn, not fork: the parent holds DB connections and server threads.
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _replace_broken(self, executor):
+        """Swap in a new executor, unless another thread already replaced ``executor``."""
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            return self._executor
+
+    def _submit(self, image_bytes):
+        """``(executor, future)`` for ``image_bytes``."""
+        if not self._slots.acquire(blocking=False):
+            raise FacePoolBusy("Too many face images are already being processed.")
+        executor = self._executor
+        try:
+            try:
+                future = executor.submit(self.function, image_bytes, self.max_dimension)
+            except BrokenProcessPool:
+                # Broken by an earlier task; this one has not run yet, so retry it once.
+                executor = self._replace_broken(executor)
+                future = executor.submit(self.function, image_bytes, self.max_dimension)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return executor, future
+
+    def submit(self, image_bytes):
+        return self._submit(image_bytes)[1]
+
+    def encode(self, image_bytes, timeout=None):
+        """Encode ``image_bytes`` in the pool and wait for the result."""
+        if timeout is None:
+            timeout = getattr(settings, "FACE_WORK_TIMEOUT", 30)
+        executor, future = self._submit(image_bytes)
+        try:
+            return future.result(timeout=timeout)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            raise FacePoolBusy("A face worker process died; the pool has been restarted.")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_face_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = getattr(settings, "FACE_WORKERS", None) or max(1, (os.cpu_count() or 2) // 2)
+                _pool = FaceWorkerPool(
+                    workers=workers,
+                    queue_limit=getattr(settings, "FACE_QUEUE_LIMIT", None) or workers * 4,
+                    max_dimension=getattr(settings, "FACE_IMAGE_MAX_DIMENSION", 1024),
+                )
+    return _pool
@@ -0,0 +1,94 @@
+"""
+A local stand-in for the JSearch API, for tests and ingestion benchmarks.
+
+Serves ``GET /search`` with deterministic synthetic jobs derived from the
+query, country and page, after an optional artificial latency, and can
+fail a fraction of requests with 503 to exercise retries. Point
+JSearchSource (or ``fetch_jobs --base-url``) at :attr:`FixtureServer.url`.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+EMPLOYMENT_TYPES = ('FULLTIME', 'PARTTIME', 'INTERN', 'CONTRACTOR')
+SKILLS = ('Python', 'Django', 'React', 'SQL', 'Docker', 'AWS', 'Java', 'Kubernetes', 'Git', 'REST APIs')
+
+
+def fixture_jobs(query, country, page, per_page=10):
+    jobs = []
+    for i in range(per_page):
+        n = (page - 1) * per_page + i
+        rng = random.Random(f'{query}|{country}|{n}')
+        skills = rng.sample(SKILLS, 3)
+        jobs.append({
+            'job_id': f'{country}-{zlib.crc32(query.encode())}-{n}',
+            'job_title': f'{query.title()} #{n}',
+            'employer_name': f'Company {rng.randint(1, 500)}',
+            'job_city': f'City {rng.randint(1, 50)}',
+            'job_country': country.upper(),
+            'job_employment_type': rng.choice(EMPLOYMENT_TYPES),
+            'job_apply_link': f'https://jobs.example.com/{country}/{query.replace(" ", "-")}/{n}',
+            'job_description': f'We are hiring. Skills: {", ".join(skills)}. ' + 'Lorem ipsum. ' * 40,
+            'job_posted_at_timestamp': 1_700_000_000 + n * 3600,
+            'job_offer_expiration_timestamp': 1_700_000_000 + n * 3600 + 30 * 86400,
+        })
+    return jobs
+
+
+class FixtureServer:
+    """Runs the fixture API on a background thread; usable as a context manager."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, pages=5, per_page=10):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip('/') != '/search':
+                    self.send_error(404)
+                    return
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                server.requests += 1
+                time.sleep(server.latency)
+                if server.failure_rate and random.random() < server.failure_rate:
+                    self.send_error(503)
+                    return
+                page = int(params.get('page', 1))
+                data = fixture_jobs(params.get('query', ''), params.get('country', 'us'), page, server.per_page)
+                body = json.dumps({'status': 'OK', 'data': data if page <= server.pages else []}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.pages = pages
+        self.per_page = per_page
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,326 @@
+"""
+Concurrent job-listing ingestion for the fetch_jobs command.
+
+An ingestion run is the cross product of search queries, countries and
+result pages. Pages are fetched on a thread pool sharing one pooled
+``requests.Session`` (retries with jittered exponential backoff, honouring
+Retry-After) and a global rate limit, and the jobs are written to the
+database as pages arrive, in batched upserts on the calling thread.
+
+Runs are incremental: a JobIngestionCheckpoint per query and country holds
+the newest posting date seen so far, and the next run only asks the source
+for jobs posted since ``JOB_INGESTION_OVERLAP_HOURS`` before it, which
+still covers jobs the source indexed late. Results come in relevance
+order, not by date, so every page up to ``pages`` is fetched (or until one
+comes back empty); jobs saved before are recognised by their content hash
+and skipped. Checkpoints only move forward after every page of a query and
+country was fetched and its jobs were saved.
+
+Where the jobs come from is a :class:`JobSource`. :class:`JSearchSource`
+talks to the JSearch API on RapidAPI, or to anything that speaks the same
+protocol at another base URL, such as the fixture server in
+api.job_fixtures.
+"""
+import abc
+import datetime
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .job_skills import SkillMatcher, index_jobs
+from .models import JobIngestionCheckpoint, JobListing
+
+# JSearch job_employment_type values, mapped onto JobListing.JOB_TYPE_CHOICES.
+JOB_TYPES = {
+    'FULLTIME': 'Full-time',
+    'PARTTIME': 'Part-time',
+    'INTERN': 'Internship',
+    'CONTRACTOR': 'Contract',
+}
+
+
+@dataclass(frozen=True)
+class PageRequest:
+    query: str
+    country: str
+    page: int
+    # Narrows the source's date filter: the checkpoint watermark less the overlap.
+    since: datetime.datetime = None
+
+
+@dataclass
+class IngestionStats:
+    pages: int = 0
+    failed_pages: int = 0
+    jobs: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
+class RateLimiter:
+    """Spaces calls to :meth:`wait` at least ``1 / rate`` seconds apart, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def build_session(pool_size, retries=3, backoff=0.5):
+    """A Session whose connection pool fits ``pool_size`` threads, with jittered retries."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        backoff_jitter=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def parse_timestamp(raw, timestamp_key, datetime_key):
+    """An aware datetime from a Unix timestamp field or, failing that, an ISO 8601 field."""
+    try:
+        if raw.get(timestamp_key):
+            return datetime.datetime.fromtimestamp(int(raw[timestamp_key]), tz=datetime.timezone.utc)
+        when = parse_datetime(raw.get(datetime_key) or '')
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    if when is not None and timezone.is_naive(when):
+        when = timezone.make_aware(when, datetime.timezone.utc)
+    return when
+
+
+def date_posted_window(since):
+    """The narrowest JSearch ``date_posted`` filter that still covers everything posted since ``since``."""
+    if since is None:
+        return 'all'
+    age = timezone.now() - since
+    for window, days in (('3days', 3), ('week', 7), ('month', 30)):
+        if age < datetime.timedelta(days=days):
+            return window
+    return 'all'
+
+
+class JobSource(abc.ABC):
+    """Fetches one page of raw jobs and turns a raw job into JobListing fields."""
+
+    @abc.abstractmethod
+    def fetch_page(self, session, request):
+        """The raw jobs of ``request`` (a PageRequest); an empty list past the last page."""
+
+    @abc.abstractmethod
+    def parse(self, raw):
+        """The JobListing field values of one raw job."""
+
+
+class JSearchSource(JobSource):
+    def __init__(self, base_url=None, api_key=None, timeout=30):
+        self.base_url = (base_url or getattr(settings, "JSEARCH_BASE_URL", "https://jsearch.p.rapidapi.com")).rstrip('/')
+        self.api_key = api_key if api_key is not None else getattr(settings, "RAPIDAPI_KEY", "")
+        self.timeout = timeout
+
+    def fetch_page(self, session, request):
+        response = session.get(
+            f'{self.base_url}/search',
+            params={
+                'query': request.query,
+                'country': request.country,
+                'page': request.page,
+                'num_pages': 1,
+                'date_posted': date_posted_window(request.since),
+            },
+            headers={
+                'X-RapidAPI-Key': self.api_key,
+                'X-RapidAPI-Host': 'jsearch.p.rapidapi.com',
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json().get('data') or []
+
+    def parse(self, raw):
+        location = ', '.join(part for part in (raw.get('job_city'), raw.get('job_country')) if part)
+        # Truncated to the column sizes so one long field cannot fail the page.
+        return {
+            'application_url': (raw.get('job_apply_link') or 'N/A')[:500],
+            'title': (raw.get('job_title') or 'No Title Provided')[:255],
+            'company_name': (raw.get('employer_name') or 'N/A')[:255],
+            'location': (location or 'N/A')[:150],
+            'description': raw.get('job_description') or 'No Description Provided',
+            'job_type': JOB_TYPES.get((raw.get('job_employment_type') or '').upper(), 'Full-time'),
+            'posted_date': parse_timestamp(raw, 'job_posted_at_timestamp', 'job_posted_at_datetime_utc'),
+            'expires_at': parse_timestamp(raw, 'job_offer_expiration_timestamp', 'job_offer_expiration_datetime_utc'),
+        }
+
+
+def save_jobs(jobs, stats, matcher=None):
+    """
+    Upserts a batch of parsed jobs keyed on the normalized application URL:
+    one SELECT for the stored content hashes, then one INSERT ... ON CONFLICT
+    DO UPDATE for the jobs that are new or changed, whose skill postings are
+    then rebuilt. Unchanged jobs are skipped. Content is hashed as it will be
+    stored, like JobListing.save() does.
+    """
+    listings = {}
+    for fields in jobs:
+        listing = JobListing(**fields)
+        listing.application_url_hash = JobListing.hash_url(listing.application_url)
+        listings[listing.application_url_hash] = listing  # A later duplicate in the batch wins.
+
+    stored = {
+        key: (content_hash, posted_date)
+        for key, content_hash, posted_date in JobListing.objects.filter(application_url_hash__in=listings)
+        .values_list('application_url_hash', 'content_hash', 'posted_date')
+    }
+    now = timezone.now()
+    changed = []
+    for key, listing in listings.items():
+        if listing.posted_date is None:
+            # The source does not say when it was posted: keep when we first saw it.
+            listing.posted_date = stored[key][1] if key in stored else now
+        listing.content_hash = listing.hash_content()
+        if key not in stored:
+            stats.created += 1
+        elif stored[key][0] != listing.content_hash:
+            stats.updated += 1
+        else:
+            stats.unchanged += 1
+            continue
+        changed.append(listing)
+
+    if changed:
+        JobListing.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['application_url_hash'],
+            update_fields=[*JobListing.CONTENT_FIELDS, 'content_hash', 'updated_at'],
+        )
+        saved = JobListing.objects.filter(application_url_hash__in=[listing.application_url_hash for listing in changed])
+        for key, pk, posted_date in saved.values_list('application_url_hash', 'id', 'posted_date'):
+            listings[key].id, listings[key].posted_date = pk, posted_date
+        index_jobs(changed, matcher)
+
+
+def ingest(source, queries, countries, pages, workers=4, rate=5.0, batch_size=500, on_page=None, incremental=True):
+    """
+    Fetches up to ``pages`` pages for every query and country and saves the
+    jobs in batches of about ``batch_size``. The queries and countries are
+    fetched concurrently and each one's pages in order, stopping at the
+    first empty page. ``on_page(request, jobs_or_exception)`` is called as each page
+    completes. With ``incremental`` the checkpoints are used and advanced.
+    """
+    streams = list(itertools.product(queries, countries))
+    checkpoints = {}
+    if incremental:
+        for checkpoint in JobIngestionCheckpoint.objects.filter(query__in=queries, country__in=countries):
+            checkpoints[checkpoint.query, checkpoint.country] = checkpoint
+    overlap = datetime.timedelta(hours=getattr(settings, "JOB_INGESTION_OVERLAP_HOURS", 72))
+    limiter = RateLimiter(rate)
+    matcher = SkillMatcher.from_db()
+    stats = IngestionStats()
+    pending = []
+    newest = {}
+    failed = set()
+
+    def fetch(request):
+        limiter.wait()
+        return source.fetch_page(session, request)
+
+    with build_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for query, country in streams:
+            checkpoint = checkpoints.get((query, country))
+            since = checkpoint.watermark - overlap if checkpoint and checkpoint.watermark else None
+            request = PageRequest(query, country, 1, since)
+            futures[pool.submit(fetch, request)] = request
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                request = futures.pop(future)
+                stream = (request.query, request.country)
+                try:
+                    raw_jobs = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    stats.failed_pages += 1
+                    failed.add(stream)
+                    if on_page:
+                        on_page(request, e)
+                    continue
+                jobs = [source.parse(raw) for raw in raw_jobs]
+                dates = [job['posted_date'] for job in jobs if job.get('posted_date')]
+                if dates:
+                    newest[stream] = max(dates + ([newest[stream]] if stream in newest else []))
+                # Jobs already saved are counted as unchanged by the upsert, not written again.
+                pending.extend(jobs)
+                if len(pending) >= batch_size:
+                    save_jobs(pending, stats, matcher)
+                    pending = []
+                stats.pages += 1
+                stats.jobs += len(jobs)
+                if on_page:
+                    on_page(request, jobs)
+
+                if jobs and request.page < pages:
+                    next_request = replace(request, page=request.page + 1)
+                    futures[pool.submit(fetch, next_request)] = next_request
+    if pending:
+        save_jobs(pending, stats, matcher)
+
+    if incremental:
+        for stream in streams:
+            if stream in failed:
+                continue
+            checkpoint = checkpoints.get(stream) or JobIngestionCheckpoint(query=stream[0], country=stream[1])
+            if stream in newest and (checkpoint.watermark is None or newest[stream] > checkpoint.watermark):
+                checkpoint.watermark = newest[stream]
+            checkpoint.save()
+    return stats
+
+
+def stale_jobs(max_age_days, now=None):
+    """Listings that have expired, or are older than ``max_age_days`` and have no expiry date."""
+    now = now or timezone.now()
+    return JobListing.objects.filter(
+        Q(expires_at__lt=now) | Q(expires_at__isnull=True, posted_date__lt=now - datetime.timedelta(days=max_age_days))
+    )
+
+
+def expire_jobs(max_age_days, batch_size=1000, now=None):
+    """
+    Deletes :func:`stale_jobs` ``batch_size`` at a time, so no transaction
+    holds many locks. Returns the number deleted.
+    """
+    stale = stale_jobs(max_age_days, now)
+    deleted = 0
+    while True:
+        ids = list(stale.order_by().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        JobListing.objects.filter(id__in=ids).only('id').delete()
+        deleted += len(ids)
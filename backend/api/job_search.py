@@ -0,0 +1,113 @@
+"""
+Ranked full-text search and filtering over JobListing.
+
+Matches title (weight A), company name (B) and description (C):
+
+* PostgreSQL: a stored, generated ``search_vector`` tsvector column with a
+  GIN index (migration 0019), queried with ``websearch_to_tsquery`` and
+  ranked with ``ts_rank``. To keep latency flat on very common terms,
+  only the newest ``JOB_SEARCH_MAX_CANDIDATES`` matches are ranked.
+* SQLite: an external-content FTS5 table ``api_joblisting_fts`` kept in
+  sync by triggers, ranked with ``bm25``.
+* Anything else: case-insensitive substring matching, newest first.
+
+The column and the FTS table are created by migrations only; the model
+does not know about them.
+"""
+import datetime
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Left
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import JobListing, JobListingFTS
+
+SNIPPET_LENGTH = 280
+
+
+def parse_when(value):
+    """An ISO 8601 date or datetime as an aware datetime, or None if it is not one."""
+    try:
+        # Both raise ValueError for well-formed but impossible values, such as 2024-02-30.
+        when = parse_datetime(value)
+        if when is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            when = datetime.datetime.combine(day, datetime.time.min)
+    except ValueError:
+        return None
+    return timezone.make_aware(when) if timezone.is_naive(when) else when
+
+
+def filter_jobs(queryset, job_type=None, location=None, posted_after=None, posted_before=None):
+    """The indexed filters; ``location`` is a case-insensitive prefix such as a city."""
+    if job_type:
+        queryset = queryset.filter(job_type=job_type)
+    if location:
+        queryset = queryset.filter(location__istartswith=location)
+    if posted_after:
+        queryset = queryset.filter(posted_date__gte=posted_after)
+    if posted_before:
+        queryset = queryset.filter(posted_date__lt=posted_before)
+    return queryset
+
+
+def search_jobs(query, **filters):
+    """
+    Listings matching ``query`` (free text, may be empty) and ``filters``,
+    best match first, with ``rank`` and a ``snippet`` of the description.
+    """
+    queryset = filter_jobs(JobListing.objects.all(), **filters)
+    query = (query or '').strip()
+    if not query:
+        ranked = queryset.annotate(rank=RawSQL('0', [], output_field=FloatField())).order_by('-posted_date', '-id')
+    elif connection.vendor == 'postgresql':
+        ranked = _search_postgres(queryset, query)
+    elif connection.vendor == 'sqlite':
+        ranked = _search_sqlite(queryset, query)
+    else:
+        ranked = queryset.filter(
+            Q(title__icontains=query) | Q(company_name__icontains=query) | Q(description__icontains=query)
+        ).annotate(rank=RawSQL('0', [], output_field=FloatField())).order_by('-posted_date', '-id')
+    return ranked.defer('description').annotate(snippet=Left('description', SNIPPET_LENGTH))
+
+
+def _search_postgres(queryset, query):
+    tsquery = "websearch_to_tsquery('english', %s)"
+    # search_vector is left unqualified: in the subquery Django aliases the table (U0).
+    candidates = (
+        queryset.filter(RawSQL(f'search_vector @@ {tsquery}', [query], output_field=BooleanField()))
+        .order_by('-posted_date')
+        .values('id')[:getattr(settings, "JOB_SEARCH_MAX_CANDIDATES", 10000)]
+    )
+    return JobListing.objects.filter(id__in=candidates).annotate(
+        rank=RawSQL(f'ts_rank(search_vector, {tsquery})', [query], output_field=FloatField()),
+    ).order_by('-rank', '-posted_date', '-id')
+
+
+def fts5_query(query):
+    """Free text as an FTS5 query: every word must match, as a prefix."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _search_sqlite(queryset, query):
+    fts = JobListingFTS._meta.db_table
+    match = fts5_query(query)
+    if not match:
+        return queryset.none().annotate(rank=RawSQL('0', [], output_field=FloatField()))
+    # Joined (through JobListing.fts) rather than ranked in a correlated
+    # subquery, so the MATCH runs once per search instead of once per
+    # matching row. bm25() is lower for better matches; the column weights
+    # mirror the A/B/C weights above.
+    return queryset.filter(
+        RawSQL(f'{fts} MATCH %s', [match], output_field=BooleanField()), fts__isnull=False,
+    ).annotate(
+        rank=RawSQL(f'-bm25({fts}, 10.0, 5.0, 1.0)', [], output_field=FloatField()),
+    ).order_by('-rank', '-posted_date', '-id')
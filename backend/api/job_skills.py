@@ -0,0 +1,138 @@
+"""
+Skill-to-job matching over a precomputed inverted index (JobSkill).
+
+Indexing happens when listings are written (save_jobs, or the
+rebuild_job_skill_index command after skills or aliases change): the title
+and description are tokenized once and every skill name or alias found in
+them becomes a posting weighted by where it was found.
+
+Recommending never reads descriptions. For each of the user's skills the
+strongest, newest ``JOB_RECOMMEND_CANDIDATES_PER_SKILL`` postings are read
+off the (skill, -weight, -posted_date) index; the union of those jobs is
+then scored exactly, in SQL, as the sum of posting weight x the user's
+proficiency over all of the user's skills.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Sum, Value, When
+
+from .models import JobListing, JobSkill, Skill, UserSkill
+
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+PROFICIENCY_WEIGHTS = {'Beginner': 1, 'Intermediate': 2, 'Advanced': 3, 'Expert': 4}
+
+# Words, keeping the punctuation skill names use: c++, c#, node.js, asp.net.
+TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+class SkillMatcher:
+    """Finds skills in free text by looking up every token n-gram in a phrase table."""
+
+    def __init__(self, skills):
+        """``skills`` is an iterable of ``(skill_id, [name, *aliases])``."""
+        self.phrases = {}
+        for skill_id, names in skills:
+            for name in names:
+                tokens = tuple(tokenize(name))
+                if tokens:
+                    self.phrases.setdefault(tokens, skill_id)
+        self.max_length = max(map(len, self.phrases), default=0)
+
+    @classmethod
+    def from_db(cls):
+        return cls((skill_id, [name, *aliases]) for skill_id, name, aliases in Skill.objects.values_list('id', 'name', 'aliases'))
+
+    def find(self, text):
+        tokens = tokenize(text)
+        found = set()
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + self.max_length, len(tokens)) + 1):
+                skill_id = self.phrases.get(tuple(tokens[start:end]))
+                if skill_id is not None:
+                    found.add(skill_id)
+        return found
+
+    def postings(self, job):
+        """``{skill_id: weight}`` for a listing."""
+        in_title = self.find(job.title)
+        in_description = self.find(job.description)
+        return {
+            skill_id: TITLE_WEIGHT * (skill_id in in_title) + DESCRIPTION_WEIGHT * (skill_id in in_description)
+            for skill_id in in_title | in_description
+        }
+
+
+def index_jobs(jobs, matcher=None):
+    """
+    Replaces the postings of saved listings (which need id, title,
+    description and posted_date). Returns the number of postings written.
+    """
+    matcher = matcher or SkillMatcher.from_db()
+    jobs = list(jobs)
+    postings = [
+        JobSkill(skill_id=skill_id, job_id=job.id, weight=weight, posted_date=job.posted_date)
+        for job in jobs
+        for skill_id, weight in matcher.postings(job).items()
+    ]
+    with transaction.atomic():
+        JobSkill.objects.filter(job_id__in=[job.id for job in jobs]).delete()
+        JobSkill.objects.bulk_create(postings, batch_size=1000)
+    return len(postings)
+
+
+def recommend_jobs(user, limit=20):
+    """
+    The best ``limit`` listings for ``user``'s skills, best first, each with
+    ``score`` and ``matched_skills`` (skill names) set. Descriptions are deferred.
+    """
+    skills = {
+        skill_id: (name, PROFICIENCY_WEIGHTS.get(proficiency, 1))
+        for skill_id, name, proficiency in UserSkill.objects.filter(user=user).values_list('skill_id', 'skill__name', 'proficiency')
+    }
+    if not skills:
+        return []
+
+    per_skill = getattr(settings, "JOB_RECOMMEND_CANDIDATES_PER_SKILL", 200)
+    candidates = set()
+    for skill_id in skills:
+        candidates.update(
+            JobSkill.objects.filter(skill_id=skill_id)
+            .order_by('-weight', '-posted_date', '-job_id')
+            .values_list('job_id', flat=True)[:per_skill]
+        )
+
+    # Other skills' postings score 0. Filtering on skill_id as well would let
+    # the planner scan whole posting lists instead of the candidates' postings.
+    proficiency = Case(
+        *(When(skill_id=skill_id, then=Value(weight)) for skill_id, (_, weight) in skills.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    best = list(
+        JobSkill.objects.filter(job_id__in=candidates)
+        .values('job_id')
+        .annotate(score=Sum(F('weight') * proficiency), posted=Max('posted_date'))
+        .order_by('-score', '-posted', '-job_id')
+        .values_list('job_id', 'score')[:limit]
+    )
+    matched = defaultdict(list)
+    for job_id, skill_id in JobSkill.objects.filter(job_id__in=[job_id for job_id, _ in best], skill_id__in=skills).values_list('job_id', 'skill_id'):
+        matched[job_id].append(skills[skill_id][0])
+
+    jobs = JobListing.objects.defer('description').in_bulk([job_id for job_id, _ in best])
+    results = []
+    for job_id, score in best:
+        if job_id in jobs:
+            job = jobs[job_id]
+            job.score = score
+            job.matched_skills = sorted(matched[job_id])
+            results.append(job)
+    return results
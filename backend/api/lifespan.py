@@ -0,0 +1,20 @@
+"""
+ASGI lifespan handling for the Channels application.
+
+Servers that speak the lifespan protocol (uvicorn, hypercorn) tell us when
+they are shutting down, which is our chance to flush buffered chat writes
+before the process exits. Daphne does not send these events; there the
+buffer is drained by its atexit handler instead (see api.chat_buffer).
+"""
+from .chat_buffer import drain_chat_buffer
+
+
+async def lifespan_app(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await drain_chat_buffer()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,117 @@
+"""
+A small interface over text-generation providers.
+
+A backend turns a prompt into text and raises :class:`LLMError` when it
+cannot, saying whether trying again may help. :class:`GeminiBackend` calls
+Google's Gemini API; :class:`FakeBackend` answers deterministically on the
+local machine, after an optional artificial latency and with optional
+injected failures, so generation can be tested and benchmarked offline.
+
+Backends are called from worker threads. Each has a ``name`` that
+``LLM_RATE_LIMITS`` (requests/s per provider) is keyed on.
+"""
+import abc
+import hashlib
+import json
+import random
+import threading
+import time
+
+from django.conf import settings
+
+
+class LLMError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMBackend(abc.ABC):
+    name = 'llm'
+    # Requests per second when LLM_RATE_LIMITS does not name this provider (0 for no limit).
+    default_rate = 1.0
+
+    @abc.abstractmethod
+    def generate(self, prompt):
+        """The model's answer to ``prompt``; raises :class:`LLMError` when there is none."""
+
+    @property
+    def rate(self):
+        return getattr(settings, "LLM_RATE_LIMITS", {}).get(self.name, self.default_rate)
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, api_key=None, model=None):
+        import google.generativeai as genai
+        from google.api_core import exceptions
+
+        genai.configure(api_key=api_key or getattr(settings, "GEMINI_API_KEY", None))
+        self.model = genai.GenerativeModel(model or getattr(settings, "GEMINI_MODEL", "gemini-1.5-flash-002"))
+        self.retryable = (
+            exceptions.TooManyRequests, exceptions.ResourceExhausted, exceptions.ServiceUnavailable,
+            exceptions.InternalServerError, exceptions.DeadlineExceeded,
+        )
+        self.api_errors = exceptions.GoogleAPIError
+
+    def generate(self, prompt):
+        try:
+            return self.model.generate_content(prompt).text
+        except self.retryable as e:
+            raise LLMError(str(e), retryable=True)
+        except (self.api_errors, ValueError) as e:
+            # ValueError: the response was blocked and has no text.
+            raise LLMError(str(e))
+
+
+class FakeBackend(LLMBackend):
+    """
+    Answers an interview-question prompt with five questions derived from a
+    hash of the prompt. ``failure_rate`` of calls fail with a retryable error.
+    """
+    name = 'fake'
+    default_rate = 0
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.calls += 1
+            fail = self.failure_rate and self.rng.random() < self.failure_rate
+        time.sleep(self.latency)
+        if fail:
+            raise LLMError('Injected failure.', retryable=True)
+        digest = hashlib.sha256(prompt.encode()).hexdigest()
+        return json.dumps([
+            {
+                'question_text': f'Question {i + 1} ({digest[:12]}): explain concept {digest[i * 4:i * 4 + 4]}.',
+                'answer_text': f'Answer {i + 1} ({digest[:12]}).',
+                'difficulty': ('Easy', 'Medium', 'Hard')[i % 3],
+            }
+            for i in range(5)
+        ])
+
+
+def generate_with_retries(backend, prompt, retries=3, backoff=1.0, limiter=None):
+    """
+    ``backend.generate(prompt)``, retrying retryable errors up to ``retries``
+    times after jittered exponential backoff (or the error's retry_after).
+    ``limiter.wait()`` is called before every attempt.
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            return backend.generate(prompt)
+        except LLMError as e:
+            if not e.retryable or attempt == retries:
+                raise
+            delay = e.retry_after if e.retry_after is not None else backoff * 2 ** attempt
+            time.sleep(delay + random.uniform(0, backoff))
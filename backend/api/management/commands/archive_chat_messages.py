@@ -0,0 +1,43 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from api.chat_archive import archive_month, month_start
+from api.models import ChatMessage
+
+
+class Command(BaseCommand):
+    help = ('Moves chat messages older than CHAT_ARCHIVE_AFTER_DAYS into compressed per-group, '
+            'per-month archive chunks and deletes them from ChatMessage. Safe to re-run; meant for cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180),
+                            help='Archive whole months that ended at least this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement.')
+        parser.add_argument('--dry-run', action='store_true', help='Only list what would be archived.')
+
+    def handle(self, *args, **options):
+        # Only closed months are archived, so each group/month ends up in exactly one chunk.
+        cutoff = month_start(timezone.now() - datetime.timedelta(days=options['days']))
+        months = (
+            ChatMessage.objects.filter(timestamp__lt=cutoff)
+            .annotate(month=TruncMonth('timestamp', tzinfo=datetime.timezone.utc))
+            .values_list('group_id', 'month')
+            .distinct()
+            .order_by('month', 'group_id')
+        )
+
+        total = 0
+        for group_id, month in months:
+            if options['dry_run']:
+                self.stdout.write(f'Would archive group {group_id}, {month:%Y-%m}')
+                continue
+            moved = archive_month(group_id, month_start(month), batch_size=options['batch_size'])
+            total += moved
+            self.stdout.write(f'Group {group_id}, {month:%Y-%m}: archived {moved} messages')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Archived {total} messages older than {cutoff:%Y-%m-%d}.'))
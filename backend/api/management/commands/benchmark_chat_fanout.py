@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import chat_events
+from api.bench import format_table
+from api.consumers import ChatConsumer
+from api.models import ChatMessage
+
+try:
+    import msgpack  # What channels_redis serializes every per-channel message with.
+except ImportError:
+    msgpack = None
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmarks the per-recipient cost of fanning a chat message out to a study group'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=500)
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--length', type=int, default=200, help='Characters per chat message.')
+
+    def handle(self, *args, **options):
+        recipients, messages = options['recipients'], options['messages']
+        chat_message = ChatMessage(
+            uuid=uuid.uuid4(), user_id=1, message='x' * options['length'], timestamp=timezone.now(),
+        )
+        # The event shape every consumer used to receive and re-encode.
+        legacy_event = {
+            'type': 'chat_message',
+            'message': chat_message.message,
+            'username': 'student',
+            'timestamp': chat_message.timestamp.isoformat(),
+        }
+        frame_event = {'type': 'chat.frame', 'text': chat_events.message_frame(chat_message, 'student')}
+
+        consumer = ChatConsumer()
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            pass  # Measure the consumer, not the transport.
+
+        consumer.send = send
+
+        async def legacy_chat_message(event):
+            await consumer.send(text_data=json.dumps({
+                'message': event['message'],
+                'username': event['username'],
+                'timestamp': event['timestamp'],
+            }))
+
+        rows = [
+            ['before: handler re-encodes', *self._measure(legacy_chat_message, legacy_event, recipients, messages)],
+            ['after: handler forwards', *self._measure(consumer.chat_frame, frame_event, recipients, messages)],
+        ]
+        if msgpack is not None:
+            rows.append(['before: channel layer packing',
+                         *self._measure(self._packer, legacy_event, recipients, messages)])
+            rows.append(['after: channel layer packing',
+                         *self._measure(self._packer, frame_event, recipients, messages)])
+
+        self.stdout.write(f'{recipients} recipients, {messages} messages of {options["length"]} characters\n')
+        self.stdout.write(format_table(['path', 'us/recipient', 'ms/message'], rows))
+
+    async def _packer(self, event):
+        msgpack.packb(event, use_bin_type=True)
+
+    def _measure(self, handler, event, recipients, messages):
+        async def run():
+            start = time.perf_counter()
+            for _ in range(messages):
+                for _ in range(recipients):
+                    await handler(event)
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(run())
+        return elapsed * 1e6 / (recipients * messages), elapsed * 1e3 / messages
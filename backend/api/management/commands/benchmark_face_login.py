@@ -0,0 +1,133 @@
+import json
+import time
+from datetime import timedelta
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from api import face_codec
+from api.bench import QueryTimer, format_table, isolated_database, percentiles, perturb, synthetic_face_encodings
+from api.face_index import build_index
+from api.models import UserProfile
+from api.views import FaceLoginView
+
+SEED_BATCH = 5000
+
+
+class StubFacePool:
+    """Stands in for the face_recognition process pool: returns a preset encoding."""
+
+    def __init__(self):
+        self.next_encoding = None
+
+    def encode(self, image_bytes, timeout=None):
+        return [self.next_encoding]
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks face login at several numbers of registered users with synthetic encodings. '
+            'Runs against a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000,100000',
+                            help='Comma-separated numbers of registered faces, e.g. 1000,100000,1000000.')
+        parser.add_argument('--queries', type=int, default=200, help='Face logins per scale.')
+        parser.add_argument('--output', help='Append the results as JSON lines to this file.')
+
+    def handle(self, *args, **options):
+        scales = sorted(int(s) for s in options['scales'].split(','))
+        encodings = synthetic_face_encodings(scales[-1])
+        rows, results = [], []
+
+        with isolated_database():
+            seeded = 0
+            for scale in scales:
+                self.stdout.write(f'Seeding {scale} registered faces...')
+                self._seed(encodings, seeded, scale)
+                seeded = scale
+                result = self._measure(encodings[:scale], options['queries'])
+                results.append(result)
+                rows.append([
+                    scale, result['mode'], result['load_s'], result['index_mb'], result['load_peak_mb'],
+                    result['p50_ms'], result['p95_ms'], result['p99_ms'], result['db_ms'], result['queries_per_login'],
+                    result['accuracy'],
+                ])
+
+        self.stdout.write('\n' + format_table(
+            ['faces', 'mode', 'load s', 'index MB', 'load peak MB', 'p50 ms', 'p95 ms', 'p99 ms',
+             'db ms/login', 'queries/login', 'accuracy'],
+            rows,
+        ))
+        if options['output']:
+            with open(options['output'], 'a') as f:
+                for result in results:
+                    f.write(json.dumps(result) + '\n')
+            self.stdout.write(f'Results appended to {options["output"]}.')
+
+    def _seed(self, encodings, start, stop):
+        # Seeded faces stand for users enrolled long ago, outside the index's sync window.
+        enrolled_at = timezone.now() - timedelta(days=1)
+        for batch_start in range(start, stop, SEED_BATCH):
+            batch = range(batch_start, min(batch_start + SEED_BATCH, stop))
+            users = User.objects.bulk_create([User(username=f'bench_{i}', password='!') for i in batch])
+            # bulk_create skips the post_save signal, so profiles are created here.
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user, face_encoding=face_codec.encode(encodings[i]), face_updated_at=enrolled_at)
+                for user, i in zip(users, batch)
+            ])
+
+    def _measure(self, encodings, n_queries):
+        index = build_index()
+        tracemalloc.start()
+        start = time.perf_counter()
+        index.load()
+        load_s = time.perf_counter() - start
+        _, load_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rng = np.random.default_rng(4)
+        targets = rng.choice(len(encodings), n_queries)
+        queries = perturb(encodings[targets])
+        expected = dict(
+            User.objects.filter(username__in=[f'bench_{i}' for i in targets]).values_list('username', 'id')
+        )
+
+        pool, factory, view = StubFacePool(), APIRequestFactory(), FaceLoginView.as_view()
+        timer = QueryTimer()
+        latencies, correct = [], 0
+        with mock.patch('api.views.get_face_pool', return_value=pool), \
+                mock.patch('api.views.get_face_index', return_value=index), \
+                connection.execute_wrapper(timer):
+            for target, query in zip(targets, queries):
+                pool.next_encoding = query
+                request = factory.post('/api/face-login/', {'image': SimpleUploadedFile('face.jpg', b'')},
+                                       format='multipart')
+                start = time.perf_counter()
+                response = view(request)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code == 200:
+                    correct += str(self._token_user(response)) == str(expected[f'bench_{target}'])
+
+        return {
+            'faces': len(encodings),
+            'mode': type(index).__name__,
+            'load_s': load_s,
+            'index_mb': index.nbytes / 2 ** 20,
+            'load_peak_mb': load_peak / 2 ** 20,
+            **{f'{k}_ms': v for k, v in percentiles(latencies).items()},
+            'db_ms': timer.seconds * 1000 / n_queries,
+            'queries_per_login': timer.count / n_queries,
+            'accuracy': correct / n_queries,
+        }
+
+    def _token_user(self, response):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        return AccessToken(response.data['access'])['user_id']
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.bench import format_table, isolated_database, percentiles
+from api.job_fixtures import SKILLS, fixture_jobs
+from api.job_ingestion import IngestionStats, JSearchSource, save_jobs
+from api.job_skills import PROFICIENCY_WEIGHTS, SkillMatcher
+from api.models import Skill, UserSkill
+from api.views import JobListingViewSet
+
+SEED_BATCH = 5000
+USERS = 20
+TERMS = ['python developer', 'data analyst', 'frontend engineer', 'devops intern', 'sql developer']
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks GET /api/job-listings/recommended/ at several table sizes with synthetic listings '
+            'and students. Runs against a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='10000,100000',
+                            help='Comma-separated numbers of listings, e.g. 10000,100000,500000.')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per student and scale.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        scales = sorted(int(scale) for scale in options['scales'].split(','))
+        rng = random.Random(options['seed'])
+        view = JobListingViewSet.as_view({'get': 'recommended'})
+        factory = APIRequestFactory()
+        rows = []
+
+        with isolated_database():
+            skills = [Skill.objects.create(name=name) for name in SKILLS]
+            users = []
+            for i in range(USERS):
+                user = User.objects.create(username=f'job_recommend_bench{i}')
+                for skill in rng.sample(skills, rng.randint(2, 6)):
+                    UserSkill.objects.create(user=user, skill=skill, proficiency=rng.choice(list(PROFICIENCY_WEIGHTS)))
+                users.append(user)
+
+            source, matcher, seeded, batch = JSearchSource(), SkillMatcher.from_db(), 0, 0
+            for scale in scales:
+                self.stdout.write(f'Seeding and indexing {scale} listings...')
+                while seeded < scale:
+                    term, page = TERMS[batch % len(TERMS)], batch // len(TERMS) + 1
+                    jobs = fixture_jobs(term, 'in', page, per_page=SEED_BATCH)[:scale - seeded]
+                    save_jobs([source.parse(job) for job in jobs], IngestionStats(), matcher)
+                    seeded += len(jobs)
+                    batch += 1
+
+                samples, queries = [], 0
+                for _ in range(options['repeat']):
+                    for user in users:
+                        request = factory.get('/api/job-listings/recommended/')
+                        force_authenticate(request, user=user)
+                        with CaptureQueriesContext(connection) as captured:
+                            start = time.perf_counter()
+                            response = view(request)
+                            samples.append((time.perf_counter() - start) * 1000)
+                        queries = max(queries, len(captured))
+                        assert response.status_code == 200, response.data
+                stats = percentiles(samples)
+                rows.append([scale, stats['p50'], stats['p95'], stats['p99'], queries])
+
+        self.stdout.write(format_table(['listings', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'max queries'], rows))
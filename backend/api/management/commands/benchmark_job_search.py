@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.bench import format_table, isolated_database, percentiles
+from api.job_fixtures import fixture_jobs
+from api.job_ingestion import IngestionStats, JSearchSource, save_jobs
+from api.views import JobListingViewSet
+
+SEED_BATCH = 5000
+QUERIES = [
+    {'q': 'python'},
+    {'q': 'developer intern', 'job_type': 'Internship'},
+    {'q': 'react docker'},
+    {'location': 'City 7'},
+    {'q': 'analyst', 'posted_after': '2024-01-01'},
+]
+TERMS = ['python developer', 'data analyst', 'frontend engineer', 'devops intern', 'sql developer']
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks GET /api/job-listings/search/ at several table sizes with synthetic listings. '
+            'Runs against a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='10000,100000',
+                            help='Comma-separated numbers of listings, e.g. 10000,100000,1000000.')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per query and scale.')
+
+    def handle(self, *args, **options):
+        scales = sorted(int(scale) for scale in options['scales'].split(','))
+        view = JobListingViewSet.as_view({'get': 'search'})
+        factory = APIRequestFactory()
+        rows = []
+
+        with isolated_database():
+            user = User.objects.create(username='job_search_bench')
+            source, seeded, batch = JSearchSource(), 0, 0
+            for scale in scales:
+                self.stdout.write(f'Seeding {scale} listings...')
+                while seeded < scale:
+                    # Every (term, page) pair yields distinct application URLs.
+                    term, page = TERMS[batch % len(TERMS)], batch // len(TERMS) + 1
+                    jobs = fixture_jobs(term, 'in', page, per_page=SEED_BATCH)[:scale - seeded]
+                    save_jobs([source.parse(job) for job in jobs], IngestionStats())
+                    seeded += len(jobs)
+                    batch += 1
+
+                samples = []
+                for _ in range(options['repeat']):
+                    for params in QUERIES:
+                        request = factory.get('/api/job-listings/search/', params)
+                        force_authenticate(request, user=user)
+                        start = time.perf_counter()
+                        response = view(request)
+                        samples.append((time.perf_counter() - start) * 1000)
+                        assert response.status_code == 200, response.data
+                stats = percentiles(samples)
+                rows.append([scale, stats['p50'], stats['p95'], stats['p99']])
+
+        self.stdout.write(format_table(['listings', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'], rows))
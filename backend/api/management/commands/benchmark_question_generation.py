@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.bench import format_table, isolated_database
+from api.llm import FakeBackend
+from api.models import InterviewQuestion, Skill
+from api.question_generation import generate_questions
+
+
+class Command(BaseCommand):
+    help = ('Measures interview-question generation throughput offline against the fake LLM backend, '
+            'at several concurrency levels. Runs against a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skills', type=int, default=200)
+        parser.add_argument('--workers', default='1,4,16', help='Comma-separated concurrency levels.')
+        parser.add_argument('--latency', type=float, default=0.5, help='Seconds the fake backend takes per call.')
+        parser.add_argument('--failure-rate', type=float, default=0.05,
+                            help='Fraction of calls that fail with a retryable error.')
+
+    def handle(self, *args, **options):
+        rows = []
+        with isolated_database():
+            skills = [Skill.objects.create(name=f'Skill {i}') for i in range(options['skills'])]
+            for workers in (int(w) for w in options['workers'].split(',')):
+                InterviewQuestion.objects.all().delete()
+                backend = FakeBackend(latency=options['latency'], failure_rate=options['failure_rate'])
+                start = time.perf_counter()
+                stats = generate_questions(skills, backend, workers=workers, backoff=0.05)
+                elapsed = time.perf_counter() - start
+                rows.append([workers, elapsed, stats.skills / elapsed, backend.calls, stats.failed, stats.questions])
+
+        self.stdout.write(format_table(['workers', 'seconds', 'skills/s', 'LLM calls', 'failed', 'questions'], rows))
@@ -0,0 +1,157 @@
+import csv
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api import face_codec
+from api.face_pipeline import encode_photo
+from api.models import UserProfile
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.gif', '.tif', '.tiff'}
+SUMMARY_FIELDS = ['file', 'username', 'status', 'detail']
+
+
+class PhotoSource:
+    """Lists and reads ID photos from a directory tree or a zip archive."""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def names(self):
+        if self._zip is not None:
+            candidates = (info.filename for info in self._zip.infolist() if not info.is_dir())
+        else:
+            candidates = (
+                os.path.relpath(os.path.join(root, f), self.path)
+                for root, _, files in os.walk(self.path) for f in files
+            )
+        return sorted(n for n in candidates if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS)
+
+    def read(self, name):
+        if self._zip is not None:
+            return self._zip.read(name)
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+
+
+def username_for(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+class Command(BaseCommand):
+    help = 'Registers faces in bulk from a directory or zip of ID photos named <username>.<ext>'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or .zip file of photos.')
+        parser.add_argument('--summary', help='CSV report of every processed photo. Also used to resume; '
+                                              'defaults to <source>.summary.csv.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=500, help='Profiles written per bulk_update.')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Process photos that failed in a previous run again.')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['source']):
+            raise CommandError(f"{options['source']} does not exist.")
+        source = PhotoSource(options['source'])
+        summary_path = options['summary'] or f"{options['source'].rstrip(os.sep)}.summary.csv"
+        done = self._previous_results(summary_path, options['retry_failed'])
+
+        names = [n for n in source.names() if n not in done]
+        self.stdout.write(f'{len(names)} photos to process ({len(done)} already done in {summary_path}).')
+        if not names:
+            return
+
+        user_ids = self._user_ids({username_for(n) for n in names})
+        counts = {}
+        max_dimension = getattr(settings, 'FACE_IMAGE_MAX_DIMENSION', 1024)
+        # Keep a bounded number of photos in flight so memory stays flat on huge archives.
+        max_in_flight = options['workers'] * 4
+        pending_rows, pending_profiles = [], []
+
+        # spawn, as in api.face_pipeline. The task lives there because a spawned
+        # worker cannot import this module without setting up Django.
+        with open(summary_path, 'a', newline='') as summary_file, \
+                ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn')) as pool:
+            summary = csv.DictWriter(summary_file, fieldnames=SUMMARY_FIELDS)
+            if summary_file.tell() == 0:
+                summary.writeheader()
+
+            def flush():
+                self._save_profiles(pending_profiles)
+                # Rows are only recorded once their profiles are committed, so an
+                # interrupted run simply redoes the last unsaved batch.
+                summary.writerows(pending_rows)
+                summary_file.flush()
+                pending_rows.clear()
+                pending_profiles.clear()
+
+            def record(name, status, detail=''):
+                counts[status] = counts.get(status, 0) + 1
+                pending_rows.append({'file': name, 'username': username_for(name), 'status': status, 'detail': detail})
+
+            in_flight = set()
+            todo = iter(names)
+            while True:
+                for name in todo:
+                    if username_for(name) not in user_ids:
+                        record(name, 'unknown_user', 'No user with this username.')
+                        continue
+                    in_flight.add(pool.submit(encode_photo, name, source.read(name), max_dimension))
+                    if len(in_flight) >= max_in_flight:
+                        break
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, status, result = future.result()
+                    if status == 'ok':
+                        pending_profiles.append((user_ids[username_for(name)], result))
+                        record(name, status)
+                    else:
+                        record(name, status, result)
+                if len(pending_rows) >= options['batch_size']:
+                    flush()
+            flush()
+
+        for status, count in sorted(counts.items()):
+            style = self.style.SUCCESS if status == 'ok' else self.style.WARNING
+            self.stdout.write(style(f'{status}: {count}'))
+        self.stdout.write(f'Per-photo results written to {summary_path}.')
+
+    def _previous_results(self, path, retry_failed):
+        if not os.path.exists(path):
+            return set()
+        with open(path, newline='') as f:
+            return {row['file'] for row in csv.DictReader(f) if row['status'] == 'ok' or not retry_failed}
+
+    def _user_ids(self, usernames):
+        user_ids = {}
+        usernames = list(usernames)
+        for start in range(0, len(usernames), 1000):
+            user_ids.update(User.objects.filter(username__in=usernames[start:start + 1000]).values_list('username', 'id'))
+        return user_ids
+
+    def _save_profiles(self, entries):
+        if not entries:
+            return
+        now = timezone.now()
+        # Later photos of the same user win.
+        encodings = dict(entries)
+        profiles = [
+            UserProfile(user_id=user_id, face_encoding=face_codec.encode(encoding), face_updated_at=now)
+            for user_id, encoding in encodings.items()
+        ]
+        with transaction.atomic():
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id) for user_id in encodings], ignore_conflicts=True,
+            )
+            UserProfile.objects.bulk_update(profiles, ['face_encoding', 'face_updated_at'])
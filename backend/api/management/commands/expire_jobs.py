@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.job_ingestion import expire_jobs, stale_jobs
+
+
+class Command(BaseCommand):
+    help = ('Deletes job listings past their expiry date, or older than JOB_MAX_AGE_DAYS when the '
+            'source gave no expiry date, in small batches')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=getattr(settings, 'JOB_MAX_AGE_DAYS', 60))
+        parser.add_argument('--batch-size', type=int, default=1000, help='Listings deleted per statement.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the stale listings.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = stale_jobs(options['max_age_days']).count()
+            self.stdout.write(f'{count} stale listings would be deleted.')
+            return
+
+        deleted = expire_jobs(options['max_age_days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} stale listings.'))
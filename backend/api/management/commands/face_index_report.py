@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.bench import format_table, percentiles, perturb, synthetic_face_encodings
+from api.face_index import FaceIndex, get_match_tolerance
+from api.face_ivf import IVFFaceIndex, train_centroids
+
+
+class Command(BaseCommand):
+    help = 'Compares recall and latency of the approximate (ivf) face index against exact search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=['synthetic', 'db'], default='synthetic',
+                            help='Use synthetic encodings or the faces registered in the database.')
+        parser.add_argument('--size', type=int, default=100_000, help='Number of synthetic faces.')
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--nlist', type=int, default=getattr(settings, 'FACE_IVF_NLIST', 1024))
+        parser.add_argument('--nprobe', default='1,2,4,8,16,32,64',
+                            help='Comma-separated nprobe values to measure.')
+        parser.add_argument('--centroids', help='Use these centroids (.npy) instead of training new ones.')
+
+    def handle(self, *args, **options):
+        exact = FaceIndex()
+        if options['source'] == 'db':
+            exact.load()
+            user_ids, encodings = exact.user_ids.copy(), exact.encodings.copy()
+        else:
+            encodings = synthetic_face_encodings(options['size'])
+            user_ids = np.arange(1, len(encodings) + 1)
+            exact.bulk_load(user_ids, encodings)
+        if len(encodings) == 0:
+            self.stdout.write(self.style.WARNING('No face encodings to report on.'))
+            return
+
+        # Half the queries are new photos of enrolled faces, half are strangers.
+        rng = np.random.default_rng(2)
+        n_genuine = options['queries'] // 2
+        genuine = perturb(encodings[rng.choice(len(encodings), n_genuine)])
+        strangers = synthetic_face_encodings(options['queries'] - n_genuine, seed=3)
+        queries = np.concatenate([genuine, strangers])
+        tolerance = get_match_tolerance()
+
+        if options['centroids']:
+            centroids = np.load(options['centroids'])
+        else:
+            nlist = min(options['nlist'], len(encodings))
+            self.stdout.write(f'Training {nlist} cells on {len(encodings)} faces...')
+            centroids = train_centroids(encodings, nlist)
+        ivf = IVFFaceIndex(centroids)
+        ivf.bulk_load(user_ids, encodings)
+
+        expected, exact_ms = self._run(lambda q: exact.search(q, tolerance), queries)
+        # Recall is over the queries exact search matched; a stranger both searches miss is not a hit.
+        hits = [i for i, user_id in enumerate(expected) if user_id is not None]
+        if not hits:
+            self.stdout.write(self.style.WARNING('Exact search matched none of the queries; recall is undefined.'))
+
+        def recall(found):
+            return float(np.mean([found[i] == expected[i] for i in hits])) if hits else '-'
+
+        def stranger_match_rate(found):
+            return float(100 * np.mean([user_id is not None for user_id in found[n_genuine:]])) if len(found) > n_genuine else '-'
+
+        rows = [['exact', '-', recall(expected), stranger_match_rate(expected), 100.0, *percentiles(exact_ms).values()]]
+        cell_sizes = ivf.cell_sizes()
+
+        for nprobe in [int(n) for n in options['nprobe'].split(',')]:
+            if nprobe > ivf.nlist:
+                continue
+            found, ivf_ms = self._run(lambda q: ivf.search(q, tolerance, nprobe=nprobe), queries)
+            scanned = np.mean([cell_sizes[ivf.probe(q, nprobe)].sum() for q in queries[:50]]) / len(encodings)
+            rows.append([
+                'ivf', nprobe, recall(found), stranger_match_rate(found), float(100 * scanned),
+                *percentiles(ivf_ms).values(),
+            ])
+
+        self.stdout.write(
+            f'\n{len(encodings)} faces, {len(queries)} queries ({len(hits)} matched by exact search, '
+            f'{len(queries) - n_genuine} strangers), nlist={ivf.nlist}\n'
+        )
+        self.stdout.write(format_table(
+            ['mode', 'nprobe', 'recall', 'stranger match %', 'scanned %', 'p50 ms', 'p95 ms', 'p99 ms'], rows,
+        ))
+
+    def _run(self, search, queries):
+        results, timings = [], []
+        for query in queries:
+            start = time.perf_counter()
+            match = search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+            results.append(match.user_id if match else None)
+        return results, timings
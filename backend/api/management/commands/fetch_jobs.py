@@ -1,61 +1,67 @@
-import requests
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from api.models import JobListing
-from django.conf import settings # Good practice to keep keys out of code
+from django.utils.module_loading import import_string
+
+from api.job_ingestion import ingest
 
-# --- IMPORTANT ---
-# It's better to store your API key in your project's settings or environment variables.
-# For simplicity in this step, we are placing it here.
-# Replace 'YOUR_RAPIDAPI_KEY' with the actual key you got from RapidAPI.
-RAPIDAPI_KEY = 'fbc04055a7mshae80bb1545e739dp1d98ddjsn691ba5fb17f8' 
 
 class Command(BaseCommand):
-    help = 'Fetches job listings from the JSearch API and saves them to the database'
+    help = ('Fetches job listings for every configured query, country and page concurrently '
+            '(from the JSearch API by default) and saves them to the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Search query; repeat for several. Defaults to JOB_INGESTION_QUERIES.')
+        parser.add_argument('--country', action='append', dest='countries',
+                            help='Country code; repeat for several. Defaults to JOB_INGESTION_COUNTRIES.')
+        parser.add_argument('--pages', type=int, default=getattr(settings, 'JOB_INGESTION_PAGES', 1),
+                            help='Result pages per query and country.')
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'JOB_INGESTION_WORKERS', 4))
+        parser.add_argument('--rate', type=float, default=getattr(settings, 'JOB_INGESTION_RATE', 5.0),
+                            help='Maximum requests per second over all workers (0 for no limit).')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'JOB_INGESTION_BATCH_SIZE', 500),
+                            help='Jobs written per upsert statement.')
+        parser.add_argument('--source', default=getattr(settings, 'JOB_SOURCE', 'api.job_ingestion.JSearchSource'),
+                            help='Dotted path of the JobSource class to fetch from.')
+        parser.add_argument('--base-url', help='Send requests to another JSearch-compatible server, e.g. a fixture server.')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore the ingestion checkpoints and fetch every page, and do not advance them.')
 
     def handle(self, *args, **options):
-        self.stdout.write('Starting to fetch job listings...')
-
-        api_url = "https://jsearch.p.rapidapi.com/search?query=developer%20jobs%20in%20chicago&page=1&num_pages=1&country=us&date_posted=all"
-        
-        # We'll search for software internships in India
-        querystring = {"query": "Software developer intern in India", "num_pages": "1"}
-        
-        headers = {
-            "X-RapidAPI-Key": RAPIDAPI_KEY,
-            "X-RapidAPI-Host": "jsearch.p.rapidapi.com"
-        }
-
-        try:
-            response = requests.get(api_url, headers=headers, params=querystring)
-            response.raise_for_status() # Raises an error for bad responses (4xx or 5xx)
-            
-            jobs_data = response.json().get('data', [])
-            
-            if not jobs_data:
-                self.stdout.write(self.style.WARNING('No jobs found in the API response.'))
-                return
-
-            jobs_saved = 0
-            for job in jobs_data:
-                # Use update_or_create to avoid creating duplicate jobs.
-                # It tries to find a job with the same job_id, and if it exists, updates it.
-                # If not, it creates a new one.
-                job_listing, created = JobListing.objects.update_or_create(
-                    # Use a unique field from the API as a key
-                    application_url=job.get('job_apply_link', 'N/A'),
-                    defaults={
-                        'title': job.get('job_title', 'No Title Provided'),
-                        'company_name': job.get('employer_name', 'N/A'),
-                        'location': job.get('job_city', 'N/A') + ", " + job.get('job_country', 'N/A'),
-                        'description': job.get('job_description', 'No Description Provided'),
-                        'job_type': job.get('job_employment_type', 'Full-time').title()
-                    }
-                )
-
-                if created:
-                    jobs_saved += 1
-            
-            self.stdout.write(self.style.SUCCESS(f'Successfully fetched and saved {jobs_saved} new job listings.'))
-
-        except requests.exceptions.RequestException as e:
-            self.stdout.write(self.style.ERROR(f'An error occurred: {e}'))
+        queries = options['queries'] or getattr(settings, 'JOB_INGESTION_QUERIES', [])
+        countries = options['countries'] or getattr(settings, 'JOB_INGESTION_COUNTRIES', ['us'])
+        source = import_string(options['source'])(base_url=options['base_url'])
+        if not queries:
+            self.stdout.write(self.style.ERROR('No queries given and JOB_INGESTION_QUERIES is empty.'))
+            return
+
+        self.stdout.write(
+            f'Fetching {options["pages"]} page(s) each for {len(queries)} queries x {len(countries)} countries...'
+        )
+
+        def on_page(request, result):
+            if isinstance(result, Exception):
+                self.stdout.write(self.style.ERROR(
+                    f'{request.query!r} ({request.country}) page {request.page} failed: {result}'
+                ))
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{request.query!r} ({request.country}) page {request.page}: {len(result)} jobs')
+
+        start = time.perf_counter()
+        stats = ingest(
+            source, queries, countries, options['pages'],
+            workers=options['workers'], rate=options['rate'],
+            batch_size=options['batch_size'], on_page=on_page, incremental=not options['full'],
+        )
+        elapsed = time.perf_counter() - start
+
+        if not stats.jobs and not stats.failed_pages:
+            self.stdout.write(self.style.WARNING('No jobs found in the API responses.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Fetched {stats.jobs} jobs from {stats.pages} pages in {elapsed:.1f}s: '
+            f'{stats.created} new, {stats.updated} updated, {stats.unchanged} unchanged, '
+            f'{stats.failed_pages} pages failed.'
+        ))
@@ -1,73 +1,65 @@
-import google.generativeai as genai
-import json
-import os
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from api.models import Skill, InterviewQuestion
-from dotenv import load_dotenv
-# --- IMPORTANT ---
-# Replace 'YOUR_GEMINI_API_KEY' with the actual key you got from Google AI Studio.
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+from django.db.models import Exists, OuterRef
+from django.utils.module_loading import import_string
+
+from api.llm import LLMError
+from api.models import InterviewQuestion, Skill
+from api.question_generation import Progress, generate_questions
+
 
 class Command(BaseCommand):
-    help = 'Generates interview questions for existing skills using the Gemini API'
+    help = ('Generates interview questions for skills that have none, several skills at a time, '
+            'using an LLM backend (Gemini by default). Interrupted runs resume from the progress file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skill', action='append', dest='skills',
+                            help='Skill name; repeat for several. Defaults to every skill without questions.')
+        parser.add_argument('--backend', default=getattr(settings, 'LLM_BACKEND', 'api.llm.GeminiBackend'),
+                            help='Dotted path of the LLMBackend class, e.g. api.llm.FakeBackend.')
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'LLM_CONCURRENCY', 4),
+                            help='Skills generated at the same time.')
+        parser.add_argument('--retries', type=int, default=3, help='Retries per skill for rate limits and server errors.')
+        parser.add_argument('--progress-file', default=getattr(settings, 'QUESTION_PROGRESS_FILE', None),
+                            help='Where finished skills are recorded ("" to not record them).')
+        parser.add_argument('--reset', action='store_true', help='Forget the progress file and start over.')
 
     def handle(self, *args, **options):
         try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-1.5-flash-002')
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Failed to configure Generative AI: {e}'))
+            backend = import_string(options['backend'])()
+        except (ImportError, LLMError) as e:
+            self.stdout.write(self.style.ERROR(f'Failed to configure the LLM backend: {e}'))
             return
 
-        skills = Skill.objects.all()
-        if not skills.exists():
-            self.stdout.write(self.style.WARNING('No skills found in the database. Please add skills first.'))
+        has_questions = InterviewQuestion.objects.filter(skill=OuterRef('pk'))
+        skills = Skill.objects.annotate(has_questions=Exists(has_questions)).filter(has_questions=False).order_by('id')
+        if options['skills']:
+            skills = skills.filter(name__in=options['skills'])
+        progress = Progress(options['progress_file'])
+        if options['reset']:
+            progress.done.clear()
+        skills = [skill for skill in skills if skill.id not in progress.done]
+        if not skills:
+            self.stdout.write(self.style.WARNING('No skills left: every skill has questions or is in the progress file.'))
             return
 
-        self.stdout.write(f'Found {skills.count()} skills. Generating questions...')
-
-        for skill in skills:
-            self.stdout.write(f"--- Generating for skill: {skill.name} ---")
-
-            # Check if questions already exist for this skill to avoid re-generating
-            if InterviewQuestion.objects.filter(skill=skill).exists():
-                self.stdout.write(self.style.NOTICE(f'Questions already exist for {skill.name}. Skipping.'))
-                continue
-
-            prompt = f"""
-            Generate 5 interview questions for a '{skill.name}' role.
-            The questions should be of varying difficulty (at least one Easy, one Medium, and one Hard).
-            For each question, provide a concise but comprehensive answer.
-            Format the output as a valid JSON array of objects. Each object must have three keys: "question_text", "answer_text", and "difficulty" (with values "Easy", "Medium", or "Hard").
-            Do not include any text or formatting outside of the JSON array.
-            """
-
-            try:
-                response = model.generate_content(prompt)
-                
-                # Clean the response to ensure it's valid JSON
-                cleaned_response = response.text.strip().lstrip('```json').rstrip('```')
-                
-                questions_data = json.loads(cleaned_response)
+        self.stdout.write(f'Generating questions for {len(skills)} skills, {options["workers"]} at a time...')
 
-                questions_saved = 0
-                for q_data in questions_data:
-                    # Use get_or_create to avoid duplicates
-                    question, created = InterviewQuestion.objects.get_or_create(
-                        skill=skill,
-                        question_text=q_data.get('question_text'),
-                        defaults={
-                            'answer_text': q_data.get('answer_text'),
-                            'difficulty': q_data.get('difficulty', 'Medium')
-                        }
-                    )
-                    if created:
-                        questions_saved += 1
-                
-                self.stdout.write(self.style.SUCCESS(f'Successfully saved {questions_saved} new questions for {skill.name}.'))
+        def on_skill(skill, result):
+            if isinstance(result, Exception):
+                self.stdout.write(self.style.ERROR(f'Failed for skill {skill.name}: {result}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Saved {result} new questions for {skill.name}.'))
 
-            except json.JSONDecodeError:
-                self.stdout.write(self.style.ERROR(f'Failed to parse JSON for skill {skill.name}. Response was: {cleaned_response}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'An error occurred for skill {skill.name}: {e}'))
+        start = time.perf_counter()
+        stats = generate_questions(
+            skills, backend, workers=options['workers'], retries=options['retries'],
+            progress=progress, on_skill=on_skill,
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Done in {elapsed:.1f}s: {stats.skills} skills, {stats.questions} questions, '
+            f'{stats.failed} skills failed (run again to retry them).'
+        )
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import time
+
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import metrics
+from api.bench import format_table, isolated_database, percentiles
+from api.chat_buffer import drain_chat_buffer
+from api.models import ChatMessage, StudyGroup
+
+PREFIX = 'loadtest'
+LIMIT_COUNTERS = ('chat_frames_throttled', 'chat_frames_dropped', 'chat_slow_consumers_disconnected')
+
+
+class Command(BaseCommand):
+    help = ('Load-tests study group chat in-process: simulated WebSocket clients talk to '
+            'student_yatra.asgi.application (TokenAuthMiddleware + ChatConsumer). '
+            'Runs against a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--rooms', type=int, default=10)
+        parser.add_argument('--rate', type=float, default=200, help='Messages sent per second, over all clients.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to send for.')
+
+    def handle(self, *args, **options):
+        # Imported here so DJANGO_SETTINGS_MODULE-driven setup has already happened.
+        from student_yatra.asgi import application
+
+        if not isinstance(get_channel_layer(), InMemoryChannelLayer):
+            self.stdout.write(self.style.WARNING(
+                'Not using the in-memory channel layer; set CHANNEL_LAYER=memory to test without Redis.'
+            ))
+
+        with isolated_database():
+            tokens, rooms = self._seed(options['clients'], options['rooms'])
+            stats = asyncio.run(self._run(application, tokens, rooms, options))
+
+        sent, duration = stats['sent'], stats['duration']
+        rows = [
+            ['clients / rooms', f"{options['clients']} / {options['rooms']}"],
+            ['connected', stats['connected']],
+            ['messages sent', sent],
+            ['send rate (msg/s)', sent / duration],
+            ['frames delivered', f"{stats['delivered']} of {stats['expected']}"],
+            ['delivery rate (frames/s)', stats['delivered'] / duration],
+            ['DB writes (rows/s)', stats['rows'] / duration],
+            *[[f'latency {k} (ms)', v] for k, v in percentiles(stats['latencies']).items()],
+            *[[name, stats['counters'].get(name, 0)] for name in LIMIT_COUNTERS],
+        ]
+        self.stdout.write(format_table(['metric', 'value'], rows))
+
+    def _seed(self, n_clients, n_rooms):
+        users = User.objects.bulk_create([User(username=f'{PREFIX}_{i}', password='!') for i in range(n_clients)])
+        owner = users[0]
+        groups = StudyGroup.objects.bulk_create([
+            StudyGroup(name=f'{PREFIX} room {i}', creator=owner) for i in range(n_rooms)
+        ])
+        # Client i sits in room i % n_rooms.
+        rooms = [groups[i % n_rooms].id for i in range(n_clients)]
+        StudyGroup.members.through.objects.bulk_create([
+            StudyGroup.members.through(studygroup_id=room, user_id=user.id) for user, room in zip(users, rooms)
+        ])
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        return tokens, rooms
+
+    async def _run(self, application, tokens, rooms, options):
+        clients = [
+            WebsocketCommunicator(application, f'/ws/chat/{room}/?token={token}')
+            for token, room in zip(tokens, rooms)
+        ]
+        results = await asyncio.gather(*(client.connect(timeout=10) for client in clients))
+        connected = [client for client, (ok, _) in zip(clients, results) if ok]
+        room_sizes = {}
+        for client, room in zip(clients, rooms):
+            room_sizes[room] = room_sizes.get(room, 0) + 1
+
+        latencies, delivered = [], [0]
+
+        async def listen(client):
+            # Read the output queue directly: a receive_from() timeout would cancel the application.
+            while True:
+                event = await client.output_queue.get()
+                if event['type'] != 'websocket.send':
+                    return
+                frame = json.loads(event['text'])
+                if frame['type'] != 'message':
+                    continue  # e.g. rate_limited errors; see the counters in the report.
+                sent_at = float(frame['message'].rsplit(':', 1)[1])
+                latencies.append((time.perf_counter() - sent_at) * 1000)
+                delivered[0] += 1
+
+        listeners = [asyncio.ensure_future(listen(client)) for client in connected]
+        before = await database_sync_to_async(ChatMessage.objects.count)()
+
+        sent, expected, ticks = 0, 0, 0
+        interval = 1.0 / options['rate']
+        open_clients = set(connected)
+        start = time.perf_counter()
+        while time.perf_counter() - start < options['duration']:
+            client_index = ticks % len(clients)
+            if clients[client_index] in open_clients:
+                message = json.dumps({'message': f'{PREFIX}:{time.perf_counter()}'})
+                await clients[client_index].send_to(text_data=message)
+                sent += 1
+                expected += room_sizes[rooms[client_index]]
+            ticks += 1
+            # Pace against the schedule rather than sleeping a fixed interval, so slow sends catch up.
+            delay = start + ticks * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        duration = time.perf_counter() - start
+
+        # Give in-flight frames a moment to arrive, then stop listening.
+        deadline = time.perf_counter() + 5
+        while delivered[0] < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        for listener in listeners:
+            listener.cancel()
+        await drain_chat_buffer()
+        rows = await database_sync_to_async(ChatMessage.objects.count)() - before
+        await asyncio.gather(*(client.disconnect() for client in connected))
+        return {
+            'connected': len(connected),
+            'sent': sent,
+            'expected': expected,
+            'delivered': delivered[0],
+            'latencies': latencies,
+            'rows': rows,
+            'duration': duration,
+            'counters': metrics.snapshot(),
+        }
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.face_index import FaceIndex
+from api.face_ivf import IVFFaceIndex, train_centroids
+
+
+class Command(BaseCommand):
+    help = 'Trains the k-means centroids used by the approximate (FACE_INDEX_MODE="ivf") face index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nlist', type=int, default=getattr(settings, 'FACE_IVF_NLIST', 1024),
+                            help='Number of k-means cells.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--sample-size', type=int, default=100_000,
+                            help='Train on at most this many registered faces.')
+        parser.add_argument('--output', default=getattr(settings, 'FACE_IVF_CENTROIDS_PATH', None),
+                            help='Where to write the centroids (.npy).')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            self.stdout.write(self.style.ERROR('No output path given and FACE_IVF_CENTROIDS_PATH is not set.'))
+            return
+
+        self.stdout.write('Loading registered faces...')
+        exact = FaceIndex()
+        exact.load()
+        encodings = exact.encodings
+        nlist = options['nlist']
+        if len(encodings) < nlist:
+            self.stdout.write(self.style.WARNING(
+                f'Only {len(encodings)} registered faces, fewer than nlist={nlist}. '
+                'Keep FACE_INDEX_MODE="exact" until there are more.'
+            ))
+            return
+
+        self.stdout.write(f'Training {nlist} cells on {min(len(encodings), options["sample_size"])} of {len(encodings)} faces...')
+        centroids = train_centroids(
+            encodings, nlist, iterations=options['iterations'], sample_size=options['sample_size'],
+        )
+
+        # Write next to the target and rename so workers never load a partial file.
+        tmp_path = f'{output}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, centroids)
+        os.replace(tmp_path, output)
+
+        ivf = IVFFaceIndex(centroids)
+        ivf.bulk_load(exact.user_ids, encodings)
+        sizes = ivf.cell_sizes()
+        self.stdout.write(
+            f'Cell sizes: min {sizes.min()}, median {int(np.median(sizes))}, max {sizes.max()}, '
+            f'empty {int((sizes == 0).sum())}.'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {nlist} centroids to {output}. Running workers pick them up on their next face login.'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.job_skills import SkillMatcher, index_jobs
+from api.models import JobListing
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the JobSkill index used for job recommendations from every listing. '
+            'Run it after adding skills or aliases; fetch_jobs keeps it current otherwise.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Listings indexed per transaction.')
+
+    def handle(self, *args, **options):
+        matcher = SkillMatcher.from_db()
+        listings = JobListing.objects.only('id', 'title', 'description', 'posted_date').order_by('id')
+        last_id, jobs, postings = 0, 0, 0
+        while True:
+            batch = list(listings.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            postings += index_jobs(batch, matcher)
+            jobs += len(batch)
+            last_id = batch[-1].id
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{jobs} listings indexed...')
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {jobs} listings: {postings} postings for {len(set(matcher.phrases.values()))} skills.'
+        ))
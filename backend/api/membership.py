@@ -0,0 +1,94 @@
+"""
+Cached study group membership lookups.
+
+ChatConsumer checks membership once per connection. Results live in the
+shared Django cache for ``STUDY_GROUP_MEMBERSHIP_TTL`` seconds and are
+invalidated by the signal handlers in api.models whenever a group's
+members change or the group is deleted. Invalidation waits for the change
+to commit, so a concurrent check cannot cache the old answer again, and
+members who are removed have their open chat connections closed.
+
+The cache is an optimisation: when it is unreachable, lookups go to the
+database and the error is logged.
+"""
+import logging
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+MEMBER = 1
+NOT_MEMBER = 0
+NO_GROUP = -1
+
+
+def _key(group_id, user_id):
+    return f'studygroup:{group_id}:member:{user_id}'
+
+
+def chat_group_name(group_id):
+    """The channel layer group of a study group's chat connections."""
+    return f'chat_{group_id}'
+
+
+def get_membership(group_id, user_id):
+    """``MEMBER``, ``NOT_MEMBER`` or ``NO_GROUP`` for this user and group."""
+    from .models import StudyGroup
+
+    key = _key(group_id, user_id)
+    try:
+        state = cache.get(key)
+    except Exception:
+        logger.exception("Could not read cached study group membership.")
+        state = key = None
+    if state is None:
+        membership = StudyGroup.members.through.objects.filter(studygroup_id=group_id, user_id=user_id)
+        if membership.exists():
+            state = MEMBER
+        elif StudyGroup.objects.filter(id=group_id).exists():
+            state = NOT_MEMBER
+        else:
+            state = NO_GROUP
+        if key is not None:
+            try:
+                cache.set(key, state, getattr(settings, "STUDY_GROUP_MEMBERSHIP_TTL", 300))
+            except Exception:
+                logger.exception("Could not cache study group membership.")
+    return state
+
+
+def is_group_member(group_id, user_id):
+    return get_membership(group_id, user_id) == MEMBER
+
+
+def invalidate_membership(group_ids, user_ids, revoke=False):
+    """
+    Forgets the cached membership of ``user_ids`` in ``group_ids`` once the
+    current transaction commits. With ``revoke``, their chat connections to
+    those groups are closed as well.
+    """
+    group_ids, user_ids = list(group_ids), list(user_ids)
+    if group_ids and user_ids:
+        transaction.on_commit(partial(_invalidate, group_ids, user_ids, revoke))
+
+
+def _invalidate(group_ids, user_ids, revoke):
+    try:
+        cache.delete_many([_key(group_id, user_id) for group_id in group_ids for user_id in user_ids])
+    except Exception:
+        logger.exception("Could not invalidate cached study group membership.")
+    if not revoke:
+        return
+    channel_layer = get_channel_layer()
+    try:
+        for group_id in group_ids:
+            async_to_sync(channel_layer.group_send)(
+                chat_group_name(group_id), {'type': 'chat.revoked', 'user_ids': user_ids},
+            )
+    except Exception:
+        logger.exception("Could not close the chat connections of removed study group members.")
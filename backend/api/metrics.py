@@ -0,0 +1,21 @@
+"""
+Process-local counters for monitoring.
+
+Code increments named counters with :func:`incr`; ``GET /api/metrics/``
+(admin only) returns a snapshot for the worker that serves the request.
+"""
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
@@ -1,20 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from urllib.parse import parse_qs
 
+from . import metrics
+
 User = get_user_model()
 
+
+class TokenUserCache:
+    """
+    Bounded LRU of access-token ``jti`` -> user.
+
+    An entry never outlives its token's ``exp`` claim, nor ``ttl`` seconds.
+    The cache is per process: deactivating, deleting or blacklisting a user
+    drops their entries at once in the process that made the change (see the
+    receivers in api.models), and in every other process within ``ttl``.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._jtis_by_user = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, jti):
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is not None:
+                user, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(jti)
+                    metrics.incr('ws_auth_cache_hits')
+                    return user
+                self._pop(jti)
+        metrics.incr('ws_auth_cache_misses')
+        return None
+
+    def put(self, jti, user, token_exp):
+        expires_at = min(token_exp, time.time() + self.ttl)
+        with self._lock:
+            self._pop(jti)
+            self._entries[jti] = (user, expires_at)
+            self._jtis_by_user.setdefault(user.pk, set()).add(jti)
+            while len(self._entries) > self.maxsize:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for jti in list(self._jtis_by_user.get(user_id, ())):
+                self._pop(jti)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._jtis_by_user.clear()
+
+    def _pop(self, jti):
+        entry = self._entries.pop(jti, None)
+        if entry is not None:
+            jtis = self._jtis_by_user.get(entry[0].pk)
+            if jtis is not None:
+                jtis.discard(jti)
+                if not jtis:
+                    del self._jtis_by_user[entry[0].pk]
+
+
+token_user_cache = TokenUserCache(
+    maxsize=getattr(settings, "WS_AUTH_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "WS_AUTH_CACHE_TTL", 30),
+)
+
+
 @database_sync_to_async
-def get_user(token_key):
+def fetch_user(user_id):
+    return User.objects.filter(id=user_id, is_active=True).first()
+
+
+async def get_user(token_key):
+    from django.contrib.auth.models import AnonymousUser  # Import here to avoid settings issues
     try:
-        from django.contrib.auth.models import AnonymousUser  # Import here to avoid settings issues
+        # Signature and expiry checks are pure CPU; only a cache miss needs the database.
         token = AccessToken(token_key)
-        user_id = token['user_id']
-        return User.objects.get(id=user_id)
     except Exception:
         return AnonymousUser()
 
+    jti = token.get(settings.SIMPLE_JWT.get("JTI_CLAIM", "jti"))
+    user = token_user_cache.get(jti) if jti else None
+    if user is None:
+        user = await fetch_user(token['user_id'])
+        if user is None:
+            return AnonymousUser()
+        if jti:
+            token_user_cache.put(jti, user, token['exp'])
+    return user
+
 class TokenAuthMiddleware:
     """
     Custom token auth middleware for Channels WebSockets.
@@ -0,0 +1,87 @@
+import json
+import struct
+
+import numpy as np
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Frozen copy of version 1 of api.face_codec: a 4-byte header (version,
+# reserved byte, uint16 dimensions) followed by little-endian float32s.
+HEADER = struct.Struct('<BxH')
+DTYPE = np.dtype('<f4')
+
+
+def encode(values):
+    values = np.asarray(values, dtype=DTYPE).ravel()
+    return HEADER.pack(1, len(values)) + values.tobytes()
+
+
+def decode(raw):
+    _, size = HEADER.unpack_from(raw)
+    return np.frombuffer(raw, dtype=DTYPE, count=size, offset=HEADER.size)
+
+
+def decode_json(text):
+    """The encoding in a legacy JSON text value, or None if it is unreadable."""
+    try:
+        values = np.asarray(json.loads(text), dtype=DTYPE)
+    except (TypeError, ValueError):
+        return None
+    return values if values.ndim == 1 else None
+
+
+def json_to_binary(apps, schema_editor):
+    UserProfile = apps.get_model('api', 'UserProfile')
+    profiles = UserProfile.objects.filter(face_encoding__isnull=False).only('pk', 'face_encoding')
+    batch = []
+    for profile in profiles.iterator(chunk_size=BATCH_SIZE):
+        values = decode_json(profile.face_encoding)
+        if values is None:
+            continue  # Unreadable rows are dropped, exactly as face login used to skip them.
+        profile.face_encoding_bin = encode(values)
+        batch.append(profile)
+        if len(batch) == BATCH_SIZE:
+            UserProfile.objects.bulk_update(batch, ['face_encoding_bin'])
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ['face_encoding_bin'])
+
+
+def binary_to_json(apps, schema_editor):
+    UserProfile = apps.get_model('api', 'UserProfile')
+    profiles = UserProfile.objects.filter(face_encoding_bin__isnull=False).only('pk', 'face_encoding_bin')
+    batch = []
+    for profile in profiles.iterator(chunk_size=BATCH_SIZE):
+        profile.face_encoding = json.dumps(decode(bytes(profile.face_encoding_bin)).tolist())
+        batch.append(profile)
+        if len(batch) == BATCH_SIZE:
+            UserProfile.objects.bulk_update(batch, ['face_encoding'])
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ['face_encoding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_userprofile_face_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='face_encoding_bin',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='face_encoding',
+        ),
+        migrations.RenameField(
+            model_name='userprofile',
+            old_name='face_encoding_bin',
+            new_name='face_encoding',
+        ),
+    ]
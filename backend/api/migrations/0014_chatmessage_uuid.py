@@ -0,0 +1,45 @@
+import uuid
+
+import django.utils.timezone
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def assign_uuids(apps, schema_editor):
+    ChatMessage = apps.get_model('api', 'ChatMessage')
+    batch = []
+    for message in ChatMessage.objects.filter(uuid__isnull=True).only('pk').iterator(chunk_size=BATCH_SIZE):
+        message.uuid = uuid.uuid4()
+        batch.append(message)
+        if len(batch) == BATCH_SIZE:
+            ChatMessage.objects.bulk_update(batch, ['uuid'])
+            batch = []
+    if batch:
+        ChatMessage.objects.bulk_update(batch, ['uuid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_userprofile_binary_face_encoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_chatmessage_uuid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['group', 'timestamp', 'id'], name='chatmessage_group_ts_id'),
+        ),
+    ]
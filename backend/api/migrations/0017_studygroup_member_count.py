@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_members(apps, schema_editor):
+    StudyGroup = apps.get_model('api', 'StudyGroup')
+    Membership = StudyGroup.members.through
+    counts = (
+        Membership.objects.filter(studygroup_id=OuterRef('pk'))
+        .values('studygroup_id')
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    StudyGroup.objects.update(member_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_chatarchivechunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studygroup',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+CONTENT_FIELDS = ('title', 'company_name', 'location', 'description', 'application_url', 'job_type')
+
+
+# Frozen copies of JobListing.normalize_url / hash_url / hash_content.
+def hash_url(url):
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_')
+    ))
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def hash_content(job):
+    payload = json.dumps([getattr(job, name) for name in CONTENT_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def assign_hashes(apps, schema_editor):
+    JobListing = apps.get_model('api', 'JobListing')
+    seen = set()
+    duplicates = []
+    batch = []
+    # Newest first, so the most recent copy of a duplicated URL is the one kept.
+    for job in JobListing.objects.order_by('-id').iterator(chunk_size=BATCH_SIZE):
+        job.application_url_hash = hash_url(job.application_url)
+        if job.application_url_hash in seen:
+            duplicates.append(job.id)
+            continue
+        seen.add(job.application_url_hash)
+        job.content_hash = hash_content(job)
+        batch.append(job)
+        if len(batch) == BATCH_SIZE:
+            JobListing.objects.bulk_update(batch, ['application_url_hash', 'content_hash'])
+            batch = []
+    if batch:
+        JobListing.objects.bulk_update(batch, ['application_url_hash', 'content_hash'])
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        JobListing.objects.filter(id__in=duplicates[start:start + BATCH_SIZE]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_studygroup_member_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='joblisting',
+            name='application_url_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='joblisting',
+            name='content_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='joblisting',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(assign_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='joblisting',
+            name='application_url_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
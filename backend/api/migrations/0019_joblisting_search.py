@@ -0,0 +1,99 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Weighted like api.job_search: title A, company B, description C.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE api_joblisting ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(company_name, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX joblisting_search ON api_joblisting USING GIN (search_vector)",
+    # Serves location__istartswith, which compiles to UPPER(location::text) LIKE UPPER(%s).
+    "CREATE INDEX joblisting_location ON api_joblisting (UPPER(location::text) text_pattern_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS joblisting_location",
+    "DROP INDEX IF EXISTS joblisting_search",
+    "ALTER TABLE api_joblisting DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_joblisting_fts USING fts5(
+        title, company_name, description, content='api_joblisting', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER api_joblisting_fts_insert AFTER INSERT ON api_joblisting BEGIN
+        INSERT INTO api_joblisting_fts (rowid, title, company_name, description)
+        VALUES (new.id, new.title, new.company_name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_joblisting_fts_delete AFTER DELETE ON api_joblisting BEGIN
+        INSERT INTO api_joblisting_fts (api_joblisting_fts, rowid, title, company_name, description)
+        VALUES ('delete', old.id, old.title, old.company_name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER api_joblisting_fts_update AFTER UPDATE ON api_joblisting BEGIN
+        INSERT INTO api_joblisting_fts (api_joblisting_fts, rowid, title, company_name, description)
+        VALUES ('delete', old.id, old.title, old.company_name, old.description);
+        INSERT INTO api_joblisting_fts (rowid, title, company_name, description)
+        VALUES (new.id, new.title, new.company_name, new.description);
+    END
+    """,
+    "INSERT INTO api_joblisting_fts (api_joblisting_fts) VALUES ('rebuild')",
+    # SQLite's LIKE is case-insensitive, so it can only use a NOCASE index.
+    "CREATE INDEX joblisting_location ON api_joblisting (location COLLATE NOCASE)",
+]
+SQLITE_REVERSE = [
+    "DROP INDEX IF EXISTS joblisting_location",
+    "DROP TRIGGER IF EXISTS api_joblisting_fts_update",
+    "DROP TRIGGER IF EXISTS api_joblisting_fts_delete",
+    "DROP TRIGGER IF EXISTS api_joblisting_fts_insert",
+    "DROP TABLE IF EXISTS api_joblisting_fts",
+]
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_joblisting_hashes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='joblisting',
+            index=models.Index(fields=['-posted_date', '-id'], name='joblisting_posted'),
+        ),
+        migrations.AddIndex(
+            model_name='joblisting',
+            index=models.Index(fields=['job_type', '-posted_date'], name='joblisting_type_posted'),
+        ),
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+        # Unmanaged: the ORM's view of the SQLite FTS5 table created above.
+        migrations.CreateModel(
+            name='JobListingFTS',
+            fields=[
+                ('job', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts', serialize=False, to='api.joblisting')),
+            ],
+            options={
+                'db_table': 'api_joblisting_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_joblisting_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='aliases',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='JobSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('posted_date', models.DateTimeField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_postings', to='api.joblisting')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_postings', to='api.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['skill', '-weight', '-posted_date', '-job'], name='jobskill_postings')],
+                'unique_together': {('skill', 'job')},
+            },
+        ),
+    ]
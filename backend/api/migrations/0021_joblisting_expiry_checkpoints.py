@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+import datetime
+import hashlib
+import json
+
+import django.utils.timezone
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+CONTENT_FIELDS = (
+    'title', 'company_name', 'location', 'description', 'application_url', 'job_type', 'posted_date', 'expires_at',
+)
+
+
+# Frozen copy of JobListing.hash_content, which now covers the dates as well.
+def hash_content(job):
+    payload = json.dumps(
+        [getattr(job, name) for name in CONTENT_FIELDS], ensure_ascii=False,
+        default=lambda value: value.astimezone(datetime.timezone.utc).isoformat(),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def rehash_content(apps, schema_editor):
+    # Without this, the first ingest would count every existing listing as updated and rewrite it.
+    JobListing = apps.get_model('api', 'JobListing')
+    batch = []
+    for job in JobListing.objects.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        job.content_hash = hash_content(job)
+        batch.append(job)
+        if len(batch) == BATCH_SIZE:
+            JobListing.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        JobListing.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_skill_aliases_jobskill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='joblisting',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        # Only the Python-side default changes. Applied to the database, SQLite
+        # would rebuild the table and drop the full-text triggers from 0019.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='joblisting',
+                    name='posted_date',
+                    field=models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.RunPython(rehash_content, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='JobIngestionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('country', models.CharField(max_length=10)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('last_run_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('query', 'country')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+# Frozen copy of InterviewQuestion.hash_question.
+def hash_question(text):
+    normalized = ' '.join(text.split()).casefold()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def assign_hashes(apps, schema_editor):
+    InterviewQuestion = apps.get_model('api', 'InterviewQuestion')
+    seen = set()
+    duplicates = []
+    batch = []
+    # Oldest first, so the first copy of a duplicated question is the one kept.
+    for question in InterviewQuestion.objects.only('id', 'skill_id', 'question_text').order_by('id').iterator(chunk_size=BATCH_SIZE):
+        question.question_hash = hash_question(question.question_text)
+        key = (question.skill_id, question.question_hash)
+        if key in seen:
+            duplicates.append(question.id)
+            continue
+        seen.add(key)
+        batch.append(question)
+        if len(batch) == BATCH_SIZE:
+            InterviewQuestion.objects.bulk_update(batch, ['question_hash'])
+            batch = []
+    if batch:
+        InterviewQuestion.objects.bulk_update(batch, ['question_hash'])
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        InterviewQuestion.objects.filter(id__in=duplicates[start:start + BATCH_SIZE]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_joblisting_expiry_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interviewquestion',
+            name='question_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(assign_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='interviewquestion',
+            name='question_hash',
+            field=models.CharField(editable=False, max_length=64),
+        ),
+        migrations.AlterUniqueTogether(
+            name='interviewquestion',
+            unique_together={('skill', 'question_hash')},
+        ),
+    ]
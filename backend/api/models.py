@@ -1,8 +1,19 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.exceptions import ValidationError
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+import datetime
+import hashlib
 import json
+import uuid
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .membership import invalidate_membership
 
 def user_directory_path(instance, filename):
     return f'user_{instance.user.id}/certificates/{filename}'
@@ -17,6 +28,8 @@ class Certificate(models.Model):
 class Skill(models.Model):
     name = models.CharField(max_length=100, unique=True)
     category = models.CharField(max_length=100, blank=True, help_text="e.g., Programming, Design, Marketing")
+    # Other spellings job listings use for the skill, e.g. ["reactjs", "react.js"] for React.
+    aliases = models.JSONField(default=list, blank=True)
 
     def __str__(self):
         return self.name
@@ -53,6 +66,9 @@ class Resume(models.Model):
     def __str__(self):
         return f"Resume for {self.user.username}"
 
+def _utc_isoformat(value):
+    return value.astimezone(datetime.timezone.utc).isoformat()
+
 class JobListing(models.Model):
     JOB_TYPE_CHOICES = [
         ('Internship', 'Internship'),
@@ -65,30 +81,146 @@ class JobListing(models.Model):
     location = models.CharField(max_length=150)
     description = models.TextField()
     application_url = models.URLField(max_length=500)
+    # sha256 of the normalized application_url: the ingestion upsert key.
+    application_url_hash = models.CharField(max_length=64, unique=True, editable=False)
+    # sha256 of CONTENT_FIELDS, so re-ingesting an unchanged job writes nothing.
+    content_hash = models.CharField(max_length=64, editable=False)
     job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES, default='Full-time')
-    posted_date = models.DateTimeField(auto_now_add=True)
+    # When the source says the job was posted (first seen, if it does not say) and expires.
+    posted_date = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    CONTENT_FIELDS = (
+        'title', 'company_name', 'location', 'description', 'application_url', 'job_type', 'posted_date', 'expires_at',
+    )
 
     def __str__(self):
         return f'{self.title} at {self.company_name}'
 
+    def save(self, *args, **kwargs):
+        self.application_url_hash = self.hash_url(self.application_url)
+        self.content_hash = self.hash_content()
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def normalize_url(url):
+        """Lower-cases scheme and host and drops the fragment, utm_* parameters and a trailing slash."""
+        parts = urlsplit(url.strip())
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith('utm_')
+        ))
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+
+    @classmethod
+    def hash_url(cls, url):
+        return hashlib.sha256(cls.normalize_url(url).encode()).hexdigest()
+
+    def hash_content(self):
+        """
+        sha256 of CONTENT_FIELDS as stored, dates in UTC, so a listing hashes the
+        same whether it came from the source, the database or a form.
+        """
+        payload = json.dumps([getattr(self, name) for name in self.CONTENT_FIELDS], ensure_ascii=False, default=_utc_isoformat)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
     class Meta:
         ordering = ['-posted_date']
+        # Full-text search and the location prefix index are vendor-specific and
+        # live in migration 0019_joblisting_search; see api.job_search.
+        indexes = [
+            models.Index(fields=['-posted_date', '-id'], name='joblisting_posted'),
+            models.Index(fields=['job_type', '-posted_date'], name='joblisting_type_posted'),
+        ]
+
+class JobListingFTS(models.Model):
+    """
+    The SQLite FTS5 index over JobListing, created by migration
+    0019_joblisting_search and kept in step by triggers. Declared only so
+    api.job_search can join it; there is no such table on other databases.
+    """
+    job = models.OneToOneField(
+        JobListing, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fts',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'api_joblisting_fts'
+
+class JobIngestionCheckpoint(models.Model):
+    """
+    How far fetch_jobs has got for one query and country: the newest posting
+    date it has seen. The next run asks the source for newer jobs only.
+    """
+    query = models.CharField(max_length=255)
+    country = models.CharField(max_length=10)
+    watermark = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('query', 'country')
+
+    def __str__(self):
+        return f'{self.query} ({self.country}) up to {self.watermark}'
+
+class JobSkill(models.Model):
+    """
+    Inverted index from skills to the listings that mention them, maintained
+    by api.job_skills as listings are ingested. ``posted_date`` is copied from
+    the listing so a skill's newest, strongest postings are one index range.
+    """
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='job_postings')
+    job = models.ForeignKey(JobListing, on_delete=models.CASCADE, related_name='skill_postings')
+    weight = models.PositiveSmallIntegerField()
+    posted_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('skill', 'job')
+        indexes = [
+            models.Index(fields=['skill', '-weight', '-posted_date', '-job'], name='jobskill_postings'),
+        ]
 
 class InterviewQuestion(models.Model):
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='questions')
     question_text = models.TextField()
+    # sha256 of the question with case and whitespace normalized: unique per skill.
+    question_hash = models.CharField(max_length=64, editable=False)
     answer_text = models.TextField()
     difficulty = models.CharField(max_length=20, choices=[('Easy', 'Easy'), ('Medium', 'Medium'), ('Hard', 'Hard')], default='Medium')
 
     def __str__(self):
         return f"{self.skill.name} - {self.question_text[:50]}..."
 
+    def clean(self):
+        # question_hash is not editable, so ModelForm validation skips the unique_together check.
+        super().clean()
+        if self.skill_id is not None and self.question_text:
+            duplicates = InterviewQuestion.objects.filter(
+                skill_id=self.skill_id, question_hash=self.hash_question(self.question_text),
+            ).exclude(pk=self.pk)
+            if duplicates.exists():
+                raise ValidationError({'question_text': 'This skill already has this question.'})
+
+    def save(self, *args, **kwargs):
+        self.question_hash = self.hash_question(self.question_text)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def hash_question(text):
+        normalized = ' '.join(text.split()).casefold()
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
     class Meta:
         ordering = ['skill', 'difficulty']
+        unique_together = ('skill', 'question_hash')
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='userprofile')
-    face_encoding = models.TextField(blank=True, null=True)
+    # Versioned little-endian float32 bytes, see api.face_codec.
+    face_encoding = models.BinaryField(blank=True, null=True)
+    # Lets other worker processes pick up new faces incrementally (see api.face_index).
+    face_updated_at = models.DateTimeField(blank=True, null=True, db_index=True)
 
     def __str__(self):
         return self.user.username
@@ -102,26 +234,151 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     instance.userprofile.save()
 
+# Drop cached WebSocket authentication (api.middleware) of users who can no longer log in.
+@receiver(post_save, sender=User)
+def invalidate_deactivated_user(sender, instance, **kwargs):
+    from .middleware import token_user_cache
+    if not instance.is_active:
+        token_user_cache.invalidate_user(instance.pk)
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    from .middleware import token_user_cache
+    token_user_cache.invalidate_user(instance.pk)
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklisted_token_user(sender, instance, **kwargs):
+    from .middleware import token_user_cache
+    # Blacklisting applies to refresh tokens; drop every cached access token of that user.
+    token_user_cache.invalidate_user(instance.token.user_id)
+
+@receiver(post_delete, sender=UserProfile)
+def remove_deleted_face(sender, instance, **kwargs):
+    # Other processes find out at login time (see FaceLoginView).
+    from .face_index import get_face_index
+    user_id = instance.user_id
+    transaction.on_commit(lambda: get_face_index().remove(user_id))
+
 # --- Add the new StudyGroup Model below ---
 class StudyGroup(models.Model):
     name = models.CharField(max_length=150)
     description = models.TextField(blank=True)
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_groups')
     members = models.ManyToManyField(User, related_name='study_groups', blank=True)
+    # Kept equal to members.count() by the m2m_changed handler below.
+    member_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.name
-    
+
+    def lock(self):
+        """Locks the group's row until the end of the transaction, serializing member changes."""
+        StudyGroup.objects.select_for_update().filter(pk=self.pk).exists()
+
+# Keep cached chat membership checks (api.membership) and StudyGroup.member_count
+# in step with the members table. add() and remove() report exact pk_sets only
+# while no one else changes the same group, so the views lock the group row
+# first (see StudyGroup.lock); clear() and user deletion recount instead.
+@receiver(m2m_changed, sender=StudyGroup.members.through)
+def study_group_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is not provided for clear(), so collect the affected ids first.
+        if reverse:
+            pk_set = set(instance.study_groups.values_list('id', flat=True))
+        else:
+            pk_set = set(instance.members.values_list('id', flat=True))
+        instance._removed_study_group_members = pk_set
+    elif action == 'pre_remove':
+        # remove() reports every id it was given; count only the rows that exist.
+        through = StudyGroup.members.through.objects
+        if reverse:
+            existing = through.filter(user_id=instance.pk, studygroup_id__in=pk_set).values_list('studygroup_id', flat=True)
+        else:
+            existing = through.filter(studygroup_id=instance.pk, user_id__in=pk_set).values_list('user_id', flat=True)
+        instance._removed_study_group_members = set(existing)
+    elif action == 'post_add':
+        # pk_set holds only the ids that were not members yet.
+        update_member_counts(instance, reverse, pk_set, 1)
+    elif action == 'post_remove':
+        update_member_counts(instance, reverse, instance.__dict__.pop('_removed_study_group_members', ()), -1)
+    elif action == 'post_clear':
+        recount_members(instance.__dict__.pop('_removed_study_group_members', ()) if reverse else [instance.pk])
+
+    if action not in ('pre_clear', 'post_add', 'post_remove'):
+        return
+    revoke = action != 'post_add'
+    if reverse:
+        invalidate_membership(pk_set, [instance.pk], revoke)
+    else:
+        invalidate_membership([instance.pk], pk_set, revoke)
+
+def update_member_counts(instance, reverse, pk_set, sign):
+    if not pk_set:
+        return
+    if reverse:
+        # A user joined or left each group in pk_set.
+        StudyGroup.objects.filter(pk__in=pk_set).update(member_count=F('member_count') + sign)
+    else:
+        StudyGroup.objects.filter(pk=instance.pk).update(member_count=F('member_count') + sign * len(pk_set))
+
+def recount_members(group_ids, leaving_user_id=None):
+    """Sets member_count from the members table, leaving out ``leaving_user_id``."""
+    members = StudyGroup.members.through.objects.filter(studygroup_id=OuterRef('pk'))
+    if leaving_user_id is not None:
+        members = members.exclude(user_id=leaving_user_id)
+    count = members.order_by().values('studygroup_id').annotate(count=Count('id')).values('count')
+    StudyGroup.objects.filter(pk__in=list(group_ids)).update(member_count=Coalesce(Subquery(count), 0))
+
+@receiver(pre_delete, sender=User)
+def leave_study_groups_on_user_delete(sender, instance, **kwargs):
+    # The cascade deletes membership rows without sending m2m_changed.
+    group_ids = list(StudyGroup.objects.filter(members=instance).values_list('id', flat=True))
+    invalidate_membership(group_ids, [instance.pk], revoke=True)
+    recount_members(group_ids, leaving_user_id=instance.pk)
+
+@receiver(pre_delete, sender=StudyGroup)
+def invalidate_deleted_study_group(sender, instance, **kwargs):
+    invalidate_membership([instance.pk], instance.members.values_list('id', flat=True), revoke=True)
+
 # --- Add the new ChatMessage Model below ---
 class ChatMessage(models.Model):
+    # Assigned by the server before the row is written, so a message can be
+    # broadcast (and deduplicated by clients) before it reaches the database.
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='messages')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f'{self.user.username}: {self.message[:20]}'
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Backs the keyset-paginated history endpoint.
+            models.Index(fields=['group', 'timestamp', 'id'], name='chatmessage_group_ts_id'),
+        ]
+
+
+class ChatArchiveChunk(models.Model):
+    """
+    One month of a group's chat, moved out of ChatMessage by the
+    archive_chat_messages command. See api.chat_archive.
+    """
+    group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='archive_chunks')
+    month = models.DateField()  # First day of the month, UTC.
+    message_count = models.PositiveIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    # gzip-compressed NDJSON, one message per line, in (timestamp, id) order.
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.group.name} {self.month:%Y-%m} ({self.message_count} messages)'
+
+    class Meta:
+        unique_together = ('group', 'month')
+        ordering = ['group', 'month']
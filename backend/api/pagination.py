@@ -0,0 +1,193 @@
+"""
+Keyset (cursor) pagination over a two-column ordering.
+
+Pages are selected with a ``WHERE (a, b) > (cursor)`` style filter on an
+index-backed ordering instead of an OFFSET, so fetching page 10,000 costs
+the same as fetching the first one.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Responds with ``{"before": ..., "after": ..., "results": [...]}``.
+
+    ``?after=<cursor>`` returns the page following the cursor in ``ordering``
+    and ``?before=<cursor>`` the page preceding it. Either cursor is ``null``
+    when there is nothing more in that direction.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    # Primary key last so every row has a unique position. '-' means descending.
+    ordering = ('timestamp', 'id')
+    # Without a cursor, start at the end of the ordering (e.g. the newest chat messages).
+    start_from_end = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        before = self.decode_cursor(request.query_params.get('before'), queryset)
+        after = self.decode_cursor(request.query_params.get('after'), queryset)
+        if before is not None and after is not None:
+            raise ValidationError("Pass either 'before' or 'after', not both.")
+
+        backwards = before is not None or (after is None and self.start_from_end)
+        ordering = self._reversed(self.ordering) if backwards else self.ordering
+        cursor = before if backwards else after
+        rows = self.fetch(queryset, ordering, cursor, self.page_size + 1)
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+
+        # Travelling backwards from a cursor, the rows after this page exist; and vice versa.
+        has_previous = more if backwards else after is not None
+        has_next = (before is not None) if backwards else more
+        self.before = self.encode_cursor(rows[0]) if rows and has_previous else None
+        self.after = self.encode_cursor(rows[-1]) if rows and has_next else None
+        return rows
+
+    def fetch(self, queryset, ordering, cursor, limit):
+        """The first ``limit`` rows after ``cursor`` in ``ordering``."""
+        if cursor is not None:
+            queryset = queryset.filter(self._past(ordering, cursor))
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def get_paginated_response(self, data):
+        return Response({'before': self.before, 'after': self.after, 'results': data})
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ------------------------
+    # Cursors
+    # ------------------------
+    def _names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self._names():
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, queryset):
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            fields = [queryset.model._meta.get_field(name) for name in self._names()]
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (ValueError, TypeError, binascii.Error, DjangoValidationError):
+            raise ValidationError("Invalid cursor.")
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(f[1:] if f.startswith('-') else f'-{f}' for f in ordering)
+
+    @staticmethod
+    def _past(ordering, cursor):
+        """Rows that come strictly after ``cursor`` in ``ordering``."""
+        (first, second), (first_value, second_value) = ordering, cursor
+
+        def lookup(field, strict):
+            name = field.lstrip('-')
+            op = ('lt' if field.startswith('-') else 'gt') + ('' if strict else 'e')
+            return f'{name}__{op}'
+
+        # The non-strict bound on the leading column lets the index range scan start at the cursor.
+        return Q(**{lookup(first, strict=False): first_value}) & (
+            Q(**{lookup(first, strict=True): first_value}) | Q(**{lookup(second, strict=True): second_value})
+        )
+
+
+class ChatHistoryPagination(KeysetPagination):
+    """
+    Oldest-to-newest chat messages; the first page is the most recent one.
+
+    Given an ``archive`` (api.chat_archive.ArchivedMessages), pages that
+    reach past the hot table continue into the group's archived months.
+    """
+    page_size = 50
+    ordering = ('timestamp', 'id')
+    start_from_end = True
+
+    def __init__(self, archive=None):
+        self.archive = archive
+
+    def fetch(self, queryset, ordering, cursor, limit):
+        rows = super().fetch(queryset, ordering, cursor, limit)
+        if self.archive is None:
+            return rows
+
+        def key(message):
+            return message.timestamp, message.id
+
+        descending = ordering[0].startswith('-')
+        # A full page from the hot table only needs archived rows that sort before its last one.
+        bound = key(rows[-1]) if len(rows) == limit else None
+        archived = self.archive.fetch(descending, tuple(cursor) if cursor else None, limit, bound)
+        if not archived:
+            return rows
+        merged = {message.id: message for message in archived}
+        merged.update((message.id, message) for message in rows)
+        return sorted(merged.values(), key=key, reverse=descending)[:limit]
+
+
+class StudyGroupPagination(KeysetPagination):
+    """Newest groups first; follow the 'after' cursor for older ones."""
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+class JobListingPagination(KeysetPagination):
+    """Newest listings first, on the joblisting_posted index; follow the 'after' cursor for older ones."""
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-posted_date', '-id')
+
+
+class RankedPagination(PageNumberPagination):
+    """
+    Numbered pages for relevance-ordered results, where there is no stable
+    key to resume from. Skips the COUNT(*) over the match set: responds
+    with ``{"page": n, "next_page": n + 1 or null, "results": [...]}``.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    max_page = 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page = max(1, min(int(request.query_params.get(self.page_query_param, 1)), self.max_page))
+        except ValueError:
+            raise ValidationError("Invalid page.")
+        offset = (self.page - 1) * self.page_size
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size and self.page < self.max_page
+        return rows[:self.page_size]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'page': self.page,
+            'next_page': self.page + 1 if self.has_next else None,
+            'results': data,
+        })
@@ -0,0 +1,131 @@
+"""
+Interview-question generation for the generate_questions command.
+
+Skills are sent to an LLM backend (api.llm) on a thread pool, at most
+``workers`` at a time and no faster than the backend's rate limit, with
+retries. Answers are parsed and saved on the calling thread as they
+arrive, and each finished skill is recorded in a progress file so a rerun
+after a crash or Ctrl-C only asks about the skills that are left.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from .job_ingestion import RateLimiter
+from .llm import generate_with_retries
+from .models import InterviewQuestion, Skill
+
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+
+PROMPT = """
+Generate 5 interview questions for a '{skill}' role.
+The questions should be of varying difficulty (at least one Easy, one Medium, and one Hard).
+For each question, provide a concise but comprehensive answer.
+Format the output as a valid JSON array of objects. Each object must have three keys: "question_text", "answer_text", and "difficulty" (with values "Easy", "Medium", or "Hard").
+Do not include any text or formatting outside of the JSON array.
+"""
+
+
+@dataclass
+class GenerationStats:
+    skills: int = 0
+    failed: int = 0
+    questions: int = 0
+
+
+class Progress:
+    """The ids of the skills already done, kept in a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f).get('done', []))
+
+    def mark_done(self, skill_id):
+        self.done.add(skill_id)
+        if not self.path:
+            return
+        # Write next to the file and rename, so an interrupted run never leaves it truncated.
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'done': sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def parse_questions(text):
+    """The question dicts in a model's answer; raises ValueError if there are none."""
+    cleaned = text.strip().removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+    questions = [
+        {
+            'question_text': item['question_text'].strip(),
+            'answer_text': str(item.get('answer_text') or '').strip(),
+            'difficulty': item.get('difficulty') if item.get('difficulty') in DIFFICULTIES else 'Medium',
+        }
+        for item in json.loads(cleaned)
+        if isinstance(item, dict) and isinstance(item.get('question_text'), str) and item['question_text'].strip()
+    ]
+    if not questions:
+        raise ValueError('No questions in the response.')
+    return questions
+
+
+def save_questions(skill, questions):
+    """
+    Saves the questions the skill does not have yet, ignoring differences in
+    case and whitespace: one SELECT of the skill's question hashes, one
+    INSERT, and one SELECT of the inserted hashes. Returns how many rows
+    were inserted.
+    """
+    new = {}
+    for question in questions:
+        question_hash = InterviewQuestion.hash_question(question['question_text'])
+        new.setdefault(question_hash, InterviewQuestion(skill=skill, question_hash=question_hash, **question))
+    with transaction.atomic():
+        # Serializes runs saving questions for the same skill.
+        Skill.objects.select_for_update().filter(pk=skill.pk).exists()
+        for question_hash in InterviewQuestion.objects.filter(skill=skill, question_hash__in=new).values_list('question_hash', flat=True):
+            del new[question_hash]
+        if not new:
+            return 0
+        # ignore_conflicts covers a writer that does not take the lock, such as the admin. It
+        # does not say which rows it skipped, so the inserted ones are counted by re-selecting.
+        InterviewQuestion.objects.bulk_create(new.values(), ignore_conflicts=True)
+        return InterviewQuestion.objects.filter(skill=skill, question_hash__in=new).count()
+
+
+def generate_questions(skills, backend, workers=4, retries=3, backoff=1.0, progress=None, on_skill=None):
+    """
+    Generates and saves questions for every skill not in ``progress``.
+    ``on_skill(skill, saved_count_or_exception)`` is called as each finishes.
+    """
+    progress = progress or Progress(None)
+    limiter = RateLimiter(backend.rate)
+    stats = GenerationStats()
+
+    def generate(skill):
+        return generate_with_retries(backend, PROMPT.format(skill=skill.name), retries, backoff, limiter)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(generate, skill): skill for skill in skills if skill.id not in progress.done}
+        for future in as_completed(futures):
+            skill = futures[future]
+            try:
+                saved = save_questions(skill, parse_questions(future.result()))
+            except Exception as e:
+                # Anything one skill raises (a backend bug, a database error) must not end the run;
+                # the skill stays out of progress so the next run retries it.
+                stats.failed += 1
+                if on_skill:
+                    on_skill(skill, e)
+                continue
+            progress.mark_done(skill.id)
+            stats.skills += 1
+            stats.questions += saved
+            if on_skill:
+                on_skill(skill, saved)
+    return stats
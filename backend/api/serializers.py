@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Resume
-from .models import Resume, Certificate, Skill, UserSkill, JobListing, InterviewQuestion, UserProfile, StudyGroup
+from .models import Resume, Certificate, Skill, UserSkill, JobListing, InterviewQuestion, UserProfile, StudyGroup, ChatMessage
+from . import chat_events
 
 class CertificateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -61,7 +62,34 @@ class ResumeSerializer(serializers.ModelSerializer):
 class JobListingSerializer(serializers.ModelSerializer):
     class Meta:
         model = JobListing
-        fields = '__all__'
+        exclude = ['application_url_hash', 'content_hash']
+
+
+class JobListingListSerializer(serializers.ModelSerializer):
+    """For the job list: everything but the description, which only the detail endpoint returns."""
+    class Meta:
+        model = JobListing
+        fields = ['id', 'title', 'company_name', 'location', 'job_type', 'application_url', 'posted_date', 'expires_at']
+
+
+class JobSearchResultSerializer(serializers.ModelSerializer):
+    """A search hit: the start of the description instead of all of it, plus its rank."""
+    snippet = serializers.CharField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = JobListing
+        fields = ['id', 'title', 'company_name', 'location', 'job_type', 'application_url', 'posted_date', 'snippet', 'rank']
+
+
+class JobRecommendationSerializer(serializers.ModelSerializer):
+    """A recommended listing with its match score and the user's skills it mentions."""
+    score = serializers.IntegerField(read_only=True)
+    matched_skills = serializers.ListField(child=serializers.CharField(), read_only=True)
+
+    class Meta:
+        model = JobListing
+        fields = ['id', 'title', 'company_name', 'location', 'job_type', 'application_url', 'posted_date', 'score', 'matched_skills']
 #Interview
 # --- Add InterviewQuestionSerializer below ---
 class InterviewQuestionSerializer(serializers.ModelSerializer):
@@ -77,8 +105,9 @@ class StudyGroupSerializer(serializers.ModelSerializer):
     # Use a read-only field to show the creator's username
     creator_username = serializers.CharField(source='creator.username', read_only=True)
     # Use a read-only field to show how many members are in the group
-    members_count = serializers.IntegerField(source='members.count', read_only=True)
-    # Check if the current user is a member
+    members_count = serializers.IntegerField(source='member_count', read_only=True)
+    # Whether the current user is a member. StudyGroupViewSet annotates it onto
+    # its queryset; the fallback covers freshly created groups.
     is_member = serializers.SerializerMethodField()
 
     class Meta:
@@ -87,6 +116,32 @@ class StudyGroupSerializer(serializers.ModelSerializer):
         read_only_fields = ('creator', 'members') # These are handled by custom actions
 
     def get_is_member(self, obj):
+        if hasattr(obj, 'is_member'):
+            return obj.is_member
         user = self.context['request'].user
         return obj.members.filter(id=user.id).exists()
+
+
+class StudyGroupListSerializer(StudyGroupSerializer):
+    """The group list: everything but the member id array."""
+
+    class Meta(StudyGroupSerializer.Meta):
+        fields = ['id', 'name', 'description', 'creator', 'creator_username', 'members_count', 'is_member', 'created_at']
 # --- End of new serializer ---
+
+class ChatMessageSerializer(serializers.ModelSerializer):
+    # Built by the same function as the frames ChatConsumer broadcasts; the public id is the uuid.
+    type = serializers.SerializerMethodField()
+    id = serializers.UUIDField(source='uuid', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = ChatMessage
+        fields = ['type', 'id', 'user_id', 'username', 'message', 'timestamp']
+        read_only_fields = fields
+
+    def get_type(self, obj):
+        return 'message'
+
+    def to_representation(self, instance):
+        return chat_events.message_payload(instance, instance.user.username)
@@ -1,3 +1,1215 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import functools
+import io
+import json
+import os
+import signal
+import tempfile
+import time
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import redis
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.forms import modelform_factory
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from twisted.internet.abstract import FileDescriptor
+
+from . import chat_events, face_codec, metrics
+from .chat_archive import _chunk_messages
+from .chat_buffer import ChatWriteBehindBuffer, _drain_at_exit
+from .chat_limits import MessageLimiter, TokenBucket, UserBuckets, pending_write_bytes
+from .chat_recent import LocalRecentFrames, RedisRecentFrames, recent_frames
+from .consumers import ChatConsumer
+from .face_index import FaceIndex, get_face_index
+from .face_ivf import IVFFaceIndex, train_centroids
+from .face_pipeline import FacePoolBusy, FaceWorkerPool
+
+from .job_fixtures import FixtureServer
+from .job_ingestion import IngestionStats, JobSource, JSearchSource, expire_jobs, ingest, save_jobs
+from .job_skills import SkillMatcher
+from .llm import FakeBackend, LLMBackend, LLMError
+from .middleware import TokenUserCache, get_user, token_user_cache
+from .membership import MEMBER, NO_GROUP, NOT_MEMBER, get_membership
+from .pagination import ChatHistoryPagination
+from .models import (
+    ChatArchiveChunk, ChatMessage, InterviewQuestion, JobIngestionCheckpoint, JobListing, JobSkill, Skill, StudyGroup,
+    UserProfile, UserSkill,
+)
+from .question_generation import Progress, generate_questions, parse_questions, save_questions
+
+
+def random_faces(count, seed=0):
+    faces = np.random.default_rng(seed).normal(size=(count, 128)).astype(np.float32)
+    return faces / np.linalg.norm(faces, axis=1, keepdims=True)
+
+
+def register_face(user, encoding):
+    UserProfile.objects.filter(user=user).update(face_encoding=face_codec.encode(encoding), face_updated_at=timezone.now())
+
+
+class FaceCodecTests(SimpleTestCase):
+    def test_round_trip(self):
+        face = random_faces(1)[0]
+        raw = face_codec.encode(face)
+        self.assertEqual(len(raw), 4 + 128 * 4)
+        np.testing.assert_array_equal(face_codec.decode(raw, 128), face)
+        np.testing.assert_array_equal(face_codec.decode(memoryview(raw)), face)
+        # Values written before the binary format are still read.
+        np.testing.assert_array_equal(face_codec.decode(json.dumps(face.tolist()), 128), face)
+
+    def test_decode_rejects_bad_headers(self):
+        raw = face_codec.encode(random_faces(1)[0])
+        for bad in (None, raw[:3], b'\x02' + raw[1:], raw[:-4], raw + b'\0\0\0\0', '[1, 2', '[[1.0]]'):
+            with self.assertRaises(face_codec.FaceEncodingError, msg=bad):
+                face_codec.decode(bad)
+        with self.assertRaises(face_codec.FaceEncodingError):
+            face_codec.decode(face_codec.encode([1.0, 2.0]), 128)
+
+    def test_decode_many_skips_invalid_rows(self):
+        faces = random_faces(3)
+        raws = [face_codec.encode(faces[0]), None, face_codec.encode([1.0, 2.0]), b'\x02' + face_codec.encode(faces[1])[1:],
+                face_codec.encode(faces[1]), face_codec.encode(faces[2])]
+        matrix, valid = face_codec.decode_many(raws, 128)
+        self.assertEqual(valid.tolist(), [True, False, False, False, True, True])
+        np.testing.assert_array_equal(matrix, faces)
+        matrix, valid = face_codec.decode_many([], 128)
+        self.assertEqual(matrix.shape, (0, 128))
+
+
+class FaceIndexTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f'face{i}') for i in range(4)]
+        self.faces = random_faces(len(self.users))
+
+    def test_search_returns_the_closest_face_within_tolerance(self):
+        index = FaceIndex(initial_capacity=1)
+        for user, face in zip(self.users, self.faces):
+            index.add(user.id, face)
+        match = index.search(self.faces[2] + 0.01)
+        self.assertEqual(match.user_id, self.users[2].id)
+        self.assertIsNone(index.search(-self.faces[2]))
+
+        index.remove(self.users[0].id)
+        index.add(self.users[1].id, self.faces[3])  # Re-registered face.
+        self.assertEqual(len(index), 3)
+        self.assertAlmostEqual(index.search(self.faces[3]).distance, 0, places=3)
+        self.assertIsNone(index.search(self.faces[0], tolerance=0.1))
+
+    def test_sync_reads_only_changed_faces(self):
+        for user, face in zip(self.users[:3], self.faces):
+            register_face(user, face)
+        index = FaceIndex()
+        index.load()
+        self.assertEqual(len(index), 3)
+        # Nothing new: only the stamps in the overlap window are read.
+        with self.assertNumQueries(1):
+            index.sync()
+
+        # Registered by another worker process.
+        register_face(self.users[3], self.faces[3])
+        with self.assertNumQueries(2):
+            index.sync()
+        self.assertEqual(index.search(self.faces[3]).user_id, self.users[3].id)
+        with self.assertNumQueries(1):
+            index.sync()
+
+    def test_deleted_user_leaves_the_index(self):
+        index = FaceIndex()
+        index.add(self.users[0].id, self.faces[0])
+        with mock.patch('api.face_index.get_face_index', return_value=index):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.users[0].delete()
+        self.assertEqual(len(index), 0)
+
+
+class FaceIVFTests(SimpleTestCase):
+    def clustered_faces(self, count, clusters=32, seed=0):
+        rng = np.random.default_rng(seed)
+        centers = random_faces(clusters, seed)
+        faces = centers[rng.integers(clusters, size=count)] + rng.normal(scale=0.05, size=(count, 128))
+        return faces.astype(np.float32)
+
+    def test_recall_against_the_exact_index(self):
+        faces = self.clustered_faces(4000)
+        exact = FaceIndex()
+        exact.bulk_load(np.arange(len(faces)), faces)
+        ivf = IVFFaceIndex(train_centroids(faces, nlist=32, seed=1), nprobe=4)
+        ivf.bulk_load(np.arange(len(faces)), faces)
+        self.assertEqual(len(ivf), len(faces))
+        self.assertEqual(ivf.cell_sizes().sum(), len(faces))
+
+        queries = faces[::40] + np.random.default_rng(2).normal(scale=0.01, size=(100, 128)).astype(np.float32)
+        expected = [exact.search(query, tolerance=10).user_id for query in queries]
+        found = [ivf.search(query, tolerance=10).user_id for query in queries]
+        recall = np.mean(np.array(found) == np.array(expected))
+        self.assertGreaterEqual(recall, 0.95)
+        # Probing every cell is exact search.
+        self.assertEqual([ivf.search(query, tolerance=10, nprobe=32).user_id for query in queries], expected)
+
+    def test_add_and_remove_move_between_cells(self):
+        faces = self.clustered_faces(200, clusters=4)
+        ivf = IVFFaceIndex(train_centroids(faces, nlist=4), nprobe=1)
+        ivf.add(1, faces[0])
+        ivf.add(1, -faces[0])  # Re-registered, probably into another cell.
+        self.assertEqual((len(ivf), ivf.cell_sizes().sum()), (1, 1))
+        self.assertEqual(ivf.search(-faces[0]).user_id, 1)
+        ivf.remove(1)
+        self.assertEqual(ivf.cell_sizes().sum(), 0)
+        self.assertIsNone(ivf.search(faces[0]))
+
+    def test_train_needs_enough_encodings(self):
+        with self.assertRaises(ValueError):
+            train_centroids(random_faces(3), nlist=4)
+
+    @mock.patch('api.face_index._centroids_mtime', None)
+    @mock.patch('api.face_index._index', None)
+    def test_index_is_rebuilt_when_centroids_change(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'centroids.npy')
+            with self.settings(FACE_INDEX_MODE='ivf', FACE_IVF_CENTROIDS_PATH=path):
+                with self.assertLogs('api.face_index', 'WARNING'):
+                    self.assertIs(type(get_face_index()), FaceIndex)  # Not trained yet.
+
+                np.save(path, random_faces(8))
+                index = get_face_index()
+                self.assertIsInstance(index, IVFFaceIndex)
+                self.assertEqual(index.nlist, 8)
+                self.assertIs(get_face_index(), index)
+
+                np.save(path, random_faces(16))
+                os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+                self.assertEqual(get_face_index().nlist, 16)
+
+
+    def report(self, **options):
+        out = io.StringIO()
+        call_command('face_index_report', size=2000, queries=40, nlist=16, nprobe='16', stdout=out, **options)
+        rows = [line.split() for line in out.getvalue().splitlines() if line.split()[:1] in (['exact'], ['ivf'])]
+        return {row[0]: (row[2], row[3]) for row in rows}
+
+    def test_report_recall_counts_only_exact_matches(self):
+        self.assertEqual(self.report(), {'exact': ('1.000', '0.000'), 'ivf': ('1.000', '0.000')})
+        # An index that finds nothing has no recall, even though it "agrees" on every stranger.
+        with mock.patch.object(IVFFaceIndex, 'search', return_value=None):
+            self.assertEqual(self.report()['ivf'], ('0.000', '0.000'))
+
+
+class FaceWorkerPoolTests(SimpleTestCase):
+    def test_pool_is_replaced_when_a_worker_dies(self):
+        pool = FaceWorkerPool(workers=1, queue_limit=2, max_dimension=1, function=pow)
+        self.addCleanup(pool.shutdown)
+        self.assertEqual(pool.encode(3, timeout=60), 3)
+
+        # The worker SIGKILLs itself, as the OOM killer would.
+        worker_pid, = pool._executor._processes
+        pool.function, pool.max_dimension = os.kill, signal.SIGKILL
+        with self.assertRaises(FacePoolBusy):
+            pool.encode(worker_pid, timeout=60)
+
+        pool.function, pool.max_dimension = pow, 1
+        self.assertEqual(pool.encode(3, timeout=60), 3)
+        self.assertEqual(pool._slots._value, 2)
+
+    def test_queue_limit(self):
+        pool = FaceWorkerPool(workers=1, queue_limit=1, max_dimension=1, function=time.sleep)
+        self.addCleanup(pool.shutdown)
+        pool.submit(0.5)
+        with self.assertRaises(FacePoolBusy):
+            pool.submit(0)
+
+
+class EnrolFacesTests(TestCase):
+    def setUp(self):
+        User.objects.create(username='alice')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, 'photos')
+        os.makedirs(os.path.join(self.source, 'class'))
+        for name in ('alice.jpg', 'class/nobody.png', 'notes.txt'):
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(b'not an image')
+        self.summary = f'{self.source}.summary.csv'
+
+    def enrol(self, **options):
+        out = io.StringIO()
+        call_command('enrol_faces', self.source, workers=1, stdout=out, **options)
+        return out.getvalue()
+
+    def summary_rows(self):
+        with open(self.summary, newline='') as f:
+            return [(row['file'], row['status']) for row in csv.DictReader(f)]
+
+    def test_summary_and_resume(self):
+        output = self.enrol()
+        self.assertIn('2 photos to process (0 already done', output)
+        self.assertEqual(sorted(self.summary_rows()), [('alice.jpg', 'error'), ('class/nobody.png', 'unknown_user')])
+
+        self.assertIn('0 photos to process (2 already done', self.enrol())
+        self.assertEqual(len(self.summary_rows()), 2)
+
+        # Failed photos are processed again on request; successful ones never are.
+        with open(self.summary, 'a', newline='') as f:
+            f.write('class/nobody.png,nobody,ok,\n')
+        self.assertIn('1 photos to process (1 already done', self.enrol(retry_failed=True))
+        self.assertEqual(self.summary_rows()[-1], ('alice.jpg', 'error'))
+        self.assertIsNone(UserProfile.objects.get(user__username='alice').face_encoding)
+
+
+class FaceLoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='face')
+        self.face = random_faces(1)[0]
+        register_face(self.user, self.face)
+        self.index = FaceIndex()
+        self.index.load()
+        self.client = APIClient()
+
+    def login(self, face):
+        pool = mock.Mock(**{'encode.return_value': [face]})
+        with mock.patch('api.views.get_face_pool', return_value=pool), \
+                mock.patch('api.views.get_face_index', return_value=self.index):
+            return self.client.post('/api/face-login/', {'image': SimpleUploadedFile('face.jpg', b'jpeg')}, format='multipart')
+
+    def test_login(self):
+        response = self.login(self.face)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        self.assertEqual(self.login(-self.face).status_code, 401)
+
+    def test_busy_pool(self):
+        pool = mock.Mock(**{'encode.side_effect': FacePoolBusy})
+        with mock.patch('api.views.get_face_pool', return_value=pool):
+            response = self.client.post('/api/face-login/', {'image': SimpleUploadedFile('face.jpg', b'jpeg')}, format='multipart')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_user_deleted_by_another_process_is_not_a_match(self):
+        # Indexed here, deleted elsewhere: this process never saw the delete.
+        ghost = User.objects.create(username='ghost')
+        self.index.add(ghost.id, self.face)
+        self.index.remove(self.user.id)
+        User.objects.filter(pk=ghost.pk).delete()
+
+        self.assertEqual(self.login(self.face).status_code, 401)
+        self.assertEqual(len(self.index), 0)
+
+
+class ChatWriteBehindTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='writer')
+        self.group = StudyGroup.objects.create(name='Chat', creator=self.user)
+
+    def message(self, text):
+        return ChatMessage(group=self.group, user=self.user, message=text)
+
+    def saved(self):
+        return list(ChatMessage.objects.order_by('timestamp').values_list('message', flat=True))
+
+    def test_batches_and_timer(self):
+        async def scenario():
+            buffer = ChatWriteBehindBuffer(batch_size=2, flush_interval=0.01)
+            await buffer.add(self.message('a'))
+            self.assertEqual(await database_sync_to_async(self.saved)(), [])
+            await buffer.add(self.message('b'))  # Full batch.
+            self.assertEqual(len(buffer), 0)
+            await buffer.add(self.message('c'))
+            await asyncio.sleep(0.05)  # Flush interval.
+            self.assertEqual(len(buffer), 0)
+
+        async_to_sync(scenario)()
+        self.assertEqual(self.saved(), ['a', 'b', 'c'])
+
+    def test_failed_batches_are_retried_in_order(self):
+        async def scenario():
+            buffer = ChatWriteBehindBuffer(batch_size=2, flush_interval=0.01, max_pending=3)
+            with mock.patch.object(ChatMessage.objects, 'bulk_create', side_effect=OperationalError), \
+                    self.assertLogs('api.chat_buffer', 'ERROR'):
+                await buffer.add(self.message('a'))
+                await buffer.add(self.message('b'))
+                self.assertEqual(len(buffer), 2)
+                for text in 'cd':
+                    await buffer.add(self.message(text))
+                self.assertEqual(len(buffer), 3)  # 'a' was dropped.
+            await asyncio.sleep(0.2)  # Backoff, then the database is back.
+            self.assertEqual(len(buffer), 0)
+
+        async_to_sync(scenario)()
+        self.assertEqual(self.saved(), ['b', 'c', 'd'])
+
+    def test_bad_rows_do_not_lose_the_batch(self):
+        duplicate = self.message('duplicate')
+        duplicate.save()
+        buffer = ChatWriteBehindBuffer()
+        with self.assertLogs('api.chat_buffer', 'ERROR'):
+            self.assertEqual(buffer.write([self.message('a'), duplicate, self.message('b')]), [])
+        self.assertEqual(self.saved(), ['duplicate', 'a', 'b'])
+
+    def test_drained_at_exit(self):
+        # What runs under Daphne, which sends no lifespan shutdown event.
+        buffer = ChatWriteBehindBuffer()
+        buffer._pending = [self.message('a'), self.message('b')]
+        with mock.patch('api.chat_buffer._buffer', buffer):
+            _drain_at_exit()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(self.saved(), ['a', 'b'])
+
+
+class TokenUserCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='socket')
+        token_user_cache.clear()
+        self.addCleanup(token_user_cache.clear)
+
+    def test_lru_and_expiry(self):
+        cache = TokenUserCache(maxsize=2, ttl=60)
+        now = time.time()
+        cache.put('a', self.user, now + 3600)
+        cache.put('b', self.user, now + 3600)
+        self.assertIs(cache.get('a'), self.user)
+        cache.put('c', self.user, now + 3600)  # Evicts 'b', the least recently used.
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+        cache.put('expired', self.user, now - 1)
+        self.assertIsNone(cache.get('expired'))
+        with mock.patch('api.middleware.time.time', return_value=now + 61):
+            self.assertIsNone(cache.get('a'))  # Past the ttl.
+
+    def test_handshakes_hit_the_database_once_per_token(self):
+        token = str(AccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            self.assertEqual(async_to_sync(get_user)(token), self.user)
+            self.assertEqual(async_to_sync(get_user)(token), self.user)
+        self.assertTrue(async_to_sync(get_user)('not a token').is_anonymous)
+
+    def test_invalidated_when_the_user_can_no_longer_log_in(self):
+        token = str(AccessToken.for_user(self.user))
+        async_to_sync(get_user)(token)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(len(token_user_cache), 0)
+        self.assertTrue(async_to_sync(get_user)(token).is_anonymous)
+
+        self.user.is_active = True
+        self.user.save()
+        async_to_sync(get_user)(token)
+        RefreshToken.for_user(self.user).blacklist()
+        self.assertEqual(len(token_user_cache), 0)
+
+        async_to_sync(get_user)(token)
+        self.user.delete()
+        self.assertEqual(len(token_user_cache), 0)
+
+
+# Membership tests need a working cache whether or not Redis is running.
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class MembershipCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create(username='owner')
+        self.student = User.objects.create(username='student')
+        self.group = StudyGroup.objects.create(name='Class', creator=self.creator)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_invalidated_when_the_change_commits(self):
+        self.assertEqual(get_membership(self.group.id, self.student.id), NOT_MEMBER)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.group.members.add(self.student)
+            # A check racing the transaction still reads (and may cache) the old answer...
+            self.assertEqual(get_membership(self.group.id, self.student.id), NOT_MEMBER)
+        for callback in callbacks:
+            callback()
+        # ...which is forgotten once the change is visible.
+        self.assertEqual(get_membership(self.group.id, self.student.id), MEMBER)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        self.assertEqual(get_membership(self.group.id, self.student.id), NO_GROUP)
+
+    def test_unreachable_cache_falls_back_to_the_database(self):
+        broken = mock.Mock(**{f'{name}.side_effect': ConnectionError for name in ('get', 'set', 'delete_many')})
+        url = f'/api/study-groups/{self.group.id}/'
+        with mock.patch('api.membership.cache', broken), self.assertLogs('api.membership', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.post(url + 'join/').status_code, 200)
+            self.assertEqual(get_membership(self.group.id, self.student.id), MEMBER)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.post(url + 'leave/').status_code, 200)
+            self.assertEqual(get_membership(self.group.id, self.student.id), NOT_MEMBER)
+
+
+@override_settings(CACHES=LOCAL_CACHE, CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatMembershipRevocationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.chat_recent._store', LocalRecentFrames(50))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.creator = User.objects.create(username='owner')
+        self.student = User.objects.create(username='student')
+        self.group = StudyGroup.objects.create(name='Class', creator=self.creator)
+        self.group.members.add(self.creator, self.student)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/{self.group.id}/')
+        communicator.scope['user'] = user
+        communicator.scope['url_route'] = {'kwargs': {'group_id': str(self.group.id)}}
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_removed_member_is_disconnected(self):
+        (creator, _), (student, connected) = await self.connect(self.creator), await self.connect(self.student)
+        self.assertTrue(connected)
+
+        await database_sync_to_async(self.group.members.remove)(self.student)
+        frame = await student.receive_json_from()
+        self.assertEqual((frame['type'], frame['code']), ('error', 'membership_revoked'))
+        self.assertEqual(await student.receive_output(), {'type': 'websocket.close', 'code': 4003})
+        self.assertTrue(await creator.receive_nothing())
+
+        # Reconnecting is refused: the cached membership was invalidated.
+        _, connected = await self.connect(self.student)
+        self.assertFalse(connected)
+        await creator.disconnect()
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ChatHistoryPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reader')
+        self.group = StudyGroup.objects.create(name='Chat', creator=self.user)
+        self.group.members.add(self.user)
+        start = timezone.now() - timezone.timedelta(days=1)
+        # Pairs of messages share a timestamp, so the id decides their order.
+        ChatMessage.objects.bulk_create(
+            ChatMessage(group=self.group, user=self.user, message=str(i), timestamp=start + timezone.timedelta(seconds=i // 2))
+            for i in range(120)
+        )
+        self.url = f'/api/study-groups/{self.group.id}/messages/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def texts(self, page):
+        return [int(message['message']) for message in page['results']]
+
+    def test_cursor_round_trip(self):
+        newest = self.page()
+        self.assertEqual(self.texts(newest), list(range(70, 120)))
+        self.assertIsNone(newest['after'])
+
+        older = self.page(before=newest['before'])
+        self.assertEqual(self.texts(older), list(range(20, 70)))
+        oldest = self.page(before=older['before'])
+        self.assertEqual(self.texts(oldest), list(range(20)))
+        self.assertIsNone(oldest['before'])
+
+        # And forwards again from the oldest page.
+        self.assertEqual(self.texts(self.page(after=oldest['after'])), list(range(20, 70)))
+        self.assertEqual(self.texts(self.page(after=older['after'])), list(range(70, 120)))
+
+    def test_messages_match_the_live_frames(self):
+        latest = ChatMessage.objects.select_related('user').latest('timestamp', 'id')
+        self.assertEqual(self.page()['results'][-1], json.loads(chat_events.message_frame(latest, latest.user.username)))
+
+    def test_page_size(self):
+        self.assertEqual(len(self.page(page_size=7)['results']), 7)
+        self.assertEqual(len(self.page(page_size=0)['results']), 1)
+        self.assertEqual(len(self.page(page_size='lots')['results']), 50)
+        with mock.patch.object(ChatHistoryPagination, 'max_page_size', 100):
+            self.assertEqual(len(self.page(page_size=1000)['results']), 100)
+
+    def test_tampered_cursors(self):
+        cursor = self.page()['before']
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for bad in ('garbage!', cursor[:-3], encode(values[:1]), encode([values[0], 'x']), encode(['not a date', 1]), encode({})):
+            response = self.client.get(self.url, {'before': bad})
+            self.assertEqual(response.status_code, 400, bad)
+        self.assertEqual(self.client.get(self.url, {'before': cursor, 'after': cursor}).status_code, 400)
+
+    def test_unknown_groups(self):
+        self.assertEqual(self.client.get('/api/study-groups/abc/messages/').status_code, 404)
+        self.assertEqual(self.client.get('/api/study-groups/999999/messages/').status_code, 404)
+        other = StudyGroup.objects.create(name='Other', creator=self.user)
+        self.assertEqual(self.client.get(f'/api/study-groups/{other.id}/messages/').status_code, 403)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ChatArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _chunk_messages.cache_clear()
+        self.user = User.objects.create(username='reader')
+        self.group = StudyGroup.objects.create(name='Chat', creator=self.user)
+        self.group.members.add(self.user)
+        old = timezone.now() - timezone.timedelta(days=400)
+        recent = timezone.now() - timezone.timedelta(days=1)
+        # Two months and more of old messages, pairs sharing a timestamp, then recent ones.
+        ChatMessage.objects.bulk_create(
+            [ChatMessage(group=self.group, user=self.user, message=f'old {i}', timestamp=old + timezone.timedelta(days=i // 2))
+             for i in range(140)]
+            + [ChatMessage(group=self.group, user=self.user, message=f'new {i}', timestamp=recent) for i in range(30)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def history(self, page_size=25):
+        """Every message, walking back from the newest page and then forward again."""
+        url = f'/api/study-groups/{self.group.id}/messages/'
+        page = self.client.get(url, {'page_size': page_size}).data
+        backwards = page['results']
+        while page['before']:
+            page = self.client.get(url, {'page_size': page_size, 'before': page['before']}).data
+            backwards = page['results'] + backwards
+        forwards = page['results']
+        while page['after']:
+            page = self.client.get(url, {'page_size': page_size, 'after': page['after']}).data
+            forwards = forwards + page['results']
+        self.assertEqual(forwards, backwards)
+        return backwards
+
+    def archive(self):
+        out = io.StringIO()
+        call_command('archive_chat_messages', days=180, stdout=out)
+        return out.getvalue()
+
+    def test_history_reads_through_the_archive(self):
+        before = self.history()
+        self.assertEqual(len(before), 170)
+        self.assertIn('Archived 140 messages', self.archive())
+
+        self.assertEqual(ChatMessage.objects.count(), 30)
+        self.assertEqual(sum(ChatArchiveChunk.objects.values_list('message_count', flat=True)), 140)
+        self.assertGreater(ChatArchiveChunk.objects.count(), 1)
+        self.assertEqual(self.history(), before)
+        self.assertEqual(self.history(page_size=7), before)
+
+    def test_rerun_is_idempotent(self):
+        before = self.history()
+        self.archive()
+        chunks = list(ChatArchiveChunk.objects.order_by('month').values_list('month', 'message_count', 'data'))
+        self.assertIn('Archived 0 messages', self.archive())
+        after = list(ChatArchiveChunk.objects.order_by('month').values_list('month', 'message_count', 'data'))
+        self.assertEqual([(month, count, bytes(data)) for month, count, data in after],
+                         [(month, count, bytes(data)) for month, count, data in chunks])
+        self.assertEqual(self.history(), before)
+
+    def test_late_rows_merge_into_an_archived_month(self):
+        self.archive()
+        chunk = ChatArchiveChunk.objects.order_by('month').first()
+        late = ChatMessage.objects.create(group=self.group, user=self.user, message='late', timestamp=chunk.first_timestamp)
+        self.assertIn('Archived 1 messages', self.archive())
+        chunk.refresh_from_db()
+        self.assertIn(late.id, [message.id for message in _chunk_messages(chunk.id, chunk.updated_at)])
+        self.assertEqual([message['message'] for message in self.history()].count('late'), 1)
+
+
+RECENT_REDIS_URL = 'redis://127.0.0.1:6379/15'
+
+
+def redis_available():
+    try:
+        return redis.Redis.from_url(RECENT_REDIS_URL, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+class RecentFramesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='talker')
+        self.group = StudyGroup.objects.create(name='Chat', creator=self.user)
+        self.empty_group = StudyGroup.objects.create(name='Quiet', creator=self.user)
+        self.saved = [ChatMessage.objects.create(group=self.group, user=self.user, message=str(i)) for i in range(3)]
+
+    def store(self):
+        return LocalRecentFrames(size=3)
+
+    def frame(self, message):
+        return chat_events.message_frame(message, self.user.username)
+
+    def texts(self, frames):
+        return [json.loads(frame)['message'] for frame in frames]
+
+    def test_cold_group_is_filled_from_the_database_once(self):
+        store = self.store()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.texts(async_to_sync(recent_frames)(store, self.group.id)), ['0', '1', '2'])
+            self.assertEqual(self.texts(async_to_sync(recent_frames)(store, self.group.id)), ['0', '1', '2'])
+        # A group without messages is not queried again either.
+        with self.assertNumQueries(1):
+            self.assertEqual(async_to_sync(recent_frames)(store, self.empty_group.id), [])
+            self.assertEqual(async_to_sync(recent_frames)(store, self.empty_group.id), [])
+
+    def test_frames_pushed_while_cold_are_merged_without_duplicates(self):
+        store = self.store()
+        # Pushed after a restart: one already saved, one still in the write-behind buffer.
+        unsaved = ChatMessage(group=self.group, user=self.user, message='3')
+        async_to_sync(store.push)(self.group.id, self.frame(self.saved[2]))
+        async_to_sync(store.push)(self.group.id, self.frame(unsaved))
+        self.assertEqual(self.texts(async_to_sync(recent_frames)(store, self.group.id)), ['1', '2', '3'])
+
+        async_to_sync(store.push)(self.group.id, self.frame(ChatMessage(group=self.group, user=self.user, message='4')))
+        self.assertEqual(self.texts(async_to_sync(recent_frames)(store, self.group.id)), ['2', '3', '4'])
+
+
+@skipUnless(redis_available(), 'needs a Redis server at ' + RECENT_REDIS_URL)
+class RedisRecentFramesTests(RecentFramesTests):
+    def setUp(self):
+        super().setUp()
+        self.redis = redis.Redis.from_url(RECENT_REDIS_URL)
+        self.redis.flushdb()
+        self.addCleanup(self.redis.flushdb)
+
+    def store(self):
+        return RedisRecentFrames(RECENT_REDIS_URL, size=3, ttl=60)
+
+    def test_marker_expires_with_the_list(self):
+        store = self.store()
+        async_to_sync(recent_frames)(store, self.group.id)
+        key = f'chat:recent:{self.group.id}'
+        self.assertGreater(self.redis.ttl(f'{key}:warm'), 0)
+        self.redis.delete(key, f'{key}:warm')  # Expired.
+        # A push alone does not make the list complete again.
+        async_to_sync(store.push)(self.group.id, self.frame(self.saved[2]))
+        self.assertEqual(async_to_sync(store.get)(self.group.id)[1], False)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_refills_up_to_burst(self):
+        with mock.patch('api.chat_limits.time.monotonic', return_value=100.0) as clock:
+            bucket = TokenBucket(rate=2, burst=3)
+            for _ in range(3):
+                self.assertTrue(bucket.has_token())
+                bucket.take()
+            self.assertFalse(bucket.has_token())
+            clock.return_value = 100.5
+            self.assertTrue(bucket.has_token())
+            bucket.take()
+            self.assertFalse(bucket.has_token())
+            clock.return_value = 200.0
+            bucket.has_token()
+            self.assertEqual(bucket.tokens, 3)
+
+    @override_settings(CHAT_RATE_LIMIT=1, CHAT_RATE_BURST=2, CHAT_USER_RATE_LIMIT=1, CHAT_USER_RATE_BURST=3)
+    def test_connections_share_the_user_bucket(self):
+        buckets = UserBuckets()
+        with mock.patch('api.chat_limits._user_buckets', buckets), \
+                mock.patch('api.chat_limits.time.monotonic', return_value=100.0):
+            first, second = MessageLimiter(1), MessageLimiter(1)
+            self.assertIs(first.user, second.user)
+            self.assertEqual([first.allow(), first.allow(), first.allow()], [True, True, False])
+            # One user token is left, although the second connection's own bucket is full.
+            self.assertEqual([second.allow(), second.allow()], [True, False])
+            # Another user is unaffected.
+            self.assertTrue(MessageLimiter(2).allow())
+
+    def test_user_bucket_is_released_with_the_last_connection(self):
+        buckets = UserBuckets()
+        first, second = buckets.acquire(1), buckets.acquire(1)
+        self.assertIs(first, second)
+        buckets.release(1)
+        self.assertIs(buckets.acquire(1), first)
+        buckets.release(1)
+        buckets.release(1)
+        self.assertIsNot(buckets.acquire(1), first)
+
+
+@override_settings(
+    CACHES=LOCAL_CACHE, CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CHAT_RATE_LIMIT=1, CHAT_RATE_BURST=1, CHAT_MAX_FRAME_BYTES=100,
+)
+class ChatLimitsTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('api.chat_recent._store', LocalRecentFrames(50))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(username='student')
+        self.group = StudyGroup.objects.create(name='Class', creator=self.user)
+        self.group.members.add(self.user)
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/{self.group.id}/')
+        communicator.scope['user'] = self.user
+        communicator.scope['url_route'] = {'kwargs': {'group_id': str(self.group.id)}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_throttled_message_gets_an_error_frame(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'message': 'first'})
+        self.assertEqual((await communicator.receive_json_from())['message'], 'first')
+        await communicator.send_json_to({'message': 'second'})
+        frame = await communicator.receive_json_from()
+        self.assertEqual((frame['type'], frame['code']), ('error', 'rate_limited'))
+        # The throttled message was not broadcast.
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_oversized_frame_closes_the_connection(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'message': 'x' * 200})
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': 1009})
+
+    async def send_while_backed_up(self, communicator):
+        counters = metrics.snapshot()
+        with mock.patch('api.consumers.pending_write_bytes', return_value=10 ** 6):
+            await communicator.send_json_to({'message': 'hello'})
+            await asyncio.sleep(0.1)
+        after = metrics.snapshot()
+        return {name: after.get(name, 0) - counters.get(name, 0)
+                for name in ('chat_frames_dropped', 'chat_slow_consumers_disconnected')}
+
+    async def test_slow_consumer_frames_are_dropped(self):
+        communicator = await self.connect()
+        self.assertEqual(await self.send_while_backed_up(communicator),
+                         {'chat_frames_dropped': 1, 'chat_slow_consumers_disconnected': 0})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    @override_settings(CHAT_SLOW_CONSUMER_POLICY='disconnect')
+    async def test_slow_consumer_is_disconnected(self):
+        communicator = await self.connect()
+        self.assertEqual(await self.send_while_backed_up(communicator),
+                         {'chat_frames_dropped': 0, 'chat_slow_consumers_disconnected': 1})
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': 1008})
+
+    def test_pending_write_bytes_reads_the_twisted_buffers(self):
+        transport = FileDescriptor(reactor=mock.Mock())
+        transport.connected = True
+        send = functools.partial(mock.Mock(), mock.Mock(transport=transport))
+        self.assertEqual(pending_write_bytes(send), 0)
+        transport.write(b'x' * 100)
+        transport.write(b'y' * 50)
+        self.assertEqual(pending_write_bytes(send), 150)
+        # Part of the buffer was written to the socket.
+        transport.dataBuffer, transport.offset, transport._tempDataBuffer, transport._tempDataLen = b'x' * 100, 40, [], 0
+        self.assertEqual(pending_write_bytes(send), 60)
+        # Other servers' send callables, e.g. the test communicator's.
+        self.assertIsNone(pending_write_bytes(mock.Mock()))
+        self.assertIsNone(pending_write_bytes(functools.partial(mock.Mock(), object())))
+
+
+class StudyGroupListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_groups(self, count):
+        for i in range(count):
+            creator = User.objects.create(username=f'creator{StudyGroup.objects.count()}')
+            group = StudyGroup.objects.create(name=f'Group {i}', creator=creator)
+            group.members.add(creator)
+            if i % 2 == 0:
+                group.members.add(self.user)
+
+    def test_list_query_count_is_constant(self):
+        self.create_groups(3)
+        with self.assertNumQueries(1):
+            self.client.get('/api/study-groups/')
+
+        self.create_groups(12)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/study-groups/')
+        self.assertEqual(len(response.data['results']), 15)
+
+    def test_list_items(self):
+        self.create_groups(2)
+        response = self.client.get('/api/study-groups/')
+        newest, oldest = response.data['results']
+        self.assertNotIn('members', newest)
+        self.assertEqual((newest['members_count'], newest['is_member']), (1, False))
+        self.assertEqual((oldest['members_count'], oldest['is_member']), (2, True))
+        self.assertEqual(oldest['creator_username'], 'creator0')
+
+    def test_list_is_paginated(self):
+        self.create_groups(25)
+        first = self.client.get('/api/study-groups/').data
+        self.assertEqual(len(first['results']), 20)
+        second = self.client.get('/api/study-groups/', {'after': first['after']}).data
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['after'])
+        names = [group['name'] for group in first['results'] + second['results']]
+        self.assertEqual(len(set(names)), 25)
+
+
+class StudyGroupMemberCountTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create(username='teacher')
+        self.students = [User.objects.create(username=f'student{i}') for i in range(5)]
+        self.group = StudyGroup.objects.create(name='Class', creator=self.creator)
+        self.group.members.add(self.creator)
+        self.client = APIClient()
+
+    def member_count(self):
+        self.group.refresh_from_db(fields=['member_count'])
+        return self.group.member_count
+
+    def test_counter_follows_add_remove_and_clear(self):
+        self.group.members.add(*self.students[:3])
+        self.group.members.add(self.students[0])  # Already a member.
+        self.assertEqual(self.member_count(), 4)
+        self.group.members.remove(self.students[0], self.students[4])  # Only one was a member.
+        self.assertEqual(self.member_count(), 3)
+        self.students[1].study_groups.remove(self.group)
+        self.students[4].study_groups.add(self.group)
+        self.assertEqual(self.member_count(), 3)
+        self.students[2].delete()
+        self.assertEqual(self.member_count(), 2)
+        self.group.members.clear()
+        self.assertEqual(self.member_count(), 0)
+
+    def test_add_and_remove_do_not_count_members(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.group.members.add(self.students[0])
+            self.group.members.remove(self.students[0])
+        self.assertFalse([query['sql'] for query in queries if 'COUNT(' in query['sql'].upper()])
+        # clear() recounts, which also repairs a count that drifted.
+        StudyGroup.objects.filter(pk=self.group.pk).update(member_count=99)
+        self.students[0].study_groups.add(self.group)
+        self.students[0].study_groups.clear()
+        self.assertEqual(self.member_count(), 1)
+
+    def test_join_and_leave(self):
+        self.client.force_authenticate(self.students[0])
+        url = f'/api/study-groups/{self.group.id}/'
+        self.assertEqual(self.client.post(url + 'join/').status_code, 200)
+        self.assertEqual(self.client.post(url + 'join/').status_code, 400)
+        self.assertEqual(self.member_count(), 2)
+        self.assertEqual(self.client.post(url + 'leave/').status_code, 200)
+        self.assertEqual(self.client.post(url + 'leave/').status_code, 400)
+        self.assertEqual(self.member_count(), 1)
+
+    def test_add_members(self):
+        url = f'/api/study-groups/{self.group.id}/add-members/'
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.post(url, {'user_ids': [self.students[1].id]}, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.creator)
+        inactive = User.objects.create(username='graduated', is_active=False)
+        user_ids = [student.id for student in self.students] + [self.creator.id, inactive.id, 999999]
+        response = self.client.post(url, {'user_ids': user_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'added': 5, 'unknown_user_ids': [999999], 'inactive_user_ids': [inactive.id], 'members_count': 6,
+        })
+        self.assertEqual(self.group.members.count(), 6)
+
+        for bad in ([True], [self.students[0].id, False], [str(self.students[0].id)], self.students[0].id):
+            response = self.client.post(url, {'user_ids': bad}, format='json')
+            self.assertEqual(response.status_code, 400, bad)
+
+
+class JobIngestionTests(TestCase):
+    def test_ingest_from_fixture_server(self):
+        with FixtureServer(pages=3, per_page=4) as server:
+            stats = ingest(JSearchSource(base_url=server.url), ['python developer', 'analyst'], ['in'], pages=4, rate=0)
+        self.assertEqual((stats.pages, stats.failed_pages, stats.jobs, stats.created), (8, 0, 24, 24))
+        self.assertEqual(JobListing.objects.count(), 24)
+        self.assertTrue(set(JobListing.objects.values_list('job_type', flat=True)) <= {'Full-time', 'Part-time', 'Internship', 'Contract'})
+
+    def test_reingest_skips_unchanged_and_updates_changed(self):
+        source = JSearchSource()
+        job = {'job_apply_link': 'https://jobs.example.com/1?utm_source=x', 'job_title': 'Intern'}
+        stats = IngestionStats()
+        save_jobs([source.parse(job)], stats)
+        save_jobs([source.parse(job)], stats)
+        # Same listing: the URL differs only by case, tracking parameters and a trailing slash.
+        save_jobs([source.parse({'job_apply_link': 'HTTPS://JOBS.EXAMPLE.COM/1/', 'job_title': 'Senior intern'})], stats)
+        self.assertEqual((stats.created, stats.unchanged, stats.updated), (1, 1, 1))
+        self.assertEqual(list(JobListing.objects.values_list('title', flat=True)), ['Senior intern'])
+
+    def test_one_content_hash_for_ingest_orm_and_migration(self):
+        source = JSearchSource()
+        dated = {'job_apply_link': 'https://jobs.example.com/dated', 'job_title': 'Analyst',
+                 'job_posted_at_datetime_utc': '2024-05-01T10:00:00+05:30'}
+        undated = {'job_apply_link': 'https://jobs.example.com/undated', 'job_title': 'Intern'}
+        JobListing.objects.create(**source.parse(dated))
+        save_jobs([source.parse(undated)], IngestionStats())
+        # Saved through the ORM, or by an earlier ingest with no posting date: both unchanged.
+        stats = IngestionStats()
+        save_jobs([source.parse(dated), source.parse(undated)], stats)
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, 0, 2))
+
+        rehash = import_module('api.migrations.0021_joblisting_expiry_checkpoints').hash_content
+        for job in JobListing.objects.all():
+            self.assertEqual(rehash(job), job.content_hash)
+            job.save()
+            self.assertEqual(JobListing.objects.get(pk=job.pk).content_hash, rehash(job))
+
+    def test_second_run_resumes_from_checkpoint(self):
+        with FixtureServer(pages=3, per_page=4) as server:
+            source = JSearchSource(base_url=server.url)
+            ingest(source, ['analyst'], ['in'], pages=3, rate=0)
+            checkpoint = JobIngestionCheckpoint.objects.get(query='analyst', country='in')
+            self.assertEqual(checkpoint.watermark, JobListing.objects.latest('posted_date').posted_date)
+            requests_before = server.requests
+            stats = ingest(source, ['analyst'], ['in'], pages=3, rate=0)
+        # Every page is fetched again; the jobs already saved are skipped by their content hash.
+        self.assertEqual(server.requests - requests_before, 3)
+        self.assertEqual((stats.jobs, stats.created, stats.unchanged), (12, 0, 12))
+        self.assertEqual(JobIngestionCheckpoint.objects.get(query='analyst', country='in').watermark, checkpoint.watermark)
+
+    def test_incremental_run_keeps_late_jobs(self):
+        class PagedSource(JobSource):
+            def __init__(self, pages):
+                self.pages, self.requests = pages, []
+
+            def fetch_page(self, session, request):
+                self.requests.append(request)
+                return self.pages[request.page - 1] if request.page <= len(self.pages) else []
+
+            def parse(self, raw):
+                return JSearchSource().parse(raw)
+
+        def job(name, hours):
+            return {'job_apply_link': f'https://jobs.example.com/{name}', 'job_posted_at_timestamp': 1_700_000_000 + hours * 3600}
+
+        ingest(PagedSource([[job('a', 10), job('b', 20)]]), ['analyst'], ['in'], pages=5, rate=0)
+        watermark = JobIngestionCheckpoint.objects.get().watermark
+        # Relevance order: the first page has nothing newer than the watermark, the second does,
+        # and 'late' was posted before the watermark but only indexed since.
+        source = PagedSource([[job('b', 20), job('late', 15)], [job('c', 30)]])
+        stats = ingest(source, ['analyst'], ['in'], pages=5, rate=0)
+        self.assertEqual([request.page for request in source.requests], [1, 2, 3])
+        self.assertEqual(source.requests[0].since, watermark - timezone.timedelta(hours=72))
+        self.assertEqual((stats.pages, stats.created, stats.unchanged), (3, 2, 1))
+        self.assertEqual(JobListing.objects.count(), 4)
+        self.assertEqual(JobIngestionCheckpoint.objects.get().watermark, watermark + timezone.timedelta(hours=10))
+
+    def test_expire_jobs(self):
+        now = timezone.now()
+        source = JSearchSource()
+        save_jobs([source.parse(job) for job in [
+            {'job_apply_link': 'https://jobs.example.com/expired', 'job_offer_expiration_timestamp': int(now.timestamp()) - 60},
+            {'job_apply_link': 'https://jobs.example.com/open', 'job_offer_expiration_timestamp': int(now.timestamp()) + 60,
+             'job_posted_at_timestamp': 1_000_000_000},
+            {'job_apply_link': 'https://jobs.example.com/old', 'job_posted_at_timestamp': 1_000_000_000},
+            {'job_apply_link': 'https://jobs.example.com/recent', 'job_posted_at_datetime_utc': now.isoformat()},
+        ]], IngestionStats())
+        self.assertEqual(expire_jobs(max_age_days=60, batch_size=1, now=now), 2)
+        self.assertEqual(
+            sorted(JobListing.objects.values_list('application_url', flat=True)),
+            ['https://jobs.example.com/open', 'https://jobs.example.com/recent'],
+        )
+
+
+class JobSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='seeker'))
+        for title, company, location, job_type, description in [
+            ('Python Developer Intern', 'Acme', 'Bangalore, IN', 'Internship', 'Build Django APIs.'),
+            ('Data Analyst', 'Python Analytics', 'Pune, IN', 'Full-time', 'SQL dashboards.'),
+            ('Frontend Engineer', 'Widgets', 'Bangalore, IN', 'Full-time', 'React, with some Python.'),
+            ('Accountant', 'Ledger', 'Delhi, IN', 'Full-time', 'Spreadsheets.'),
+        ]:
+            JobListing.objects.create(
+                title=title, company_name=company, location=location, job_type=job_type,
+                description=description, application_url=f'https://jobs.example.com/{title}',
+            )
+
+    def search(self, **params):
+        response = self.client.get('/api/job-listings/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [job['title'] for job in response.data['results']]
+
+    def test_ranks_title_over_company_over_description(self):
+        self.assertEqual(self.search(q='python'), ['Python Developer Intern', 'Data Analyst', 'Frontend Engineer'])
+
+    def test_filters(self):
+        self.assertEqual(self.search(q='python', location='bangalore'), ['Python Developer Intern', 'Frontend Engineer'])
+        self.assertEqual(self.search(job_type='Internship'), ['Python Developer Intern'])
+        self.assertEqual(self.search(q='python', posted_after='2000-01-01', job_type='Full-time'), ['Data Analyst', 'Frontend Engineer'])
+        self.assertEqual(self.search(posted_before='2000-01-01'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        JobListing.objects.filter(title='Accountant').update(title='Python Accountant')
+        JobListing.objects.filter(title='Python Developer Intern').delete()
+        self.assertEqual(self.search(q='python')[0], 'Python Accountant')
+        self.assertEqual(len(self.search(q='python')), 3)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/job-listings/search/', {'job_type': 'Gig'}).status_code, 400)
+        for bad in ('soon', '2024-02-30', '2024-01-01T25:00'):
+            self.assertEqual(self.client.get('/api/job-listings/search/', {'posted_after': bad}).status_code, 400, bad)
+
+
+class JobRecommendationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='seeker')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.python = Skill.objects.create(name='Python')
+        self.react = Skill.objects.create(name='React', aliases=['reactjs', 'react.js'])
+        self.cpp = Skill.objects.create(name='C++')
+        source = JSearchSource()
+        save_jobs([source.parse(job) for job in [
+            {'job_apply_link': 'https://jobs.example.com/1', 'job_title': 'Python Developer', 'job_description': 'Django.'},
+            {'job_apply_link': 'https://jobs.example.com/2', 'job_title': 'Frontend Engineer', 'job_description': 'React.js and some Python.'},
+            {'job_apply_link': 'https://jobs.example.com/3', 'job_title': 'Firmware Engineer', 'job_description': 'Modern C++, no C#.'},
+            {'job_apply_link': 'https://jobs.example.com/4', 'job_title': 'Accountant', 'job_description': 'Spreadsheets.'},
+        ]], IngestionStats())
+
+    def recommended(self):
+        response = self.client.get('/api/job-listings/recommended/')
+        self.assertEqual(response.status_code, 200)
+        return [(job['title'], job['score'], job['matched_skills']) for job in response.data]
+
+    def test_matcher_handles_aliases_and_punctuation(self):
+        matcher = SkillMatcher.from_db()
+        self.assertEqual(matcher.find('ReactJS, C++ and python.'), {self.python.id, self.react.id, self.cpp.id})
+        self.assertEqual(matcher.find('JavaScript, C, Pythonic'), set())
+
+    def test_ranks_by_weight_and_proficiency(self):
+        UserSkill.objects.create(user=self.user, skill=self.python, proficiency='Beginner')
+        UserSkill.objects.create(user=self.user, skill=self.react, proficiency='Expert')
+        # Title matches weigh 3, description matches 1; Beginner x1, Expert x4.
+        self.assertEqual(self.recommended(), [
+            ('Frontend Engineer', 1 * 1 + 1 * 4, ['Python', 'React']),
+            ('Python Developer', 3 * 1, ['Python']),
+        ])
+
+    def test_reingested_listing_is_reindexed(self):
+        UserSkill.objects.create(user=self.user, skill=self.cpp)
+        save_jobs([JSearchSource().parse(
+            {'job_apply_link': 'https://jobs.example.com/3', 'job_title': 'Firmware Engineer', 'job_description': 'Rust.'}
+        )], IngestionStats())
+        self.assertEqual(self.recommended(), [])
+        self.assertEqual(JobSkill.objects.count(), 3)
+
+
+class JobListingListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='seeker'))
+        for i in range(5):
+            JobListing.objects.create(
+                title=f'Job {i}', company_name='Acme', location='Pune, IN', description='Long text. ' * 500,
+                application_url=f'https://jobs.example.com/{i}', posted_date=timezone.now() - timezone.timedelta(days=i),
+            )
+
+    def test_pages_newest_first_without_descriptions(self):
+        with self.assertNumQueries(1) as queries:
+            first = self.client.get('/api/job-listings/', {'page_size': 3})
+        self.assertNotIn('description', queries.captured_queries[0]['sql'])
+        self.assertEqual([job['title'] for job in first.data['results']], ['Job 0', 'Job 1', 'Job 2'])
+        self.assertNotIn('description', first.data['results'][0])
+        second = self.client.get('/api/job-listings/', {'page_size': 3, 'after': first.data['after']})
+        self.assertEqual([job['title'] for job in second.data['results']], ['Job 3', 'Job 4'])
+        self.assertIsNone(second.data['after'])
+
+        detail = self.client.get(f'/api/job-listings/{first.data["results"][0]["id"]}/')
+        self.assertTrue(detail.data['description'].startswith('Long text.'))
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/job-listings/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/job-listings/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        JobListing.objects.get(title='Job 3').delete()
+        response = self.client.get('/api/job-listings/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # No row on the page changed its updated_at, but the page did change.
+        since = http_date(timezone.now().timestamp() + 60)
+        response = self.client.get('/api/job-listings/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Job 3', [job['title'] for job in response.data['results']])
+
+
+class QuestionGenerationTests(TestCase):
+    def test_parse_questions(self):
+        text = '```json\n[{"question_text": " What is GIL? ", "answer_text": "A lock.", "difficulty": "Tricky"}, {"x": 1}]\n```'
+        self.assertEqual(parse_questions(text), [{'question_text': 'What is GIL?', 'answer_text': 'A lock.', 'difficulty': 'Medium'}])
+        with self.assertRaises(ValueError):
+            parse_questions('Sorry, I cannot help with that.')
+
+    def test_save_questions_skips_near_duplicates(self):
+        skill = Skill.objects.create(name='Python')
+        InterviewQuestion.objects.create(skill=skill, question_text='What is the GIL?', answer_text='A lock.')
+        question = {'answer_text': 'A lock.', 'difficulty': 'Easy'}
+        with self.assertNumQueries(6):  # Savepoint, lock, hashes, insert, count, release.
+            saved = save_questions(skill, [
+                {'question_text': 'what is  the\nGIL?', **question},
+                {'question_text': 'What is a generator?', **question},
+                {'question_text': 'WHAT IS A GENERATOR?', **question},
+            ])
+        self.assertEqual(saved, 1)
+        self.assertEqual(skill.questions.count(), 2)
+        self.assertEqual(save_questions(skill, [{'question_text': 'What is a generator?', **question}]), 0)
+
+    def test_admin_form_rejects_duplicate_questions(self):
+        skill = Skill.objects.create(name='Python')
+        existing = InterviewQuestion.objects.create(skill=skill, question_text='What is the GIL?', answer_text='A lock.')
+        Form = modelform_factory(InterviewQuestion, fields=['skill', 'question_text', 'answer_text', 'difficulty'])
+        data = {'skill': skill.id, 'question_text': ' what is the  gil? ', 'answer_text': 'A lock.', 'difficulty': 'Easy'}
+        form = Form(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('question_text', form.errors)
+        # Editing the question itself is fine.
+        self.assertTrue(Form(data, instance=existing).is_valid())
+        self.assertTrue(Form({**data, 'skill': Skill.objects.create(name='Go').id}).is_valid())
+
+    def test_backends_must_implement_generate(self):
+        class Incomplete(LLMBackend):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_concurrent_generation_resumes_from_progress_file(self):
+        skills = [Skill.objects.create(name=f'Skill {i}') for i in range(6)]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'progress.json')
+
+        class FailingBackend(FakeBackend):
+            def generate(self, prompt):
+                if 'Skill 5' in prompt:
+                    raise LLMError('Blocked.')
+                if 'Skill 4' in prompt:
+                    raise RuntimeError('A bug in the backend.')
+                return super().generate(prompt)
+
+        backend = FailingBackend(failure_rate=0.3, seed=1)
+        stats = generate_questions(skills, backend, workers=3, retries=10, backoff=0, progress=Progress(path))
+        self.assertEqual((stats.skills, stats.failed, stats.questions), (4, 2, 20))
+        self.assertGreater(backend.calls, 4)  # Injected failures were retried.
+
+        backend = FakeBackend()
+        stats = generate_questions(skills, backend, progress=Progress(path))
+        self.assertEqual((backend.calls, stats.skills), (2, 2))
+        self.assertEqual(InterviewQuestion.objects.count(), 30)
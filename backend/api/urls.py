@@ -10,7 +10,8 @@ from .views import (
     DashboardDataView,  # Optional: include if you want a dashboard endpoint
     JobListingViewSet,
     InterviewQuestionViewSet,
-    CareerGuidanceView,FaceRegistrationView, FaceLoginView, StudyGroupViewSet
+    CareerGuidanceView,FaceRegistrationView, FaceLoginView, StudyGroupViewSet,
+    MetricsView
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -34,6 +35,7 @@ urlpatterns = [
     path('career-guidance/', CareerGuidanceView.as_view(), name='career-guidance'),
     path('face-register/', FaceRegistrationView.as_view(), name='face-register'),
     path('face-login/', FaceLoginView.as_view(), name='face-login'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('', include(router.urls)),
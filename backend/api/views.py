@@ -1,5 +1,5 @@
 from rest_framework import generics, viewsets
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework import status # Import status for custom actions
 from rest_framework.decorators import action # Import action decorator
 from rest_framework.views import APIView
@@ -8,24 +8,37 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+import hashlib
 import json
-import numpy as np
-import io
-from PIL import Image
-import face_recognition
 import google.generativeai as genai
 
 from .models import (
     Resume, Certificate, Skill, UserSkill,
-    JobListing, InterviewQuestion, UserProfile, StudyGroup
+    JobListing, InterviewQuestion, UserProfile, StudyGroup, ChatMessage
 )
+from . import face_codec
+from .face_index import get_face_index
+from .face_pipeline import FacePoolBusy, get_face_pool
 from .serializers import (
     UserSerializer, RegisterSerializer,
     ResumeSerializer, CertificateSerializer,
     SkillSerializer, UserSkillSerializer,
-    JobListingSerializer, InterviewQuestionSerializer, StudyGroupSerializer
+    JobListingSerializer, InterviewQuestionSerializer, StudyGroupSerializer,
+    StudyGroupListSerializer, ChatMessageSerializer, JobSearchResultSerializer,
+    JobRecommendationSerializer, JobListingListSerializer
 )
+from . import metrics
+from .membership import MEMBER, NO_GROUP, get_membership
+from .chat_archive import ArchivedMessages
+from .job_search import parse_when, search_jobs
+from .job_skills import recommend_jobs
+from .pagination import ChatHistoryPagination, JobListingPagination, RankedPagination, StudyGroupPagination
 
 # ------------------------
 # User Registration and Info
@@ -42,6 +55,18 @@ class UserView(generics.RetrieveAPIView):
     def get_object(self):
         return self.request.user
 
+# ------------------------
+# Monitoring
+# ------------------------
+class MetricsView(APIView):
+    """
+    Counters of the worker process serving the request (cache hits, throttling, ...).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
 # ------------------------
 # Skill and UserSkill Management
 # ------------------------
@@ -90,6 +115,15 @@ class DashboardDataView(APIView):
 # ------------------------
 # Face Recognition - Registration & Login
 # ------------------------
+# Detection and encoding run in a separate process pool (api.face_pipeline);
+# the request thread only waits on the result.
+def face_service_busy():
+    return Response(
+        {"error": "Face recognition is busy right now. Please try again in a moment."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "5"},
+    )
+
 class FaceRegistrationView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -101,23 +135,25 @@ class FaceRegistrationView(APIView):
             return Response({"error": "No image file provided."}, status=400)
 
         try:
-            image = Image.open(io.BytesIO(image_file.read()))
-            image_array = np.array(image)
-            face_encodings = face_recognition.face_encodings(image_array)
+            face_encodings = get_face_pool().encode(image_file.read())
 
             if len(face_encodings) == 0:
                 return Response({"error": "No face found in the image. Please try again."}, status=400)
             if len(face_encodings) > 1:
                 return Response({"error": "More than one face found. Please upload only your face."}, status=400)
 
-            encoding_str = json.dumps(face_encodings[0].tolist())
-
             profile, created = UserProfile.objects.get_or_create(user=user)
-            profile.face_encoding = encoding_str
+            profile.face_encoding = face_codec.encode(face_encodings[0])
+            profile.face_updated_at = timezone.now()
             profile.save()
 
+            # Make the new face available to logins served by this process right away.
+            get_face_index().add(user.id, face_encodings[0])
+
             return Response({"message": "Face registered successfully."}, status=200)
 
+        except (FacePoolBusy, TimeoutError):
+            return face_service_busy()
         except Exception as e:
             return Response({"error": f"Error during face registration: {e}"}, status=500)
 
@@ -132,35 +168,37 @@ class FaceLoginView(APIView):
             return Response({"error": "No image file provided."}, status=400)
 
         try:
-            unknown_image = face_recognition.load_image_file(io.BytesIO(image_file.read()))
-            unknown_encodings = face_recognition.face_encodings(unknown_image)
+            unknown_encodings = get_face_pool().encode(image_file.read())
 
             if len(unknown_encodings) == 0:
                 return Response({"error": "No face detected."}, status=400)
 
             unknown_encoding = unknown_encodings[0]
 
-            profiles_with_faces = UserProfile.objects.filter(face_encoding__isnull=False).select_related('user')
-
-            for profile in profiles_with_faces:
-                try:
-                    stored_encoding_list = json.loads(profile.face_encoding)
-                    known_encoding = np.array(stored_encoding_list)
-                    is_match = face_recognition.compare_faces([known_encoding], unknown_encoding)[0]
-
-                    if is_match:
-                        user = profile.user
-                        refresh = RefreshToken.for_user(user)
-                        return Response({
-                            'refresh': str(refresh),
-                            'access': str(refresh.access_token),
-                        }, status=200)
-
-                except Exception:
-                    continue  # Skip profiles with bad face encodings
+            # One vectorized distance computation over every registered face.
+            face_index = get_face_index()
+            face_index.sync()
+            match = face_index.search(unknown_encoding)
+            user = None
+            while match is not None:
+                user = User.objects.filter(pk=match.user_id).first()
+                if user is not None:
+                    break
+                # Deleted by another process after this one indexed the face.
+                face_index.remove(match.user_id)
+                match = face_index.search(unknown_encoding)
+
+            if user is not None:
+                refresh = RefreshToken.for_user(user)
+                return Response({
+                    'refresh': str(refresh),
+                    'access': str(refresh.access_token),
+                }, status=200)
 
             return Response({"error": "Face not recognized or not registered."}, status=401)
 
+        except (FacePoolBusy, TimeoutError):
+            return face_service_busy()
         except Exception as e:
             return Response({"error": f"An error occurred during login: {e}"}, status=500)
 
@@ -198,6 +236,66 @@ class JobListingViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = JobListing.objects.all()
     serializer_class = JobListingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = JobListingPagination
+
+    def get_queryset(self):
+        if self.action == 'list':
+            # The description is most of a row; the list never reads it.
+            return super().get_queryset().only(*JobListingListSerializer.Meta.fields, 'updated_at')
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return JobListingListSerializer
+        return super().get_serializer_class()
+
+    # GET /api/job-listings/?after=<cursor> answers If-None-Match with 304.
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        # A validator of the page itself, so any insert, update or delete that changes it changes the ETag.
+        # There is no Last-Modified: deleting a row on the page does not move the newest updated_at.
+        versions = [[job.id, job.updated_at.isoformat()] for job in page]
+        digest = hashlib.sha256(json.dumps([versions, self.paginator.before, self.paginator.after]).encode())
+        etag = quote_etag(digest.hexdigest()[:32])
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    # GET /api/job-listings/search/?q=python+intern&job_type=Internship&location=Bangalore
+    #     &posted_after=2025-01-01&posted_before=2025-02-01&page=2
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        params = request.query_params
+        job_type = params.get('job_type')
+        if job_type and job_type not in dict(JobListing.JOB_TYPE_CHOICES):
+            return Response({'detail': f'Unknown job_type {job_type!r}.'}, status=status.HTTP_400_BAD_REQUEST)
+        dates = {}
+        for name in ('posted_after', 'posted_before'):
+            if params.get(name):
+                value = parse_when(params[name])
+                if value is None:
+                    return Response({'detail': f'{name} must be an ISO 8601 date.'}, status=status.HTTP_400_BAD_REQUEST)
+                dates[name] = value
+
+        queryset = search_jobs(params.get('q'), job_type=job_type, location=params.get('location'), **dates)
+        paginator = RankedPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = JobSearchResultSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    # GET /api/job-listings/recommended/?limit=20 -- ranked by the user's skills and proficiency.
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = JobRecommendationSerializer(recommend_jobs(request.user, limit), many=True)
+        return Response(serializer.data)
 
 class InterviewQuestionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InterviewQuestionSerializer
@@ -276,24 +374,45 @@ class CareerGuidanceView(APIView):
 
 #Study group
 # --- Add the new StudyGroupViewSet below ---
+MAX_BULK_MEMBERS = 1000
+
+
 class StudyGroupViewSet(viewsets.ModelViewSet):
     queryset = StudyGroup.objects.all().order_by('-created_at')
     serializer_class = StudyGroupSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StudyGroupPagination
+
+    def get_queryset(self):
+        # One query for the whole page: the creator is joined, the member count
+        # is a column and the current user's membership is computed in SQL.
+        is_member = StudyGroup.members.through.objects.filter(
+            studygroup_id=OuterRef('pk'), user_id=self.request.user.id,
+        )
+        return super().get_queryset().select_related('creator').annotate(is_member=Exists(is_member))
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return StudyGroupListSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         # Assign the creator and automatically add them as the first member
         group = serializer.save(creator=self.request.user)
         group.members.add(self.request.user)
+        group.member_count = 1
 
     # Custom action to allow a user to join a group
     @action(detail=True, methods=['post'])
     def join(self, request, pk=None):
         group = self.get_object()
         user = request.user
-        if user in group.members.all():
+        # is_member is annotated by get_queryset(), so no member rows are loaded.
+        if group.is_member:
             return Response({'detail': 'You are already a member.'}, status=status.HTTP_400_BAD_REQUEST)
-        group.members.add(user)
+        with transaction.atomic():
+            group.lock()
+            group.members.add(user)
         return Response({'detail': 'Successfully joined the group.'}, status=status.HTTP_200_OK)
 
     # Custom action to allow a user to leave a group
@@ -301,9 +420,57 @@ class StudyGroupViewSet(viewsets.ModelViewSet):
     def leave(self, request, pk=None):
         group = self.get_object()
         user = request.user
-        if user not in group.members.all():
+        if not group.is_member:
             return Response({'detail': 'You are not a member of this group.'}, status=status.HTTP_400_BAD_REQUEST)
-        group.members.remove(user)
+        with transaction.atomic():
+            group.lock()
+            group.members.remove(user)
         return Response({'detail': 'Successfully left the group.'}, status=status.HTTP_200_OK)
 
+    # Lets the group's creator (e.g. an instructor) enrol a whole class at once.
+    @action(detail=True, methods=['post'], url_path='add-members')
+    def add_members(self, request, pk=None):
+        group = self.get_object()
+        if group.creator_id != request.user.id:
+            return Response({'detail': 'Only the group creator can add members.'}, status=status.HTTP_403_FORBIDDEN)
+
+        user_ids = request.data.get('user_ids')
+        if not isinstance(user_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in user_ids):
+            return Response({'detail': 'user_ids must be a list of user ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > MAX_BULK_MEMBERS:
+            return Response({'detail': f'At most {MAX_BULK_MEMBERS} users per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        active = dict(User.objects.filter(id__in=user_ids).values_list('id', 'is_active'))
+        with transaction.atomic():
+            group.lock()
+            new = {user_id for user_id, is_active in active.items() if is_active}
+            new -= set(group.members.filter(id__in=new).values_list('id', flat=True))
+            # add() inserts every new membership row in one statement; the m2m_changed
+            # handler adds len(new) to member_count and clears cached chat membership.
+            group.members.add(*new)
+            group.refresh_from_db(fields=['member_count'])
+        return Response({
+            'added': len(new),
+            'unknown_user_ids': sorted(set(user_ids) - set(active)),
+            'inactive_user_ids': sorted(user_id for user_id, is_active in active.items() if not is_active),
+            'members_count': group.member_count,
+        }, status=status.HTTP_200_OK)
+
+    # Chat history, newest page first; use the 'before' cursor to scroll back.
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        membership = get_membership(pk, request.user.id) if pk.isdigit() else NO_GROUP
+        if membership == NO_GROUP:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if membership != MEMBER:
+            return Response({'detail': 'You are not a member of this group.'}, status=status.HTTP_403_FORBIDDEN)
+
+        queryset = ChatMessage.objects.filter(group_id=pk).select_related('user').only(
+            'id', 'uuid', 'message', 'timestamp', 'user__id', 'user__username'
+        )
+        paginator = ChatHistoryPagination(archive=ArchivedMessages(pk))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ChatMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 # ... rest of your views ...
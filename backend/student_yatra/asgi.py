@@ -11,6 +11,7 @@ django.setup()
 # Now that Django is fully configured and ready, we can safely import
 # the Channels components and our application's routing.
 from channels.routing import ProtocolTypeRouter, URLRouter
+from api.lifespan import lifespan_app
 from api.middleware import TokenAuthMiddleware
 import api.routing
 
@@ -24,4 +25,7 @@ application = ProtocolTypeRouter({
             api.routing.websocket_urlpatterns
         )
     ),
+
+    # Startup/shutdown events, used to flush buffered chat messages.
+    "lifespan": lifespan_app,
 })
\ No newline at end of file
@@ -9,6 +9,8 @@ import os
 from datetime import timedelta
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+# Loaded before any setting below reads os.environ.
+load_dotenv()  # loads .env
 
 # Quick-start development settings - unsuitable for production
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -125,18 +127,37 @@ REST_FRAMEWORK = {
 # --- Add these new settings at the VERY BOTTOM of the file ---
 # Channels Configuration
 ASGI_APPLICATION = 'student_yatra.asgi.application'
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+# CHANNEL_LAYER=memory runs chat (and the shared cache) without Redis, for
+# local development and `manage.py loadtest_chat`. It only works within a
+# single process.
+CHANNEL_LAYER = os.environ.get("CHANNEL_LAYER", "redis")
+if CHANNEL_LAYER == "memory":
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
         },
-    },
-}
-load_dotenv()  # loads .env
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                "hosts": [('127.0.0.1', 6379)],
+            },
+        },
+    }
 
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+# Interview-question generation (`manage.py generate_questions`): LLM_CONCURRENCY
+# skills in flight, each provider at most LLM_RATE_LIMITS[name] requests/s.
+LLM_BACKEND = "api.llm.GeminiBackend"
+GEMINI_MODEL = "gemini-1.5-flash-002"
+LLM_CONCURRENCY = 4
+LLM_RATE_LIMITS = {"gemini": 0.25, "fake": 0}
+# Skills already done, so an interrupted run can be resumed.
+QUESTION_PROGRESS_FILE = os.path.join(BASE_DIR, 'generate_questions_progress.json')
+
 # --- THIS IS THE NEW SECTION TO CONTROL LOGIN DURATION ---
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
@@ -176,4 +197,113 @@ SIMPLE_JWT = {
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
-}
\ No newline at end of file
+}
+
+# --- Face login ---
+# Maximum euclidean distance between two encodings that still counts as a match.
+FACE_MATCH_TOLERANCE = 0.6
+# Seconds between checks for faces registered by other worker processes (0 = every login).
+FACE_INDEX_SYNC_INTERVAL = 0
+# "exact" scans every registered face; "ivf" only scans the FACE_IVF_NPROBE
+# k-means cells nearest to the query (run `manage.py rebuild_face_index` first).
+FACE_INDEX_MODE = os.environ.get("FACE_INDEX_MODE", "exact")
+FACE_IVF_NLIST = 1024
+FACE_IVF_NPROBE = 16
+FACE_IVF_CENTROIDS_PATH = os.path.join(BASE_DIR, 'face_ivf_centroids.npy')
+# Face detection runs in its own process pool. Uploads are downscaled to
+# FACE_IMAGE_MAX_DIMENSION pixels first; beyond FACE_QUEUE_LIMIT pending
+# images requests get a 503 straight away.
+FACE_WORKERS = int(os.environ.get("FACE_WORKERS", 0)) or None  # None = half the CPU cores
+FACE_QUEUE_LIMIT = None  # None = 4 per worker
+FACE_IMAGE_MAX_DIMENSION = 1024
+FACE_WORK_TIMEOUT = 30
+
+# --- Study group chat ---
+# Broadcast chat messages immediately and write them to the database in
+# batches of CHAT_WRITE_BEHIND_BATCH_SIZE, or after
+# CHAT_WRITE_BEHIND_FLUSH_INTERVAL seconds, whichever comes first.
+CHAT_WRITE_BEHIND = os.environ.get("CHAT_WRITE_BEHIND", "") == "1"
+CHAT_WRITE_BEHIND_BATCH_SIZE = 200
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL = 0.5
+# Failed writes are retried with backoff; while they fail, at most
+# CHAT_WRITE_BEHIND_MAX_PENDING messages are kept (oldest dropped first).
+CHAT_WRITE_BEHIND_MAX_PENDING = 10000
+CHAT_WRITE_BEHIND_MAX_RETRY_DELAY = 30
+# Seconds a study group membership check is cached for chat connections.
+# Membership changes invalidate the cache immediately.
+STUDY_GROUP_MEMBERSHIP_TTL = 300
+
+# Shared cache (membership checks, etc.), on the same Redis as the channel layer.
+if CHANNEL_LAYER == "memory":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://127.0.0.1:6379/1',
+        }
+    }
+
+# WebSocket handshakes cache the user behind each access token (by jti) for
+# at most WS_AUTH_CACHE_TTL seconds and never past the token's expiry. The
+# cache is per worker process, so a user deactivated or logged out through
+# another worker can still open chat connections here for up to that long.
+WS_AUTH_CACHE_SIZE = 10000
+WS_AUTH_CACHE_TTL = 30
+
+# Each chat connection is sent the last CHAT_RECENT_MESSAGES messages of its
+# group on connect. With CHAT_RECENT_REDIS_URL the lists are shared by every
+# worker and expire after CHAT_RECENT_TTL idle seconds; without it each
+# process keeps its own.
+CHAT_RECENT_MESSAGES = 50
+CHAT_RECENT_TTL = 86400
+CHAT_RECENT_REDIS_URL = None if CHANNEL_LAYER == "memory" else "redis://127.0.0.1:6379/2"
+
+# Chat abuse limits. Each connection may send CHAT_RATE_LIMIT messages per
+# second (bursts of CHAT_RATE_BURST), and all of a user's connections in one
+# worker together CHAT_USER_RATE_LIMIT (bursts of CHAT_USER_RATE_BURST).
+# Larger frames than CHAT_MAX_FRAME_BYTES close the connection. A client with
+# more than CHAT_OUTBOUND_BUFFER_LIMIT bytes not yet written to its socket has
+# further frames dropped ("drop") or is disconnected with 1008 ("disconnect").
+CHAT_RATE_LIMIT = 5
+CHAT_RATE_BURST = 10
+CHAT_USER_RATE_LIMIT = 10
+CHAT_USER_RATE_BURST = 20
+CHAT_MAX_FRAME_BYTES = 8192
+CHAT_OUTBOUND_BUFFER_LIMIT = 256 * 1024
+CHAT_SLOW_CONSUMER_POLICY = "drop"
+
+# `manage.py archive_chat_messages` moves chat months that ended more than
+# CHAT_ARCHIVE_AFTER_DAYS ago into compressed ChatArchiveChunk rows.
+CHAT_ARCHIVE_AFTER_DAYS = 180
+
+# Job ingestion (`manage.py fetch_jobs`): every query x country x page is
+# fetched concurrently from JOB_SOURCE, at most JOB_INGESTION_RATE requests/s.
+RAPIDAPI_KEY = os.environ.get("RAPIDAPI_KEY", "")
+JSEARCH_BASE_URL = os.environ.get("JSEARCH_BASE_URL", "https://jsearch.p.rapidapi.com")
+JOB_SOURCE = "api.job_ingestion.JSearchSource"
+JOB_INGESTION_QUERIES = ["Software developer intern in India"]
+JOB_INGESTION_COUNTRIES = ["in"]
+JOB_INGESTION_PAGES = 1
+JOB_INGESTION_WORKERS = 4
+JOB_INGESTION_RATE = 5.0
+JOB_INGESTION_BATCH_SIZE = 500
+# Incremental runs ask for jobs posted since this long before the newest one
+# already seen, so listings the source indexes late are not missed.
+JOB_INGESTION_OVERLAP_HOURS = 72
+
+# `manage.py expire_jobs` deletes listings past their expiry date, or older
+# than JOB_MAX_AGE_DAYS when the source gave none. Schedule it with fetch_jobs.
+JOB_MAX_AGE_DAYS = 60
+
+# Job search ranks at most this many of the newest matches (PostgreSQL), so
+# a very common term costs the same as a rare one.
+JOB_SEARCH_MAX_CANDIDATES = 10000
+
+# Job recommendations score the union of each of the user's skills' strongest,
+# newest postings in the JobSkill index, this many per skill.
+JOB_RECOMMEND_CANDIDATES_PER_SKILL = 200
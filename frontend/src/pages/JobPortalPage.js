@@ -5,7 +5,7 @@ import {AuthContext} from '../context/AuthContext';
 // MUI Components & Icons
 import { 
     Container, Typography, Box, Paper, Grid, TextField, Card, CardContent, 
-    CardActions, Button, Chip, CircularProgress, Alert 
+    CardActions, Button, Chip, CircularProgress, Alert, MenuItem 
 } from '@mui/material';
 import SearchIcon from '@mui/icons-material/Search';
 import ApartmentIcon from '@mui/icons-material/Apartment';
@@ -14,41 +14,67 @@ import LocationOnIcon from '@mui/icons-material/LocationOn';
 const JobPortalPage = () => {
     const { authTokens } = useContext(AuthContext);
     const [jobs, setJobs] = useState([]);
-    const [filteredJobs, setFilteredJobs] = useState([]);
+    const [recommended, setRecommended] = useState([]);
     const [searchTerm, setSearchTerm] = useState('');
+    const [jobType, setJobType] = useState('');
+    const [nextPage, setNextPage] = useState(null);
+    const [descriptions, setDescriptions] = useState({});
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
 
-    useEffect(() => {
-        const fetchJobs = async () => {
-            try {
-                const response = await axios.get('http://localhost:8000/api/job-listings/', {
+    // Without a search, browse the newest listings (no descriptions, cursor-paged);
+    // with one, use ranked full-text search. `page` is the cursor or page number to load.
+    const fetchJobs = async (page = null) => {
+        const browsing = !searchTerm && !jobType;
+        try {
+            const response = browsing
+                ? await axios.get('http://localhost:8000/api/job-listings/', {
+                    params: { after: page || undefined },
+                    headers: { 'Authorization': `Bearer ${authTokens.access}` }
+                })
+                : await axios.get('http://localhost:8000/api/job-listings/search/', {
+                    params: { q: searchTerm, job_type: jobType || undefined, page: page || 1 },
                     headers: { 'Authorization': `Bearer ${authTokens.access}` }
                 });
-                setJobs(response.data);
-                setFilteredJobs(response.data); 
-            } catch (err) {
-                setError('Failed to load job listings.');
-                console.error(err);
-            } finally {
-                setLoading(false);
-            }
-        };
+            setJobs((prev) => (page ? [...prev, ...response.data.results] : response.data.results));
+            setNextPage(browsing ? response.data.after : response.data.next_page);
+        } catch (err) {
+            setError('Failed to load job listings.');
+            console.error(err);
+        } finally {
+            setLoading(false);
+        }
+    };
 
-        if (authTokens) {
-            fetchJobs();
+    // The full description comes from the detail endpoint, on request
+    const showDescription = async (jobId) => {
+        try {
+            const response = await axios.get(`http://localhost:8000/api/job-listings/${jobId}/`, {
+                headers: { 'Authorization': `Bearer ${authTokens.access}` }
+            });
+            setDescriptions((prev) => ({ ...prev, [jobId]: response.data.description }));
+        } catch (err) {
+            console.error(err);
         }
+    };
+
+    // Listings matching the student's skills, weighted by proficiency
+    useEffect(() => {
+        if (!authTokens) return;
+        axios.get('http://localhost:8000/api/job-listings/recommended/', {
+            params: { limit: 6 },
+            headers: { 'Authorization': `Bearer ${authTokens.access}` }
+        })
+            .then((response) => setRecommended(response.data))
+            .catch((err) => console.error(err));
     }, [authTokens]);
 
-    // Effect to filter jobs based on search term
+    // Re-run the search shortly after the user stops typing
     useEffect(() => {
-        const results = jobs.filter(job =>
-            job.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            job.company_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            job.location.toLowerCase().includes(searchTerm.toLowerCase())
-        );
-        setFilteredJobs(results);
-    }, [searchTerm, jobs]);
+        if (!authTokens) return;
+        const timer = setTimeout(() => fetchJobs(), 300);
+        return () => clearTimeout(timer);
+    }, [authTokens, searchTerm, jobType]);
 
     if (loading) {
         return <Box sx={{ display: 'flex', justifyContent: 'center', mt: 5 }}><CircularProgress /></Box>;
@@ -66,17 +92,58 @@ const JobPortalPage = () => {
                     <SearchIcon sx={{ color: 'action.active', mr: 1, my: 0.5 }} />
                     <TextField
                         fullWidth
-                        label="Search by title, company, or location..."
+                        label="Search by title, company, or description..."
                         variant="standard"
                         value={searchTerm}
                         onChange={(e) => setSearchTerm(e.target.value)}
                     />
+                    <TextField
+                        select
+                        label="Job type"
+                        variant="standard"
+                        value={jobType}
+                        onChange={(e) => setJobType(e.target.value)}
+                        sx={{ ml: 2, minWidth: 140 }}
+                    >
+                        <MenuItem value="">Any</MenuItem>
+                        {['Internship', 'Full-time', 'Part-time', 'Contract'].map((type) => (
+                            <MenuItem key={type} value={type}>{type}</MenuItem>
+                        ))}
+                    </TextField>
                 </Box>
             </Paper>
 
+            {recommended.length > 0 && (
+                <Paper sx={{ p: 3, mb: 4 }}>
+                    <Typography variant="h5" gutterBottom>Recommended for you</Typography>
+                    <Grid container spacing={2}>
+                        {recommended.map(job => (
+                            <Grid item key={job.id} xs={12} sm={6} md={4}>
+                                <Card variant="outlined" sx={{ height: '100%' }}>
+                                    <CardContent>
+                                        <Typography variant="subtitle1">{job.title}</Typography>
+                                        <Typography variant="body2" color="text.secondary" gutterBottom>
+                                            {job.company_name} · {job.location}
+                                        </Typography>
+                                        {job.matched_skills.map(skill => (
+                                            <Chip key={skill} label={skill} size="small" variant="outlined" sx={{ mr: 0.5, mt: 0.5 }} />
+                                        ))}
+                                    </CardContent>
+                                    <CardActions>
+                                        <Button size="small" href={job.application_url} target="_blank" rel="noopener noreferrer">
+                                            Apply Now
+                                        </Button>
+                                    </CardActions>
+                                </Card>
+                            </Grid>
+                        ))}
+                    </Grid>
+                </Paper>
+            )}
+
             <Grid container spacing={3}>
-                {filteredJobs.length > 0 ? (
-                    filteredJobs.map(job => (
+                {jobs.length > 0 ? (
+                    jobs.map(job => (
                         <Grid item key={job.id} xs={12} sm={6} md={4}>
                             <Card sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
                                 <CardContent sx={{ flexGrow: 1 }}>
@@ -92,11 +159,20 @@ const JobPortalPage = () => {
                                         <Typography variant="body2">{job.location}</Typography>
                                     </Box>
                                     <Chip label={job.job_type} color="primary" size="small" />
-                                    <Typography variant="body2" sx={{ mt: 2, overflow: 'hidden', textOverflow: 'ellipsis', display: '-webkit-box', WebkitLineClamp: '3', WebkitBoxOrient: 'vertical' }}>
-                                        {job.description}
-                                    </Typography>
+                                    {descriptions[job.id] ? (
+                                        <Typography variant="body2" sx={{ mt: 2, whiteSpace: 'pre-line' }}>
+                                            {descriptions[job.id]}
+                                        </Typography>
+                                    ) : job.snippet && (
+                                        <Typography variant="body2" sx={{ mt: 2, overflow: 'hidden', textOverflow: 'ellipsis', display: '-webkit-box', WebkitLineClamp: '3', WebkitBoxOrient: 'vertical' }}>
+                                            {job.snippet}
+                                        </Typography>
+                                    )}
                                 </CardContent>
                                 <CardActions>
+                                    {!descriptions[job.id] && (
+                                        <Button size="small" onClick={() => showDescription(job.id)}>Details</Button>
+                                    )}
                                     <Button size="small" variant="contained" href={job.application_url} target="_blank" rel="noopener noreferrer">
                                         Apply Now
                                     </Button>
@@ -110,6 +186,11 @@ const JobPortalPage = () => {
                     </Grid>
                 )}
             </Grid>
+            {nextPage && (
+                <Box sx={{ display: 'flex', justifyContent: 'center', my: 3 }}>
+                    <Button variant="outlined" onClick={() => fetchJobs(nextPage)}>Load more jobs</Button>
+                </Box>
+            )}
         </Container>
     );
 };
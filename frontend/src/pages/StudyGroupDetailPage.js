@@ -24,6 +24,7 @@ const StudyGroupDetailPage = () => {
 
     const [group, setGroup] = useState(null);
     const [messages, setMessages] = useState([]);
+    const [olderCursor, setOlderCursor] = useState(null);
     const [newMessage, setNewMessage] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
@@ -38,6 +39,28 @@ const StudyGroupDetailPage = () => {
 };
 
 
+    // Concatenate two message lists, dropping ids already present
+    const mergeMessages = (first, second) => {
+        const seen = new Set(first.map((msg) => msg.id));
+        return [...first, ...second.filter((msg) => !seen.has(msg.id))];
+    };
+
+    const loadOlderMessages = async () => {
+        try {
+            const res = await axios.get(
+                `http://localhost:8000/api/study-groups/${group_id}/messages/`,
+                {
+                    params: { before: olderCursor },
+                    headers: { Authorization: `Bearer ${authTokens.access}` }
+                }
+            );
+            setMessages((prev) => mergeMessages(res.data.results, prev));
+            setOlderCursor(res.data.before);
+        } catch (err) {
+            console.error('Failed to fetch older messages:', err);
+        }
+    };
+
     useEffect(() => {
         // Fetch group details from API
         const fetchGroupData = async () => {
@@ -56,6 +79,21 @@ const StudyGroupDetailPage = () => {
         };
         fetchGroupData();
 
+        // Load the most recent page of chat history
+        const fetchHistory = async () => {
+            try {
+                const res = await axios.get(
+                    `http://localhost:8000/api/study-groups/${group_id}/messages/`,
+                    { headers: { Authorization: `Bearer ${authTokens.access}` } }
+                );
+                setMessages((prev) => mergeMessages(res.data.results, prev));
+                setOlderCursor(res.data.before);
+            } catch (err) {
+                console.error('Failed to fetch chat history:', err);
+            }
+        };
+        fetchHistory();
+
         // Setup WebSocket connection
         const socket = new WebSocket(
             `ws://localhost:8000/ws/chat/${group_id}/?token=${authTokens.access}`
@@ -69,7 +107,12 @@ const StudyGroupDetailPage = () => {
         };
         socket.onmessage = (e) => {
             const data = JSON.parse(e.data);
-            setMessages((prev) => [...prev, data]);
+            if (data.type === 'error') {
+                // e.g. rate_limited, or membership_revoked just before the server closes the socket
+                setError(data.detail);
+                return;
+            }
+            setMessages((prev) => mergeMessages(prev, [data]));
         };
 
         chatSocket.current = socket;
@@ -121,9 +164,16 @@ const StudyGroupDetailPage = () => {
 
             <Paper sx={{ height: '70vh', display: 'flex', flexDirection: 'column', bgcolor: '#f5f5f5' }}>
                 <List sx={{ flexGrow: 1, overflow: 'auto', p: 2 }}>
+                    {olderCursor && (
+                        <Box sx={{ display: 'flex', justifyContent: 'center', mb: 1 }}>
+                            <Button size="small" onClick={loadOlderMessages}>
+                                Load earlier messages
+                            </Button>
+                        </Box>
+                    )}
                     {messages.map((msg, index) => (
                         <ListItem
-                            key={index}
+                            key={msg.id || index}
                             sx={{
                                 justifyContent: msg.username === user.username ? 'flex-end' : 'flex-start'
                             }}
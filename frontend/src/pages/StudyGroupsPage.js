@@ -9,6 +9,7 @@ import PeopleIcon from '@mui/icons-material/People';
 const StudyGroupsPage = () => {
     const { authTokens } = useContext(AuthContext);
     const [groups, setGroups] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [newGroupName, setNewGroupName] = useState('');
@@ -20,7 +21,8 @@ const StudyGroupsPage = () => {
             const response = await axios.get('http://localhost:8000/api/study-groups/', {
                 headers: { 'Authorization': `Bearer ${authTokens.access}` }
             });
-            setGroups(response.data);
+            setGroups(response.data.results);
+            setNextCursor(response.data.after);
         } catch (err) {
             setError('Failed to fetch study groups.');
         } finally {
@@ -28,6 +30,19 @@ const StudyGroupsPage = () => {
         }
     };
 
+    const loadMoreGroups = async () => {
+        try {
+            const response = await axios.get('http://localhost:8000/api/study-groups/', {
+                params: { after: nextCursor },
+                headers: { 'Authorization': `Bearer ${authTokens.access}` }
+            });
+            setGroups((prev) => [...prev, ...response.data.results]);
+            setNextCursor(response.data.after);
+        } catch (err) {
+            setError('Failed to fetch study groups.');
+        }
+    };
+
     useEffect(() => {
         fetchGroups();
     }, []);
@@ -109,6 +124,11 @@ const StudyGroupsPage = () => {
                             </Grid>
                         ))}
                     </Grid>
+                    {nextCursor && (
+                        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
+                            <Button variant="outlined" onClick={loadMoreGroups}>Load more groups</Button>
+                        </Box>
+                    )}
                 </Grid>
             </Grid>
         </Container>